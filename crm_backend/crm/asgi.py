@@ -13,4 +13,10 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'crm.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once get_asgi_application() has set Django up.
+from crm_api.changefeed import ChangeFeedApplication  # noqa: E402
+
+# /api/changes/ (SSE and WebSocket) is served here; the rest goes to Django.
+application = ChangeFeedApplication(django_application)
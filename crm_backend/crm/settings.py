@@ -36,6 +36,10 @@ MIDDLEWARE = [
 ]
 
 MIDDLEWARE += [
+    'crm_api.middleware.CompressionMiddleware',  # gzip responses over COMPRESSION['MIN_SIZE'] bytes
+    'crm_api.middleware.ProfilerMiddleware',  # Sampled profiles of slow requests, see /api/profiles/
+    'crm_api.middleware.RequestMetricsMiddleware',  # Server-Timing and /metrics; also times the activity log insert
+    'crm_api.middleware.QueryStatsMiddleware',  # Per-view query fingerprints, see /api/query-stats/
     'crm_api.middleware.ActivityLoggerMiddleware',  # Add this line
 ]
 
@@ -87,12 +91,23 @@ AUTHENTICATION_BACKENDS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',  # Use JWT for authentication
+        'crm_api.authentication.CachedJWTAuthentication',  # JWT, with users cached by id
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_RENDERER_CLASSES': (
+        'crm_api.renderers.FastJSONRenderer',  # orjson; same output as DRF's JSONRenderer
+        'crm_api.renderers.MessagePackRenderer',  # Accept: application/msgpack
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'crm_api.renderers.FastJSONParser',
+        'crm_api.renderers.MessagePackParser',  # Content-Type: application/msgpack
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'crm_api.pagination.KeysetPagination',  # Keyset pagination on (created_at, id)
     'PAGE_SIZE': 10,  # Number of items per page
 }
 
@@ -104,6 +119,85 @@ SIMPLE_JWT = {
     'USER_ID_CLAIM': 'user_id',
 }
 
+# Response compression (see crm_api/renderers.py)
+COMPRESSION = {
+    'MIN_SIZE': 1024,  # Bytes
+}
+
+# Caches resolved JWT users and the dashboard/forecast snapshots. Without
+# REDIS_URL each worker process has its own LocMem cache: a save or delete
+# only invalidates the worker that handled it, and the others keep the old
+# entry until its TTL runs out. Set REDIS_URL (needs the redis package) to
+# share one cache, and so the invalidation, between workers.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+
+# Seconds a resolved user is cached. Saves and deletes invalidate it in the
+# shared cache, but only in the writing process with the default LocMem one,
+# so this is how long a deactivated user can still authenticate elsewhere.
+JWT_USER_CACHE_TTL = 60
+# Authenticate GET/HEAD/OPTIONS from token claims without a user lookup.
+# Claims are only refreshed on login, so role/active changes lag until then.
+JWT_STATELESS_READS = False
+
+# Activity logging (see crm_api/activity.py for all options)
+ACTIVITY_LOG = {
+    'ASYNC': True,  # Batch inserts from a background thread
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,  # Seconds
+    'MAX_QUEUE_SIZE': 10000,
+    'READ_SAMPLE_RATE': 1.0,  # Fraction of GET requests to log
+    'EXCLUDE_READ_ONLY': False,
+    'RETENTION_MONTHS': 12,  # Older months are dropped by `manage.py maintain_activity_logs`
+    'ARCHIVE_DIR': os.getenv('ACTIVITY_LOG_ARCHIVE_DIR'),  # Export dropped months here first
+}
+
+# Request instrumentation (see crm_api/metrics.py for all options)
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'SERVER_TIMING': 'admins',  # Per-request db/serialize/render breakdown header, for superusers
+    'TOKEN': os.getenv('METRICS_TOKEN'),  # Bearer token for the scraper; admins' JWTs also work
+    'PUBLIC': False,  # True serves /metrics without either
+}
+
+# Query fingerprinting (see crm_api/querystats.py for all options)
+QUERY_STATS = {
+    'ENABLED': True,
+    'SAMPLES': 5,  # Slowest executions kept per view and fingerprint
+    'KEEP_PARAMS': False,  # Store the samples' query parameters too (may hold personal data)
+    'SNAPSHOT_DIR': os.getenv('QUERY_STATS_DIR'),  # Shared by all workers (mode 0700); default <tmp>/crm-query-stats
+}
+
+# Delta sync (see crm_api/sync.py for all options)
+SYNC = {
+    'PAGE_SIZE': 500,  # Changed records and deletes per response
+    'TOMBSTONE_DAYS': 30,  # Deletes kept for `manage.py prune_tombstones`; older ?since= tokens get 410
+}
+
+# Change feed served by crm/asgi.py at /api/changes/ (see crm_api/changefeed.py)
+CHANGE_FEED = {
+    'QUEUE_SIZE': 256,  # Events a connection may fall behind before it is closed with "overflow"
+    'HEARTBEAT': 15.0,  # Seconds
+}
+
+# Sampling profiler (see crm_api/profiling.py for all options)
+PROFILER = {
+    'ENABLED': os.getenv('PROFILER_ENABLED') == '1',  # Sample every request, keep those slower than THRESHOLD
+    'THRESHOLD': 1.0,  # Seconds
+    'DIR': os.getenv('PROFILE_DIR'),  # Default <tmp>/crm-profiles
+}
+
+DASHBOARD_CACHE_TTL = 30  # Seconds; the snapshot is also invalidated on change
+
+FORECAST_CACHE_TTL = 300  # Seconds; dropped whenever an opportunity changes
+
+IMPORT_WORKERS = None  # Processes used to validate imported rows (None = CPU count, 0 = inline)
+
 CORS_ALLOW_ALL_ORIGINS = True  # For development only
 
 STATIC_URL = 'static/'
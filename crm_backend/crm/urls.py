@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from crm_api.views import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('crm_api.urls')),
+    path('metrics', metrics, name='metrics'),  # Prometheus scrape target
 ]
\ No newline at end of file
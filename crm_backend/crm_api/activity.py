@@ -0,0 +1,197 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Write entries from a background thread instead of inside the request.
+    'ASYNC': True,
+    # Flush when this many entries are queued...
+    'BATCH_SIZE': 500,
+    # ...or when the oldest queued entry is this many seconds old.
+    'FLUSH_INTERVAL': 2.0,
+    # Bounded queue; once full, requests wait up to ENQUEUE_TIMEOUT seconds
+    # for room and the entry is dropped (and counted) after that.
+    'MAX_QUEUE_SIZE': 10000,
+    'ENQUEUE_TIMEOUT': 0.05,
+    # Fraction of GET/HEAD/OPTIONS requests to log (writes are always logged).
+    'READ_SAMPLE_RATE': 1.0,
+    # Skip GET/HEAD/OPTIONS requests entirely.
+    'EXCLUDE_READ_ONLY': False,
+    # URL names that are never logged.
+    'EXCLUDE_URL_NAMES': [
+        'choices',
+        'account-choices',
+        'opportunity-choices',
+        'lead-choices',
+        'user-choices',
+        'note-choices',
+        'quote-choices',
+    ],
+    # Retention (see crm_api/retention.py and the maintain_activity_logs
+    # command): whole months kept before the current one, where expired
+    # months are archived as .csv.gz (None = just drop them), and how many
+    # monthly partitions to create ahead on PostgreSQL.
+    'RETENTION_MONTHS': 12,
+    'ARCHIVE_DIR': None,
+    'PARTITIONS_AHEAD': 3,
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def activity_settings():
+    return {**DEFAULTS, **getattr(settings, 'ACTIVITY_LOG', {})}
+
+
+def should_log(request, config):
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.url_name in config['EXCLUDE_URL_NAMES']:
+        return False
+    if request.method in SAFE_METHODS:
+        if config['EXCLUDE_READ_ONLY']:
+            return False
+        rate = config['READ_SAMPLE_RATE']
+        if rate < 1.0 and random.random() >= rate:
+            return False
+    return True
+
+
+class ActivityLogBuffer:
+    """
+    In-process queue of ActivityLog rows written with ``bulk_create`` by a
+    background thread.
+
+    The writer thread is started lazily on the first ``add()`` (and again in
+    a forked worker), and remaining entries are flushed at interpreter exit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def add(self, entry, config=None):
+        config = config or activity_settings()
+        self._ensure_started(config)
+        try:
+            self._queue.put(entry, timeout=config['ENQUEUE_TIMEOUT'])
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            return False
+        with self._stats_lock:
+            self.enqueued += 1
+        return True
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'written': self.written,
+            'failed': self.failed,
+            'flushes': self.flushes,
+        }
+
+    def flush(self):
+        """Write everything currently queued. Safe to call from any thread."""
+        if self._queue is None:
+            return
+        batch = []
+        while True:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not None:
+                batch.append(entry)
+        self._write(batch)
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            try:
+                self._queue.put_nowait(None)  # Wakes the writer; when full it isn't waiting anyway
+            except queue.Full:
+                pass
+            thread.join(timeout)
+        self.flush()
+
+    def _ensure_started(self, config):
+        if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            if self._queue is None or self._pid != os.getpid():
+                # A fresh queue after fork: the parent's writer thread is gone.
+                self._queue = queue.Queue(maxsize=config['MAX_QUEUE_SIZE'])
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(config['BATCH_SIZE'], config['FLUSH_INTERVAL']),
+                name='activity-log-writer',
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self, batch_size, flush_interval):
+        batch = []
+        deadline = None
+        while not self._stopping.is_set():
+            timeout = flush_interval if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                entry = self._queue.get(timeout=timeout)
+                if entry is not None:
+                    batch.append(entry)
+                    if deadline is None:
+                        deadline = time.monotonic() + flush_interval
+            except queue.Empty:
+                pass
+            if batch and (len(batch) >= batch_size or time.monotonic() >= deadline):
+                close_old_connections()
+                self._write(batch)
+                batch = []
+                deadline = None
+        self._write(batch)
+        connections.close_all()  # This thread's connections, so stop() leaves none open
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            ActivityLog.objects.bulk_create(batch)
+        except Exception:
+            logger.exception('Failed to write %d activity log entries', len(batch))
+            with self._stats_lock:
+                self.failed += len(batch)
+                self.flushes += 1
+            return
+        with self._stats_lock:
+            self.written += len(batch)
+            self.flushes += 1
+
+
+activity_log_buffer = ActivityLogBuffer()
+atexit.register(activity_log_buffer.stop)
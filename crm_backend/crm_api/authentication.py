@@ -1,13 +1,110 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import exceptions
+from rest_framework.permissions import SAFE_METHODS
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
 from .models import User
 
+USER_CACHE_KEY = 'crm_api:auth_user:{}'
+
+
+def get_cached_user(user_id):
+    """
+    Return the user with ``user_id``, from the cache when possible.
+    Entries are dropped whenever the user is saved or deleted, in the
+    configured cache: with the default per-process LocMem cache other
+    workers keep theirs for up to ``JWT_USER_CACHE_TTL`` seconds.
+    """
+    key = USER_CACHE_KEY.format(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = User.objects.get(id=user_id)
+        cache.set(key, user, getattr(settings, 'JWT_USER_CACHE_TTL', 60))
+    return user
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    cache.delete(USER_CACHE_KEY.format(instance.pk))
+
+
+def is_superuser_request(request):
+    """
+    Whether a plain Django request (outside DRF's authentication) comes from
+    a superuser, by its session or its JWT.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_superuser
+    try:
+        authenticated = CachedJWTAuthentication().authenticate(request)
+    except exceptions.AuthenticationFailed:
+        return False
+    return authenticated is not None and authenticated[0].is_superuser
+
+
+def add_user_claims(token, user):
+    # Read by the stateless mode of CachedJWTAuthentication
+    token['username'] = user.username
+    token['is_active'] = user.is_active
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves users through a short-lived cache.
+
+    With ``JWT_STATELESS_READS`` enabled, GET/HEAD/OPTIONS requests skip the
+    lookup entirely and get a TokenUser built from the token's claims.
+    """
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        if request.method in SAFE_METHODS and getattr(settings, 'JWT_STATELESS_READS', False):
+            return self.get_token_user(validated_token), validated_token
+        return self.get_user(validated_token), validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken('Token contained no recognizable user identification')
+
+        try:
+            user = get_cached_user(user_id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('No such user exists', code='user_not_found')
+        if not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+    def get_token_user(self, validated_token):
+        if 'username' not in validated_token:
+            # Issued before the claims were added; fall back to a lookup.
+            return self.get_user(validated_token)
+        if not validated_token.get('is_active', True):
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return TokenUser(validated_token)
+
 
 class PostgresJWTAuthentication(JWTAuthentication):
     def get_user(self, validated_token):
         try:
             user_id = validated_token['user_id']
-            user = User.objects.get(id=user_id)
+            user = get_cached_user(user_id)
             if not user.is_active:
                 raise AuthenticationFailed('User is inactive', code='user_inactive')
             return user
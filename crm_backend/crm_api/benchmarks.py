@@ -0,0 +1,242 @@
+import math
+import statistics
+import tracemalloc
+from collections import namedtuple
+from time import perf_counter
+from urllib.parse import urlencode
+
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .activity import activity_settings
+from .authentication import add_user_claims
+from .models import (
+    Account, ActivityLog, Contact, ImportJob, Lead, Note, Opportunity, Quote, QuoteLineItem, Task, User,
+)
+from .seed import PASSWORD
+
+# One request to time. kwargs and body may be callables taking the
+# fixtures dict (see fixtures()), for ids only known once data is seeded.
+Case = namedtuple('Case', ['url_name', 'method', 'kwargs', 'query', 'body'])
+Case.__new__.__defaults__ = ('GET', None, None, None)
+
+
+def ids(key):
+    return lambda fixtures: {key: fixtures[key]}
+
+
+TOUCH = {'description': 'Updated by the benchmark'}
+
+
+def bulk_touch(key):
+    return lambda fixtures: [{'id': fixtures[key], **TOUCH}]
+
+
+CASES = [
+    Case('login', 'POST', body=lambda fixtures: {'username': fixtures['username'], 'password': PASSWORD}),
+    Case('logout', 'POST', body={}),
+    Case('user-create-list'),
+    Case('user-list'),
+    Case('user-detail', kwargs=lambda fixtures: {'username': fixtures['username']}),
+    Case('current-user', kwargs=lambda fixtures: {'username': fixtures['username']}),
+    Case('choices'),
+    Case('user-choices'),
+    Case('account-list-create'),
+    Case('account-export'),
+    Case('account-detail', kwargs=ids('account_id')),
+    Case('account-detail', 'PUT', kwargs=ids('account_id'), body=TOUCH),
+    Case('account-bulk', 'PATCH', body=bulk_touch('account_id')),
+    Case('account-choices'),
+    Case('contact-list-create'),
+    Case('contact-export'),
+    Case('contact-detail', kwargs=ids('contact_id')),
+    Case('contact-detail', 'PUT', kwargs=ids('contact_id'), body=TOUCH),
+    Case('contact-bulk', 'PATCH', body=bulk_touch('contact_id')),
+    Case('opportunity-list-create'),
+    Case('opportunity-export'),
+    Case('opportunity-detail', kwargs=ids('opportunity_id')),
+    Case('opportunity-detail', 'PUT', kwargs=ids('opportunity_id'), body=TOUCH),
+    Case('opportunity-bulk', 'PATCH', body=bulk_touch('opportunity_id')),
+    Case('opportunity-choices'),
+    Case('lead-list-create'),
+    Case('lead-export'),
+    Case('lead-detail', kwargs=ids('lead_id')),
+    Case('lead-detail', 'PUT', kwargs=ids('lead_id'), body=TOUCH),
+    Case('lead-bulk', 'PATCH', body=bulk_touch('lead_id')),
+    Case('lead-choices'),
+    Case('user-activity-logs'),
+    Case('task-list-create'),
+    Case('task-export'),
+    Case('task-detail', kwargs=ids('task_id')),
+    Case('task-detail', 'PUT', kwargs=ids('task_id'), body=TOUCH),
+    Case('dashboard-metrics'),
+    Case('forecast'),
+    Case('quote-list-create'),
+    Case('quote-export'),
+    Case('quote-detail', kwargs=ids('quote_id')),
+    Case('quote-detail', 'PUT', kwargs=ids('quote_id'), body=TOUCH),
+    Case('quote-choices'),
+    Case('note-list-create'),
+    Case('note-export'),
+    Case('note-detail', kwargs=ids('note_id')),
+    Case('note-detail', 'PUT', kwargs=ids('note_id'), body=TOUCH),
+    Case('note-choices'),
+    Case('import-detail', kwargs=ids('job_id')),
+    Case('search', query={'q': 'acme'}),
+    Case('sync'),
+    Case('query-stats'),
+    Case('profile-list'),
+    Case('metrics'),
+]
+# Routes deliberately left out, with the reason.
+SKIPPED = {
+    'import-create': 'uploads a file and starts a background import',
+    'profile-detail': 'needs a profile saved by the profiler',
+}
+
+
+def case_name(case):
+    return f'{case.method} {case.url_name}'
+
+
+def uncovered_routes():
+    """URL names in crm_api/urls.py with neither a case nor a reason to skip them."""
+    from .urls import urlpatterns
+
+    covered = {case.url_name for case in CASES} | set(SKIPPED)
+    return sorted(pattern.name for pattern in urlpatterns if pattern.name not in covered)
+
+
+def row_counts():
+    models = (User, Account, Contact, Lead, Opportunity, Task, Quote, QuoteLineItem, Note, ActivityLog)
+    return {model.__name__: model.objects.count() for model in models}
+
+
+def fixtures():
+    """The user the benchmark runs as and an existing id of every kind of record."""
+    user = User.objects.filter(is_superuser=True).order_by('id').first()
+    if user is None:
+        raise ValueError('No superuser to run the benchmark as; seed the database first.')
+    job, _ = ImportJob.objects.get_or_create(
+        file_name='benchmark.csv', defaults={'entity': 'leads', 'status': 'Completed', 'created_by': user},
+    )
+    found = {'user': user, 'username': user.username, 'job_id': job.id}
+    for key, model in (
+        ('account_id', Account), ('contact_id', Contact), ('opportunity_id', Opportunity), ('lead_id', Lead),
+        ('task_id', Task), ('quote_id', Quote), ('note_id', Note),
+    ):
+        found[key] = model.objects.order_by('id').values_list('id', flat=True).first()
+    return found
+
+
+def nearest_rank(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+class EndpointBenchmark:
+    """
+    Runs each case through the full middleware stack with a real JWT and
+    reports latency, query count, peak Python memory and response size.
+
+    Each case gets one warm-up request, one with its queries counted, one
+    under tracemalloc (which slows everything down, so it is not timed)
+    and then ``iterations`` timed requests. Writes run in a transaction
+    that is rolled back, so every iteration sees the same data. Caches stay warm across iterations, as they would in production.
+    """
+
+    def __init__(self, iterations=20):
+        self.iterations = iterations
+
+    def run(self, cases=None):
+        data = fixtures()
+        client = APIClient()
+        token = add_user_claims(RefreshToken.for_user(data['user']), data['user']).access_token
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        config = activity_settings()
+        if connection.vendor == 'sqlite' and config['ASYNC']:
+            # SQLite has a single writer: the log thread would make the
+            # write cases fail with "database is locked".
+            with override_settings(ACTIVITY_LOG={**config, 'ASYNC': False}):
+                return [self.run_case(client, case, data) for case in (cases or CASES)]
+        return [self.run_case(client, case, data) for case in (cases or CASES)]
+
+    def run_case(self, client, case, data):
+        kwargs = case.kwargs(data) if callable(case.kwargs) else case.kwargs
+        body = case.body(data) if callable(case.body) else case.body
+        url = reverse(case.url_name, kwargs=kwargs)
+        if case.query:
+            url = f'{url}?{urlencode(case.query)}'
+
+        def request():
+            if case.method == 'GET':
+                return consume(client.get(url))
+            with transaction.atomic():
+                result = consume(getattr(client, case.method.lower())(url, body, format='json'))
+                transaction.set_rollback(True)
+            return result
+
+        status, size = request()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            request()
+        tracemalloc.start()
+        try:
+            request()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        timings = []
+        for _ in range(self.iterations):
+            started = perf_counter()
+            request()
+            timings.append((perf_counter() - started) * 1000)
+
+        return {
+            'case': case_name(case),
+            'url': url,
+            'status': status,
+            'queries': queries.count,
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(nearest_rank(timings, 0.95), 3),
+            'min_ms': round(min(timings), 3),
+            'peak_memory_kib': round(peak / 1024, 1),
+            'response_bytes': size,
+        }
+
+
+class QueryCounter:
+    # CaptureQueriesContext loses the queries when the request_started
+    # signal resets connection.queries.
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def consume(response):
+    """``(status, body size)``, reading streamed bodies to the end."""
+    if response.streaming:
+        return response.status_code, sum(len(chunk) for chunk in response.streaming_content)
+    return response.status_code, len(response.content)
+
+
+def compare(baseline, current):
+    """
+    ``(scale, case, old result, new result)`` for every case present in
+    both benchmark files, matched by scale and case name.
+    """
+    old = {
+        (entry['scale'], result['case']): result
+        for entry in baseline['scales'] for result in entry['results']
+    }
+    return [
+        (entry['scale'], result['case'], old[(entry['scale'], result['case'])], result)
+        for entry in current['scales'] for result in entry['results']
+        if (entry['scale'], result['case']) in old
+    ]
@@ -0,0 +1,200 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+from rest_framework import serializers, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .serializers import AuditMixin
+from .signals import post_bulk_save
+
+CHUNK_SIZE = 500
+MAX_ROWS = 5000
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    ListSerializer that validates every row and keeps going on errors.
+
+    After ``is_valid()``, ``valid_rows`` holds ``(index, validated_data,
+    instance)`` for each good row and ``row_errors`` holds ``(index, errors)``
+    for each bad one. For updates pass ``instance`` as a ``{pk: object}``
+    mapping; rows are matched to objects by their ``id``.
+    """
+
+    def run_child_validation(self, data):
+        if self.instance is not None:
+            pk = data.get('id') if isinstance(data, dict) else None
+            instance = self.instance.get(pk) if isinstance(pk, int) else None
+            if instance is None:
+                raise ValidationError({'id': ['No such record.']})
+            self.child.instance = instance
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise ValidationError({'non_field_errors': ['Expected a list of items.']})
+        if len(data) > MAX_ROWS:
+            raise ValidationError({'non_field_errors': [f'Ensure this list has no more than {MAX_ROWS} items.']})
+
+        self.valid_rows = []
+        self.row_errors = []
+        unique_fields = [
+            field.name for field in self.child.Meta.model._meta.concrete_fields
+            if field.unique and not field.primary_key
+        ]
+        seen = {name: set() for name in unique_fields}
+
+        for index, item in enumerate(data):
+            try:
+                validated = self.run_child_validation(item)
+            except ValidationError as exc:
+                self.row_errors.append((index, exc.detail))
+                continue
+            # The child's unique validators only look at the database, so
+            # catch duplicates within the batch itself here.
+            duplicates = {
+                name: ['Duplicate value within this batch.']
+                for name in unique_fields
+                if name in validated and validated[name] in seen[name]
+            }
+            if duplicates:
+                self.row_errors.append((index, duplicates))
+                continue
+            for name in unique_fields:
+                if name in validated:
+                    seen[name].add(validated[name])
+            self.valid_rows.append((index, validated, self.child.instance))
+        return [validated for _, validated, _ in self.valid_rows]
+
+
+def chunked(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def write_chunk(chunk, write, failed):
+    """
+    Write ``chunk`` of ``(index, instance)`` pairs with ``write(instances)``.
+    If the chunk violates a constraint, retry it row by row so only the
+    offending rows are reported in ``failed``. Returns the written pairs.
+    """
+    try:
+        with transaction.atomic():
+            write([instance for _, instance in chunk])
+        return chunk
+    except IntegrityError:
+        pass
+
+    written = []
+    for index, instance in chunk:
+        try:
+            with transaction.atomic():
+                write([instance])
+        except IntegrityError as exc:
+            failed.append({'index': index, 'errors': {'non_field_errors': [str(exc)]}})
+        else:
+            written.append((index, instance))
+    return written
+
+
+def bulk_create(request, serializer_class):
+    model = serializer_class.Meta.model
+    context = {'request': request}
+    serializer = BulkListSerializer(child=serializer_class(context=context), data=request.data, context=context)
+    serializer.is_valid(raise_exception=True)
+
+    # bulk_create() skips the serializer's create(), so set the audit fields ourselves.
+    audit = serializer.child.audit_fields(created=True)
+    pending = [(index, model(**{**validated, **audit})) for index, validated, _ in serializer.valid_rows]
+    failed = [{'index': index, 'errors': errors} for index, errors in serializer.row_errors]
+    succeeded = []
+
+    with transaction.atomic():
+        for chunk in chunked(pending):
+            succeeded += write_chunk(chunk, lambda objs: model.objects.bulk_create(objs), failed)
+
+    post_bulk_save.send(sender=model, instances=[instance for _, instance in succeeded], created=True)
+    return bulk_result(
+        [{'index': index, 'id': instance.pk} for index, instance in succeeded], failed, status.HTTP_201_CREATED
+    )
+
+
+def bulk_update(request, serializer_class):
+    model = serializer_class.Meta.model
+    context = {'request': request}
+    rows = request.data if isinstance(request.data, list) else []
+    ids = [row['id'] for row in rows if isinstance(row, dict) and isinstance(row.get('id'), int)]
+    instances = model.objects.in_bulk(ids)
+
+    serializer = BulkListSerializer(
+        instances,
+        child=serializer_class(context=context, partial=True),
+        data=request.data,
+        partial=True,
+        context=context,
+    )
+    serializer.is_valid(raise_exception=True)
+
+    # bulk_update() skips update() and save(), so set the audit fields ourselves.
+    audit = {**serializer.child.audit_fields(created=False), 'modified_at': now()}
+    fields = set(audit)
+    pending = []
+    for index, validated, instance in serializer.valid_rows:
+        for attr, value in {**validated, **audit}.items():
+            setattr(instance, attr, value)
+        fields.update(validated)
+        pending.append((index, instance))
+
+    failed = [{'index': index, 'errors': errors} for index, errors in serializer.row_errors]
+    succeeded = []
+    fields = sorted(fields)
+    with transaction.atomic():
+        for chunk in chunked(pending):
+            succeeded += write_chunk(chunk, lambda objs: model.objects.bulk_update(objs, fields), failed)
+
+    post_bulk_save.send(sender=model, instances=[instance for _, instance in succeeded], created=False)
+    return bulk_result([{'index': index, 'id': instance.pk} for index, instance in succeeded], failed)
+
+
+def bulk_delete(request, serializer_class):
+    model = serializer_class.Meta.model
+    ids = request.data.get('ids') if isinstance(request.data, dict) else request.data
+    if not isinstance(ids, list) or len(ids) > MAX_ROWS:
+        raise ValidationError({'ids': [f'Expected a list of at most {MAX_ROWS} ids.']})
+
+    existing = set()
+    with transaction.atomic():
+        for chunk in chunked([pk for pk in ids if isinstance(pk, int)]):
+            found = list(model.objects.filter(id__in=chunk).values_list('id', flat=True))
+            model.objects.filter(id__in=found).delete()
+            existing.update(found)
+
+    succeeded = [{'index': index, 'id': pk} for index, pk in enumerate(ids) if pk in existing]
+    failed = [
+        {'index': index, 'errors': {'id': ['No such record.']}}
+        for index, pk in enumerate(ids) if pk not in existing
+    ]
+    return bulk_result(succeeded, failed)
+
+
+def bulk_result(succeeded, failed, success_status=status.HTTP_200_OK):
+    failed.sort(key=lambda row: row['index'])
+    return Response(
+        {'succeeded': succeeded, 'failed': failed},
+        status=status.HTTP_207_MULTI_STATUS if failed else success_status,
+    )
+
+
+def bulk_response(request, serializer_class):
+    """Dispatch a ``*_bulk`` view: POST creates, PATCH updates, DELETE deletes."""
+    for name in ('create', 'update'):
+        if getattr(serializer_class, name) is not getattr(AuditMixin, name):
+            # It would silently not run for bulk writes.
+            raise ImproperlyConfigured(f'{serializer_class.__name__}.{name}() does more than AuditMixin.{name}()')
+    if request.method == 'POST':
+        return bulk_create(request, serializer_class)
+    if request.method == 'PATCH':
+        return bulk_update(request, serializer_class)
+    return bulk_delete(request, serializer_class)
@@ -0,0 +1,381 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from corsheaders.conf import conf as cors_conf
+from corsheaders.middleware import CorsMiddleware
+from django.conf import settings
+from django.db import transaction
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from .authentication import CachedJWTAuthentication
+from .fieldsets import split_names
+from .sync import ENTITIES, ENTITY_BY_MODEL
+
+DEFAULTS = {
+    # Events queued per connection. A client this far behind (its socket
+    # isn't draining) is sent "overflow" and disconnected; it catches up
+    # with /api/sync/ and reconnects.
+    'QUEUE_SIZE': 256,
+    # Seconds without an event before a heartbeat is sent, so proxies keep
+    # the connection open and dead clients are noticed.
+    'HEARTBEAT': 15.0,
+    # Open feeds per process; more get 503.
+    'MAX_CONNECTIONS': 10000,
+}
+
+PATH = '/api/changes/'
+
+SSE_HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),  # nginx would otherwise hold events back
+]
+
+
+def encode(data):
+    return json.dumps(data, separators=(',', ':'))
+
+
+def cors_headers(scope):
+    """
+    The CORS headers CorsMiddleware would add, from the same CORS_* settings;
+    the feed is served outside Django, so the middleware never sees it.
+    """
+    origin = next((value.decode('latin-1') for name, value in scope.get('headers', ()) if name == b'origin'), None)
+    headers = [(b'vary', b'origin')]
+    if not origin or not re.match(cors_conf.CORS_URLS_REGEX, scope['path']):
+        return headers
+    try:
+        url = urlsplit(origin)
+    except ValueError:
+        return headers
+    if not cors_conf.CORS_ALLOW_ALL_ORIGINS and not CorsMiddleware(None).origin_found_in_white_lists(origin, url):
+        return headers
+    if cors_conf.CORS_ALLOW_ALL_ORIGINS and not cors_conf.CORS_ALLOW_CREDENTIALS:
+        headers.append((b'access-control-allow-origin', b'*'))
+    else:
+        headers.append((b'access-control-allow-origin', origin.encode('latin-1')))
+    if cors_conf.CORS_ALLOW_CREDENTIALS:
+        headers.append((b'access-control-allow-credentials', b'true'))
+    return headers
+
+
+def change_feed_settings():
+    return {**DEFAULTS, **getattr(settings, 'CHANGE_FEED', {})}
+
+
+class Overflow(Exception):
+    pass
+
+
+class FeedError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class Subscriber:
+    """
+    One connection's filters and bounded queue. Only used on its own event
+    loop; waiting is a future and a timer, not a task per ``get()``.
+    """
+
+    def __init__(self, loop, entities, assigned_to, queue_size):
+        self.loop = loop
+        self.entities = entities
+        self.assigned_to = assigned_to
+        self.queue_size = queue_size
+        self.events = deque()
+        self.overflowed = False
+        self._waiter = None
+
+    def wants(self, event):
+        return (self.entities is None or event['entity'] in self.entities) and (
+            self.assigned_to is None or event['assigned_to'] in self.assigned_to
+        )
+
+    def deliver(self, event, data):
+        if self.overflowed or not self.wants(event):
+            return
+        if len(self.events) >= self.queue_size:
+            self.overflowed = True
+            self.events.clear()
+        else:
+            self.events.append(data)
+        self._wake()
+
+    async def get(self, timeout):
+        """The next event (as JSON), or ``None`` after ``timeout`` seconds without one."""
+        if not self.events and not self.overflowed:
+            self._waiter = self.loop.create_future()
+            timer = self.loop.call_later(timeout, self._wake)
+            try:
+                await self._waiter
+            finally:
+                timer.cancel()
+                self._waiter = None
+        if self.overflowed:
+            raise Overflow
+        return self.events.popleft() if self.events else None
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+
+class ChangeFeed:
+    """
+    In-process pub/sub of record changes to the open feed connections.
+
+    ``publish()`` may be called from any thread (the ORM runs in worker
+    threads, under ASGI too): the events go to each event loop with
+    subscribers in one ``call_soon_threadsafe()``, and that loop copies
+    them into the matching subscribers' queues. A connection is a
+    coroutine waiting on its queue, not a thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loops = {}
+        self.connections = 0
+
+    def __bool__(self):
+        return self.connections > 0
+
+    def subscribe(self, entities=None, assigned_to=None, queue_size=DEFAULTS['QUEUE_SIZE']):
+        """A Subscriber on the running event loop; pass it to unsubscribe() when done."""
+        loop = asyncio.get_running_loop()
+        subscriber = Subscriber(loop, entities, assigned_to, queue_size)
+        with self._lock:
+            self._loops.setdefault(loop, set()).add(subscriber)
+            self.connections += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            subscribers = self._loops.get(subscriber.loop)
+            if subscribers is None or subscriber not in subscribers:
+                return
+            subscribers.remove(subscriber)
+            self.connections -= 1
+            if not subscribers:
+                del self._loops[subscriber.loop]
+
+    def publish(self, events):
+        with self._lock:
+            loops = list(self._loops)
+        # Encoded once here rather than for each connection.
+        events = [(event, encode(event)) for event in events]
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._fan_out, loop, events)
+            except RuntimeError:
+                # The loop was closed without its connections unsubscribing.
+                with self._lock:
+                    self.connections -= len(self._loops.pop(loop, ()))
+
+    def _fan_out(self, loop, events):
+        with self._lock:
+            subscribers = list(self._loops.get(loop, ()))
+        for event, data in events:
+            for subscriber in subscribers:
+                subscriber.deliver(event, data)
+
+
+change_feed = ChangeFeed()
+
+
+def publish_instances(sender, instances, action, using=None):
+    if not change_feed:
+        return  # Nobody is listening in this process
+    entity = ENTITY_BY_MODEL[sender]
+    events = [
+        {'entity': entity, 'action': action, 'id': instance.pk, 'assigned_to': instance.assigned_to_id}
+        for instance in instances
+    ]
+    # Not before the commit, or a client could fetch the row and miss the change.
+    transaction.on_commit(lambda: change_feed.publish(events), using=using)
+
+
+def publish_saved(sender, instance, created, using=None, **kwargs):
+    publish_instances(sender, [instance], 'created' if created else 'updated', using)
+
+
+def publish_bulk_saved(sender, instances, created, **kwargs):
+    publish_instances(sender, instances, 'created' if created else 'updated')
+
+
+def publish_deleted(sender, instance, using=None, **kwargs):
+    publish_instances(sender, [instance], 'deleted', using)
+
+
+def authenticate(raw_token):
+    """The user a JWT access token belongs to, and when the token expires (epoch seconds)."""
+    authentication = CachedJWTAuthentication()
+    validated_token = authentication.get_validated_token(raw_token)
+    return authentication.get_user(validated_token), validated_token['exp']
+
+
+def raw_token(scope, params):
+    # Browsers can't set headers on EventSource or WebSocket, hence ?token=.
+    if params.get('token'):
+        return params['token'][-1].encode('utf-8')
+    for name, value in scope.get('headers', ()):
+        if name == b'authorization':
+            return CachedJWTAuthentication().get_raw_token(value)
+    return None
+
+
+async def open_feed(scope, config):
+    """
+    Subscribe the connection in ``scope`` to the changes its query string
+    asks for: ``?entities=tasks,leads`` (default: all) and
+    ``?assigned_to=me,<user id>,...`` (default: anyone's). Returns the
+    subscriber and when the token expires; raises FeedError.
+    """
+    params = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    token = raw_token(scope, params)
+    if token is None:
+        raise FeedError(401, 'Authentication credentials were not provided.')
+    try:
+        user, expires_at = await sync_to_async(authenticate)(token)
+    except AuthenticationFailed as exc:
+        detail = exc.detail['detail'] if isinstance(exc.detail, dict) else exc.detail
+        raise FeedError(401, str(detail))
+
+    entities = split_names(params.get('entities', [''])[-1]) or None
+    for name in entities or ():
+        if name not in ENTITIES:
+            raise FeedError(400, f'Unknown entity "{name}". Choose from: {", ".join(ENTITIES)}.')
+    assigned_to = split_names(params.get('assigned_to', [''])[-1]) or None
+    try:
+        assigned_to = assigned_to and {user.id if value == 'me' else int(value) for value in assigned_to}
+    except ValueError:
+        raise FeedError(400, 'assigned_to must be "me" or user ids')
+
+    if change_feed.connections >= config['MAX_CONNECTIONS']:
+        raise FeedError(503, 'Too many change feed connections; try again later.')
+    subscriber = change_feed.subscribe(
+        frozenset(entities) if entities else None, frozenset(assigned_to) if assigned_to else None,
+        config['QUEUE_SIZE'],
+    )
+    return subscriber, expires_at
+
+
+async def pump(subscriber, expires_at, heartbeat, emit):
+    """Emit ready, then changes and heartbeats, until the subscriber overflows or the token expires."""
+    await emit('ready', '{}')
+    while True:
+        timeout = min(heartbeat, expires_at - time.time())
+        if timeout <= 0:
+            await emit('expired', '{}')
+            return
+        try:
+            data = await subscriber.get(timeout)
+        except Overflow:
+            await emit('overflow', '{}')
+            return
+        if data is None:
+            await emit('heartbeat', None)
+        else:
+            await emit('change', data)
+
+
+async def disconnected(receive, message_type):
+    while (await receive())['type'] != message_type:
+        pass  # Request bodies and client messages are ignored
+
+
+async def run_feed(subscriber, expires_at, config, emit, receive, disconnect_type):
+    """Pump the feed until it ends or the client goes; True if the client went."""
+    feed = asyncio.ensure_future(pump(subscriber, expires_at, config['HEARTBEAT'], emit))
+    gone = asyncio.ensure_future(disconnected(receive, disconnect_type))
+    try:
+        await asyncio.wait((feed, gone), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        feed.cancel()
+        gone.cancel()
+        change_feed.unsubscribe(subscriber)
+    if gone.done() and not gone.cancelled():
+        return True
+    feed.result()
+    return False
+
+
+async def serve_sse(scope, receive, send):
+    config = change_feed_settings()
+    cors = cors_headers(scope)
+    try:
+        subscriber, expires_at = await open_feed(scope, config)
+    except FeedError as exc:
+        body = encode({'error': exc.message}).encode('utf-8')
+        headers = [(b'content-type', b'application/json'), *cors]
+        await send({'type': 'http.response.start', 'status': exc.status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': body})
+        return
+
+    async def emit(name, data):
+        if data is None:
+            chunk = f': {name}\n\n'  # A comment; EventSource ignores it
+        else:
+            chunk = f'event: {name}\ndata: {data}\n\n'
+        await send({'type': 'http.response.body', 'body': chunk.encode('utf-8'), 'more_body': True})
+
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [*SSE_HEADERS, *cors]})
+    if not await run_feed(subscriber, expires_at, config, emit, receive, 'http.disconnect'):
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+async def serve_websocket(scope, receive, send):
+    config = change_feed_settings()
+    if (await receive())['type'] != 'websocket.connect':
+        return
+    await send({'type': 'websocket.accept'})
+    try:
+        subscriber, expires_at = await open_feed(scope, config)
+    except FeedError as exc:
+        # Accepted first so browsers see why: the close code is 4000 + the HTTP status.
+        await send({'type': 'websocket.send', 'text': encode({'type': 'error', 'error': exc.message})})
+        await send({'type': 'websocket.close', 'code': 4000 + exc.status})
+        return
+
+    async def emit(name, data):
+        # {"type": name} merged into the already encoded JSON object
+        text = f'{{"type":"{name}"}}' if data in (None, '{}') else f'{{"type":"{name}",{data[1:]}'
+        await send({'type': 'websocket.send', 'text': text})
+
+    if not await run_feed(subscriber, expires_at, config, emit, receive, 'websocket.disconnect'):
+        await send({'type': 'websocket.close', 'code': 1000})
+
+
+class ChangeFeedApplication:
+    """
+    ASGI application serving the change feed at ``/api/changes/`` and
+    passing every other connection on to ``application`` (Django's).
+
+    A plain GET gets Server-Sent Events (``ready``, then one ``change``
+    event per created, updated or deleted record, as
+    ``{"entity", "action", "id", "assigned_to"}``); a WebSocket gets the
+    same as JSON messages with a ``type``. Events only say what changed:
+    clients fetch it with ``/api/sync/``, and after ``overflow`` or
+    ``expired`` (or any reconnect) sync before relying on the feed again.
+    Subscribers only hear about writes made in the same process.
+    """
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == PATH and scope['method'] == 'GET':
+            await serve_sse(scope, receive, send)
+        elif scope['type'] == 'websocket' and scope['path'] == PATH:
+            await serve_websocket(scope, receive, send)
+        else:
+            await self.application(scope, receive, send)
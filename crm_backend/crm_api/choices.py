@@ -0,0 +1,68 @@
+import hashlib
+import json
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from rest_framework.response import Response
+
+from .models import User, Account, Opportunity, Lead, Task, Quote, Note
+
+# Every choice list the frontend forms need, keyed by entity. These are
+# code constants, so the bundle only changes with a deploy.
+CHOICES = {
+    'user': {
+        'user_type': User.user_type_choices,
+    },
+    'account': {
+        'account_type': Account.account_type_choices,
+        'industry_type': Account.industry_type_choices,
+    },
+    'opportunity': {
+        'sales_stage': Opportunity.sale_stage_choices,
+        'business_type': Opportunity.business_type_choices,
+        'lead_source': Opportunity.lead_source_choices,
+        'currency': Opportunity.currency_choices,
+    },
+    'lead': {
+        'title': Lead.title_choices,
+        'status': Lead.status_choices,
+        'lead_source': Lead.lead_source_choices,
+    },
+    'task': {
+        'status': Task.status_choices,
+        'priority': Task._meta.get_field('priority').choices,
+        'parent_type': Task.parent_type_choices,
+    },
+    'quote': {
+        'approval_status': Quote.approval_status_choices,
+        'quote_stage': Quote.quote_stage_choices,
+        'invoice_status': Quote.invoice_status_choices,
+        'payment_terms': Quote.payment_terms_choices,
+        'currency': Quote.currency_choices,
+    },
+    'note': {
+        'related_to_type': Note.related_to_type_choices,
+    },
+}
+
+CHOICES_VERSION = hashlib.sha256(json.dumps(CHOICES, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+def choices_response(request):
+    """
+    The choices bundle with its content hash as ETag. Requests that pin the
+    current version with ``?v=<version>`` may cache it for good; anything
+    else must revalidate, which costs a 304 once cached.
+    """
+    # JSON and MessagePack bodies differ, so each gets its own ETag.
+    etag = f'"{CHOICES_VERSION}-{request.accepted_renderer.format}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response({'version': CHOICES_VERSION, **CHOICES})
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept',))
+    if request.GET.get('v') == CHOICES_VERSION:
+        patch_cache_control(response, private=True, max_age=ONE_YEAR, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
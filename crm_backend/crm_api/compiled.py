@@ -0,0 +1,122 @@
+from rest_framework import fields as drf_fields, relations, serializers
+
+from .metrics import serialization_timer
+
+# to_representation() methods that hand back what the database returns
+# (str, int, bool) unchanged, so calling them is skipped.
+PASSTHROUGH = {
+    drf_fields.CharField.to_representation,
+    drf_fields.IntegerField.to_representation,
+    drf_fields.BooleanField.to_representation,
+    drf_fields.ReadOnlyField.to_representation,
+}
+
+
+class NotCompilable(Exception):
+    pass
+
+
+class CompiledSerializer:
+    """
+    Read-only rendering of a ModelSerializer straight from ``.values()``
+    rows, for list endpoints.
+
+    Each readable field's source path becomes a ``values()`` lookup
+    (``assigned_to.username`` is ``assigned_to__username``, a join in the
+    same query), and rows become dicts through a precomputed list of
+    ``(key, lookup, convert)`` steps: no model instances and no per-row
+    ``get_attribute()`` calls. Values are converted by the serializer's
+    own field objects wherever that is not a no-op, and the DRF rules for
+    ``None`` and for a dotted source through a null foreign key (the key is
+    left out) are kept, so the output is the same as ``serializer.data``.
+
+    A nested ModelSerializer over a foreign key (an ``?expand=``, see
+    fieldsets.py) is compiled in turn, its lookups under the key's prefix.
+    Serializers with method fields, other nested serializers or sources
+    that are not model columns raise NotCompilable; use the serializer then.
+    """
+
+    def __init__(self, serializer_class, prefix=''):
+        model = serializer_class.Meta.model
+        concrete = {field.name: field for field in model._meta.concrete_fields}
+        lookups = []
+        steps = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            attrs = field.source_attrs
+            if (
+                isinstance(field, serializers.ModelSerializer) and len(attrs) == 1
+                and attrs[0] in concrete and concrete[attrs[0]].is_relation
+            ):
+                # DRF renders None for a null key, else the related row.
+                nested = CompiledSerializer(type(field), prefix=f'{prefix}{attrs[0]}__')
+                for needed in (prefix + attrs[0], *nested.lookups):
+                    if needed not in lookups:
+                        lookups.append(needed)
+                steps.append((name, None, prefix + attrs[0], True, nested.to_representation))
+                continue
+            if isinstance(field, (serializers.BaseSerializer, drf_fields.SerializerMethodField)):
+                raise NotCompilable(f'{serializer_class.__name__}.{name} is a {type(field).__name__}')
+            if not attrs or attrs[0] not in concrete:
+                raise NotCompilable(f'{serializer_class.__name__}.{name} has source {field.source!r}')
+            if len(attrs) > 2 or (len(attrs) == 2 and not concrete[attrs[0]].is_relation):
+                raise NotCompilable(f'{serializer_class.__name__}.{name} has source {field.source!r}')
+            if len(attrs) == 2 and field.default is not drf_fields.empty:
+                raise NotCompilable(f'{serializer_class.__name__}.{name} has a default')
+
+            lookup = prefix + '__'.join(attrs)
+            if prefix and attrs == [model._meta.pk.name]:
+                lookup = prefix[:-2]  # The foreign key column already holds it
+            # A dotted source through a null foreign key: DRF renders None
+            # if the field allows null, and otherwise leaves the key out.
+            guard = prefix + attrs[0] if len(attrs) == 2 else None
+            if isinstance(field, relations.PrimaryKeyRelatedField) and field.pk_field is None:
+                convert = None
+            elif isinstance(field, drf_fields.ChoiceField):
+                convert = None if all(isinstance(key, str) for key in field.choice_strings_to_values.values()) else field.to_representation
+            elif type(field).to_representation in PASSTHROUGH:
+                convert = None
+            else:
+                convert = field.to_representation
+            for needed in (guard, lookup):
+                if needed and needed not in lookups:
+                    lookups.append(needed)
+            steps.append((name, lookup, guard, field.allow_null, convert))
+
+        self.serializer_class = serializer_class
+        self.lookups = tuple(lookups)
+        self.steps = tuple(steps)
+
+    def values(self, queryset, extra_fields=()):
+        """``queryset`` as the ``values()`` rows to_representation() reads."""
+        return queryset.values(*self.lookups, *(name for name in extra_fields if name not in self.lookups))
+
+    def to_representation(self, row):
+        data = {}
+        for name, lookup, guard, allow_null, convert in self.steps:
+            if guard is not None and row[guard] is None:
+                if allow_null:
+                    data[name] = None
+                continue
+            if lookup is None:
+                data[name] = convert(row)
+                continue
+            value = row[lookup]
+            if value is None or convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value)
+        return data
+
+    def render(self, rows):
+        with serialization_timer():
+            return [self.to_representation(row) for row in rows]
+
+
+def compile_serializer(serializer_class):
+    """The serializer's CompiledSerializer, or ``None`` when it can't be compiled."""
+    try:
+        return CompiledSerializer(serializer_class)
+    except NotCompilable:
+        return None
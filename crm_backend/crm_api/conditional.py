@@ -0,0 +1,61 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def loaded_values(instance, seen=None):
+    """
+    What was fetched from other tables along with ``instance``: the rows
+    loaded by ``select_related()`` and the lists by ``prefetch_related()``,
+    each as the field values actually loaded (so nothing deferred is read).
+    """
+    # Prefetched rows cache the instance they were fetched for.
+    seen = (seen or set()) | {id(instance)}
+    related = []
+    for name, row in sorted(instance._state.fields_cache.items()):
+        if id(row) not in seen:
+            related.append((name, row and (row_values(row), loaded_values(row, seen))))
+    for name, rows in sorted(getattr(instance, '_prefetched_objects_cache', {}).items()):
+        related.append((name, [(row_values(row), loaded_values(row, seen)) for row in rows]))
+    return related
+
+
+def row_values(row):
+    return sorted((name, value) for name, value in row.__dict__.items() if not name.startswith('_'))
+
+
+def record_etag(request, instance):
+    """
+    ETag of a record's detail response. The record's own ``modified_at``
+    covers its columns; the related rows it is rendered with (usernames,
+    expansions, line items) and the negotiated media type are folded in as
+    a digest, since they change the body without touching ``modified_at``.
+    """
+    version = int(instance.modified_at.timestamp() * 1_000_000)
+    digest = hashlib.blake2b(
+        repr((loaded_values(instance), getattr(request, 'accepted_media_type', None))).encode('utf-8'),
+        digest_size=8,
+    ).hexdigest()
+    return f'"{instance._meta.model_name}-{instance.pk}-{version}-{digest}"'
+
+
+def detail_response(request, instance, serializer_class):
+    """
+    GET response for a ``*_detail`` view. If the client's If-None-Match
+    still matches the record, answer 304 without serializing it; otherwise
+    serialize and attach the ETag.
+
+    There is no Last-Modified: ``modified_at`` says nothing about the
+    related rows in the body, so If-Modified-Since alone could revalidate
+    a stale copy.
+    """
+    etag = record_etag(request, instance)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(serializer_class(instance).data, status=status.HTTP_200_OK)
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Accept',))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
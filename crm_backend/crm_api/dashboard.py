@@ -0,0 +1,86 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from .models import Account, Opportunity, Lead, Task
+
+CACHE_KEY = 'crm_api:dashboard_metrics'
+RECENT_LEADS = 6
+TASKS_PER_STATUS = 3
+
+
+def build_dashboard_snapshot():
+    """Compute the dashboard payload from the database."""
+    customer_count = Account.objects.filter(account_type='Customer').count()
+    deal_count = Opportunity.objects.count()
+
+    recent_leads = [
+        {
+            'id': lead['id'],
+            'first_name': lead['first_name'],
+            'last_name': lead['last_name'],
+            'status': lead['status'],
+            'email': lead['email_address'],
+            'phone': lead['mobile'],
+            'created_at': lead['created_at'],
+            'lead_source': lead['lead_source'],
+        }
+        for lead in Lead.objects.order_by('-created_at').values(
+            'id', 'first_name', 'last_name', 'status', 'email_address',
+            'mobile', 'created_at', 'lead_source',
+        )[:RECENT_LEADS]
+    ]
+
+    # Task counts per status in one GROUP BY query. Every status present is
+    # counted, including values outside Task.status_choices.
+    task_stats = list(
+        Task.objects.order_by('status').values('status').annotate(count=Count('id'))
+    )
+
+    # The latest few tasks per status in one windowed query, with the
+    # assignee's username joined in rather than loaded per row.
+    statuses = [choice for choice, _ in Task.status_choices]
+    tasks_by_status = {choice: [] for choice in statuses}
+    recent_tasks = (
+        Task.objects
+        .filter(status__in=statuses)
+        .annotate(row_number=Window(
+            RowNumber(),
+            partition_by=F('status'),
+            order_by=F('modified_at').desc(),
+        ))
+        .filter(row_number__lte=TASKS_PER_STATUS)
+        .order_by('status', 'row_number')
+        .values('id', 'subject', 'modified_at', 'due_date', 'priority', 'status', 'assigned_to__username')
+    )
+    for task in recent_tasks:
+        tasks_by_status[task['status']].append({
+            'id': task['id'],
+            'subject': task['subject'],
+            'date': task['modified_at'],
+            'due_date': task['due_date'],
+            'priority': task['priority'],
+            'assigned_to': task['assigned_to__username'],
+        })
+
+    return {
+        'customer_count': customer_count,
+        'deal_count': deal_count,
+        'recent_leads': recent_leads,
+        'task_stats': task_stats,
+        'tasks_by_status': tasks_by_status,
+    }
+
+
+def get_dashboard_snapshot():
+    """Return the cached snapshot, rebuilding it if it expired or was invalidated."""
+    snapshot = cache.get(CACHE_KEY)
+    if snapshot is None:
+        snapshot = build_dashboard_snapshot()
+        cache.set(CACHE_KEY, snapshot, getattr(settings, 'DASHBOARD_CACHE_TTL', 30))
+    return snapshot
+
+
+def invalidate_dashboard_snapshot(**kwargs):
+    cache.delete(CACHE_KEY)
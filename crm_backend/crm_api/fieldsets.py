@@ -0,0 +1,100 @@
+from functools import lru_cache
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from .models import Account, Contact, Lead, Opportunity, User
+from .serializers import AccountSerializer, ContactSerializer, LeadSerializer, OpportunitySerializer, UserSerializer
+
+# Serializer an expanded foreign key is rendered with, by the model it
+# points to. Only the related record's own columns are included (see
+# expansion_serializer()), so each expansion is exactly one join.
+EXPANSIONS = {
+    User: UserSerializer,
+    Account: AccountSerializer,
+    Contact: ContactSerializer,
+    Opportunity: OpportunitySerializer,
+    Lead: LeadSerializer,
+}
+
+
+def split_names(raw):
+    names = []
+    for name in (raw or '').split(','):
+        name = name.strip()
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+@lru_cache(maxsize=None)
+def readable_fields(serializer_class):
+    """``{name: field}`` of what ``serializer_class`` renders, in order."""
+    return {name: field for name, field in serializer_class().fields.items() if not field.write_only}
+
+
+@lru_cache(maxsize=None)
+def expandable_fields(serializer_class):
+    """``{name: serializer}`` of the foreign keys ``?expand=`` accepts."""
+    model = serializer_class.Meta.model
+    expandable = {}
+    for name, field in readable_fields(serializer_class).items():
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and len(field.source_attrs) == 1:
+            related = model._meta.get_field(field.source_attrs[0]).related_model
+            if related in EXPANSIONS:
+                expandable[name] = EXPANSIONS[related]
+    return expandable
+
+
+@lru_cache(maxsize=None)
+def expansion_serializer(serializer_class):
+    """``serializer_class`` without the fields that read another table."""
+    concrete = {field.name for field in serializer_class.Meta.model._meta.concrete_fields}
+    names = tuple(
+        name for name, field in readable_fields(serializer_class).items()
+        if not isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField))
+        and len(field.source_attrs) == 1 and field.source_attrs[0] in concrete
+    )
+    return fieldset_serializer(serializer_class, names, ())
+
+
+# Bounded: every combination of ?fields= and ?expand= makes a class.
+@lru_cache(maxsize=512)
+def fieldset_serializer(serializer_class, fields, expand):
+    """
+    A subclass of ``serializer_class`` rendering only ``fields``, with the
+    foreign keys in ``expand`` nested as objects. Being a class of its own
+    it gets its own query plan and compiled serializer, so the narrowing
+    carries through to ``only()``/``values()`` and each expansion becomes
+    a join.
+    """
+    expandable = expandable_fields(serializer_class)
+    attrs = {name: expansion_serializer(expandable[name])(read_only=True) for name in expand}
+    attrs['Meta'] = type('Meta', (serializer_class.Meta,), {'fields': list(fields)})
+    attrs['__module__'] = serializer_class.__module__
+    return type(serializer_class.__name__, (serializer_class,), attrs)
+
+
+def sparse_serializer(request, serializer_class):
+    """
+    ``serializer_class`` as selected by ``?fields=a,b`` and
+    ``?expand=fk,...`` on a GET request; writes always use the full
+    serializer. Expanded names are included even when not in ``?fields=``.
+    """
+    if request.method != 'GET':
+        return serializer_class
+    fields = split_names(request.query_params.get('fields'))
+    expand = split_names(request.query_params.get('expand'))
+    if not fields and not expand:
+        return serializer_class
+
+    readable = readable_fields(serializer_class)
+    expandable = expandable_fields(serializer_class)
+    for name in fields:
+        if name not in readable:
+            raise ValidationError({'fields': [f'Unknown field "{name}". Choose from: {", ".join(readable)}.']})
+    for name in expand:
+        if name not in expandable:
+            raise ValidationError({'expand': [f'Cannot expand "{name}". Choose from: {", ".join(expandable)}.']})
+    selected = tuple(name for name in readable if not fields or name in fields or name in expand)
+    return fieldset_serializer(serializer_class, selected, tuple(name for name in expandable if name in expand))
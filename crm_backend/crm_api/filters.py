@@ -0,0 +1,169 @@
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+from .models import User, Account, Contact, Opportunity, Lead, Task, Quote, Note
+
+# filters: fields accepted as ?field=value. Choice fields and foreign keys
+#   take one value or a comma-separated list; dates, datetimes and numbers
+#   also take ?field__gte= / __gt= / __lte= / __lt= ranges.
+# ordering: non-null fields accepted in ?ordering=-field,field.
+# facets: choice fields whose counts can be requested with ?facets=.
+ListSpec = namedtuple('ListSpec', ['filters', 'ordering', 'facets'])
+
+LIST_SPECS = {
+    Account: ListSpec(
+        filters=['account_type', 'industry_type', 'assigned_to', 'annual_revenue', 'created_at', 'modified_at'],
+        ordering=['created_at', 'modified_at', 'name', 'annual_revenue'],
+        facets=['account_type', 'industry_type'],
+    ),
+    Contact: ListSpec(
+        filters=['lead_source', 'account', 'assigned_to', 'reports_to', 'created_at', 'modified_at'],
+        ordering=['created_at', 'modified_at', 'last_name', 'first_name'],
+        facets=['lead_source'],
+    ),
+    Opportunity: ListSpec(
+        filters=[
+            'sales_stage', 'business_type', 'lead_source', 'currency', 'account', 'assigned_to',
+            'opportunity_amount', 'probability', 'expected_close_date', 'created_at', 'modified_at',
+        ],
+        ordering=[
+            'created_at', 'modified_at', 'expected_close_date', 'opportunity_amount', 'probability', 'opportunity_name',
+        ],
+        facets=['sales_stage', 'business_type', 'lead_source'],
+    ),
+    Lead: ListSpec(
+        filters=['status', 'lead_source', 'assigned_to', 'reports_to', 'created_at', 'modified_at'],
+        ordering=['created_at', 'modified_at', 'last_name', 'first_name', 'status'],
+        facets=['status', 'lead_source'],
+    ),
+    Task: ListSpec(
+        filters=[
+            'status', 'priority', 'parent_type', 'assigned_to', 'contact_name',
+            'start_date', 'due_date', 'created_at', 'modified_at',
+        ],
+        ordering=['created_at', 'modified_at', 'due_date', 'start_date', 'status', 'subject'],
+        facets=['status', 'priority', 'parent_type'],
+    ),
+    Quote: ListSpec(
+        filters=[
+            'quote_stage', 'approval_status', 'invoice_status', 'currency', 'assigned_to', 'account',
+            'opportunity', 'contact', 'valid_until', 'grand_total', 'created_at', 'modified_at',
+        ],
+        ordering=['created_at', 'modified_at', 'valid_until', 'quote_number'],
+        facets=['quote_stage', 'approval_status', 'invoice_status'],
+    ),
+    Note: ListSpec(
+        filters=['related_to_type', 'related_to_id', 'assigned_to', 'created_at', 'modified_at'],
+        ordering=['created_at', 'modified_at', 'subject'],
+        facets=['related_to_type'],
+    ),
+}
+
+DEFAULT_ORDERING = ('-created_at', '-id')
+RANGE_LOOKUPS = ('gt', 'gte', 'lt', 'lte')
+RANGE_TYPES = (
+    'DateField', 'DateTimeField', 'DecimalField', 'IntegerField', 'BigIntegerField', 'PositiveIntegerField',
+)
+
+
+def get_spec(model):
+    return LIST_SPECS.get(model, ListSpec(filters=[], ordering=[], facets=[]))
+
+
+def parse_value(request, field, raw):
+    if field.is_relation:
+        if raw == 'me' and field.related_model is User:
+            return request.user.pk
+        target = field.target_field
+    else:
+        target = field
+    try:
+        value = target.to_python(raw)
+    except DjangoValidationError:
+        raise ValidationError({field.name: [f'"{raw}" is not a valid value.']})
+    if field.choices and value not in dict(field.choices):
+        raise ValidationError({field.name: [f'"{raw}" is not a valid choice.']})
+    return value
+
+
+def filter_list(request, queryset):
+    """
+    Apply the ``?field=`` / ``?field__lookup=`` filters declared for the
+    queryset's model. Unrelated query parameters are ignored.
+    """
+    model = queryset.model
+    conditions = {}
+    for name in get_spec(model).filters:
+        field = model._meta.get_field(name)
+        key = field.attname if field.is_relation else name
+
+        raw_values = [
+            value
+            for raw in request.query_params.getlist(name)
+            for value in raw.split(',') if value != ''
+        ]
+        if len(raw_values) == 1:
+            conditions[key] = parse_value(request, field, raw_values[0])
+        elif raw_values:
+            conditions[f'{key}__in'] = [parse_value(request, field, value) for value in raw_values]
+
+        if field.get_internal_type() in RANGE_TYPES:
+            for lookup in RANGE_LOOKUPS:
+                raw = request.query_params.get(f'{name}__{lookup}')
+                if raw:
+                    conditions[f'{key}__{lookup}'] = parse_value(request, field, raw)
+    return queryset.filter(**conditions) if conditions else queryset
+
+
+def list_ordering(request, model):
+    """
+    Parse ``?ordering=`` into a keyset ordering. ``id`` is always appended
+    as a tie-breaker, in the direction of the last key, so the order is
+    total and can be paged through with a cursor.
+    """
+    raw = request.query_params.get('ordering')
+    if not raw:
+        return DEFAULT_ORDERING
+    allowed = get_spec(model).ordering
+    ordering = []
+    for name in raw.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if name.lstrip('-') not in allowed or name.lstrip('-') in (key.lstrip('-') for key in ordering):
+            raise ValidationError({'ordering': [f'Cannot order by "{name}". Choose from: {", ".join(allowed)}.']})
+        ordering.append(name)
+    if not ordering:
+        return DEFAULT_ORDERING
+    ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+    return tuple(ordering)
+
+
+def facet_counts(request, queryset):
+    """
+    Count rows per choice for each field in ``?facets=``, all in one
+    conditional-aggregate query. Returns ``None`` when no facets were asked for.
+    """
+    raw = request.query_params.get('facets')
+    if not raw:
+        return None
+    model = queryset.model
+    allowed = get_spec(model).facets
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValidationError({'facets': [f'Cannot facet on {", ".join(unknown)}. Choose from: {", ".join(allowed)}.']})
+
+    choices = {name: [value for value, _ in model._meta.get_field(name).choices] for name in names}
+    counts = queryset.aggregate(**{
+        f'{name}_{index}': Count('id', filter=Q(**{name: value}))
+        for name, values in choices.items()
+        for index, value in enumerate(values)
+    })
+    return {
+        name: {value: counts[f'{name}_{index}'] for index, value in enumerate(values)}
+        for name, values in choices.items()
+    }
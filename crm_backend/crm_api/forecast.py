@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import Opportunity
+
+CACHE_KEY = 'crm_api:forecast'
+CLOSED_STAGES = ('Closed Won', 'Closed Lost')
+CENTS = Decimal('0.01')
+
+# amount * probability%, summed in the database.
+WEIGHTED_AMOUNT = ExpressionWrapper(
+    F('opportunity_amount') * F('probability') / 100,
+    output_field=DecimalField(max_digits=20, decimal_places=4),
+)
+
+
+def format_amount(value):
+    # Rendered as strings, like the serializers' DecimalFields.
+    return str((value or Decimal(0)).quantize(CENTS))
+
+
+def summarize(queryset, *group_by):
+    """Count, total and weighted amount per ``group_by`` (and currency) in one GROUP BY query."""
+    rows = (
+        queryset
+        .values('currency', *group_by)
+        .annotate(count=Count('id'), amount=Sum('opportunity_amount'), weighted_amount=Sum(WEIGHTED_AMOUNT))
+        .order_by('currency', *group_by)
+    )
+    return [
+        {
+            **row,
+            'amount': format_amount(row['amount']),
+            'weighted_amount': format_amount(row['weighted_amount']),
+        }
+        for row in rows
+    ]
+
+
+def build_forecast():
+    """
+    Pipeline forecast computed entirely in SQL. Amounts are never summed
+    across currencies, so every row carries its ``currency``. The owner and
+    month breakdowns and the totals cover the open pipeline only;
+    ``by_stage`` also shows the closed stages.
+    """
+    opportunities = Opportunity.objects.all()
+    pipeline = opportunities.exclude(sales_stage__in=CLOSED_STAGES)
+
+    by_owner = [
+        {
+            'currency': row['currency'],
+            'assigned_to': row['assigned_to'],
+            'assigned_to_username': row['assigned_to__username'],
+            'count': row['count'],
+            'amount': row['amount'],
+            'weighted_amount': row['weighted_amount'],
+        }
+        for row in summarize(pipeline, 'assigned_to', 'assigned_to__username')
+    ]
+    by_month = [
+        {**row, 'month': row['month'].strftime('%Y-%m')}
+        for row in summarize(pipeline.annotate(month=TruncMonth('expected_close_date')), 'month')
+    ]
+    return {
+        'totals': summarize(pipeline),
+        'by_stage': summarize(opportunities, 'sales_stage'),
+        'by_owner': by_owner,
+        'by_month': by_month,
+    }
+
+
+def get_forecast():
+    """Return the cached forecast, rebuilding it if it expired or was invalidated."""
+    forecast = cache.get(CACHE_KEY)
+    if forecast is None:
+        forecast = build_forecast()
+        cache.set(CACHE_KEY, forecast, getattr(settings, 'FORECAST_CACHE_TTL', 300))
+    return forecast
+
+
+def invalidate_forecast(**kwargs):
+    cache.delete(CACHE_KEY)
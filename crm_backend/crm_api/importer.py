@@ -0,0 +1,304 @@
+import csv
+import datetime
+import multiprocessing
+import os
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.utils.timezone import now
+from rest_framework import serializers
+from rest_framework.fields import SkipField, empty
+from rest_framework.validators import UniqueValidator
+
+from .bulk import write_chunk
+from .serializers import AccountSerializer, ContactSerializer, OpportunitySerializer, LeadSerializer
+from .signals import post_bulk_save
+
+# entity -> (serializer, field used to skip rows that already exist)
+IMPORTERS = {
+    'accounts': (AccountSerializer, 'name'),
+    'contacts': (ContactSerializer, 'email_address'),
+    'leads': (LeadSerializer, 'email_address'),
+    'opportunities': (OpportunitySerializer, None),
+}
+
+CHUNK_SIZE = 1000
+MAX_STORED_ERRORS = 1000
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def read_rows(path):
+    """Yield ``(row_number, {column: value})`` without loading the whole file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            for number, row in enumerate(csv.DictReader(handle), start=2):
+                yield number, row
+    elif extension == '.xlsx':
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+            for number, values in enumerate(rows, start=2):
+                if not any(value is not None for value in values):
+                    continue
+                yield number, {
+                    column: cell_value(value)
+                    for column, value in zip(header, values) if column
+                }
+        finally:
+            workbook.close()
+    else:
+        raise ImportFileError('Only .csv and .xlsx files can be imported.')
+
+
+def cell_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime) and value.time() == datetime.time(0):
+        return value.date()
+    return value
+
+
+def chunked_rows(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def validate_chunk(entity, chunk):
+    """
+    Validate rows against the entity serializer's field definitions.
+
+    Runs in a worker process and never touches the database: related
+    fields are only parsed to primary keys here and checked for existence
+    by the parent, one query per chunk. Returns ``(row_number, data,
+    errors)`` tuples.
+    """
+    serializer_class, _ = IMPORTERS[entity]
+    fields = [
+        field for field in serializer_class().fields.values()
+        if not field.read_only
+    ]
+    for field in fields:
+        # UniqueValidator queries the database: duplicates are found by the
+        # parent's dedupe step and the unique constraints instead.
+        field.validators = [validator for validator in field.validators if not isinstance(validator, UniqueValidator)]
+    results = []
+    for number, row in chunk:
+        data, errors = {}, {}
+        for field in fields:
+            raw = row.get(field.field_name, empty)
+            if isinstance(raw, str):
+                raw = raw.strip()
+                if raw == '' and not isinstance(field, serializers.CharField):
+                    raw = None if field.allow_null else empty
+            try:
+                if isinstance(field, serializers.PrimaryKeyRelatedField):
+                    data[field.source] = related_pk(field, raw)
+                else:
+                    data[field.source] = field.run_validation(raw)
+            except SkipField:
+                pass
+            except serializers.ValidationError as exc:
+                # Plain strings: results are pickled back from the worker.
+                errors[field.field_name] = [str(message) for message in exc.detail]
+        results.append((number, None if errors else data, errors or None))
+    return results
+
+
+def related_pk(field, raw):
+    if raw is empty:
+        if field.required:
+            field.fail('required')
+        raise SkipField()
+    if raw is None:
+        if not field.allow_null:
+            field.fail('null')
+        return None
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        field.fail('incorrect_type', data_type=type(raw).__name__)
+
+
+class Importer:
+    """
+    Streams a CSV/XLSX file into one entity table.
+
+    Chunks of rows are validated in a process pool (a bounded number in
+    flight, so memory stays flat), checked against existing rows with one
+    query per chunk, written with ``bulk_create`` and reported on ``job``.
+    """
+
+    def __init__(self, job, workers=None, chunk_size=CHUNK_SIZE):
+        self.job = job
+        self.serializer_class, self.dedupe_field = IMPORTERS[job.entity]
+        self.model = self.serializer_class.Meta.model
+        self.workers = os.cpu_count() if workers is None else workers
+        self.chunk_size = chunk_size
+        self.seen = set()
+        self.related = [
+            field for field in self.serializer_class().fields.values()
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and not field.read_only
+        ]
+        self.audit = {
+            f'{name}_id': job.created_by_id
+            for name in ('created_by', 'modified_by')
+            if any(field.name == name for field in self.model._meta.concrete_fields)
+        }
+
+    def run(self, path):
+        job = self.job
+        job.status = 'Running'
+        job.save(update_fields=['status', 'modified_at'])
+        try:
+            for results in self.validated_chunks(read_rows(path)):
+                self.write(results)
+                job.save(update_fields=[
+                    'processed_rows', 'created_rows', 'duplicate_rows', 'failed_rows', 'errors', 'modified_at',
+                ])
+        except Exception as exc:
+            job.status = 'Failed'
+            job.message = str(exc)
+        else:
+            job.status = 'Completed'
+        job.finished_at = now()
+        job.save()
+        return job
+
+    def validated_chunks(self, rows):
+        chunks = chunked_rows(rows, self.chunk_size)
+        if not self.workers:
+            for chunk in chunks:
+                yield validate_chunk(self.job.entity, chunk)
+            return
+
+        # Spawned workers set up Django themselves; forking a process that
+        # runs request threads and holds DB connections is not safe.
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(self.workers, mp_context=context, initializer=django.setup) as pool:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.submit(validate_chunk, self.job.entity, chunk))
+                if len(pending) >= self.workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def write(self, results):
+        job = self.job
+        job.processed_rows += len(results)
+        valid = []
+        for number, data, errors in results:
+            if errors:
+                self.fail(number, errors)
+            else:
+                valid.append((number, data))
+
+        valid = self.check_related(valid)
+        valid = self.drop_duplicates(valid)
+
+        # The job's user wins over created_by/modified_by columns, as in the serializer's create().
+        pending = [(number, self.model(**{**self.to_attnames(data), **self.audit})) for number, data in valid]
+        failed = []
+        with transaction.atomic():
+            written = write_chunk(pending, lambda objs: self.model.objects.bulk_create(objs), failed)
+        for row in failed:
+            self.fail(row['index'], row['errors'])
+        job.created_rows += len(written)
+        post_bulk_save.send(sender=self.model, instances=[instance for _, instance in written], created=True)
+
+    def check_related(self, rows):
+        """Drop rows pointing at related records that do not exist."""
+        for field in self.related:
+            wanted = {data[field.source] for _, data in rows if data.get(field.source) is not None}
+            existing = set(field.queryset.filter(pk__in=wanted).values_list('pk', flat=True)) if wanted else set()
+            kept = []
+            for number, data in rows:
+                pk = data.get(field.source)
+                if pk is not None and pk not in existing:
+                    self.fail(number, {field.field_name: [f'Invalid pk "{pk}" - object does not exist.']})
+                else:
+                    kept.append((number, data))
+            rows = kept
+        return rows
+
+    def drop_duplicates(self, rows):
+        """Skip rows matching an existing record (or an earlier row) on the dedupe field."""
+        if not self.dedupe_field:
+            return rows
+        name = self.dedupe_field
+        keys = {self.dedupe_key(data.get(name)) for _, data in rows}
+        queryset = self.model.objects.all()
+        if name == 'email_address':
+            # Emails are compared case-insensitively (see the lower(email) indexes).
+            queryset = queryset.annotate(dedupe_key=Lower(name))
+        else:
+            queryset = queryset.annotate(dedupe_key=F(name))
+        existing = set(queryset.filter(dedupe_key__in=keys).values_list('dedupe_key', flat=True)) if keys else set()
+
+        kept = []
+        for number, data in rows:
+            key = self.dedupe_key(data.get(name))
+            if key in existing or key in self.seen:
+                self.job.duplicate_rows += 1
+                continue
+            self.seen.add(key)
+            kept.append((number, data))
+        return kept
+
+    def dedupe_key(self, value):
+        return value.lower() if self.dedupe_field == 'email_address' and value else value
+
+    def to_attnames(self, data):
+        related = {field.source for field in self.related}
+        return {f'{key}_id' if key in related else key: value for key, value in data.items()}
+
+    def fail(self, number, errors):
+        job = self.job
+        job.failed_rows += 1
+        if len(job.errors) < MAX_STORED_ERRORS:
+            job.errors.append({'row': number, 'errors': errors})
+
+
+def run_import(job, path, workers=None):
+    return Importer(job, workers=workers).run(path)
+
+
+def start_import(job, uploaded_file):
+    """
+    Save an uploaded file to a temporary path and import it from a
+    background thread. Progress is reported on ``job``.
+    """
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    handle, path = tempfile.mkstemp(suffix=extension, prefix='crm-import-')
+    with os.fdopen(handle, 'wb') as destination:
+        for chunk in uploaded_file.chunks():
+            destination.write(chunk)
+
+    def work():
+        try:
+            run_import(job, path, workers=getattr(settings, 'IMPORT_WORKERS', None))
+        finally:
+            os.remove(path)
+            connection.close()
+
+    threading.Thread(target=work, name=f'import-job-{job.pk}', daemon=True).start()
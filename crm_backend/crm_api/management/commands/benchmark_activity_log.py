@@ -0,0 +1,111 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+from django.urls import resolve
+from django.utils.timezone import now
+
+from crm_api.models import ActivityLog
+from crm_api.routes import encode_endpoint, route_templates
+
+# The ActivityLog row layout before and after the compact format, as plain
+# tables so only the layout is compared. {pk} is filled in per backend.
+LAYOUTS = {
+    'text': (
+        'id {pk}, action varchar(255) NOT NULL, method varchar(10) NOT NULL, endpoint varchar(255) NOT NULL, '
+        '"timestamp" timestamp with time zone NOT NULL, user_id bigint NOT NULL',
+        ('action', 'method', 'endpoint', 'timestamp', 'user_id'),
+    ),
+    'compact': (
+        'id {pk}, "timestamp" timestamp with time zone NOT NULL, user_id bigint NOT NULL, '
+        'method smallint NOT NULL, route smallint NOT NULL, object_id bigint, path varchar(255)',
+        ('timestamp', 'user_id', 'method', 'route', 'object_id', 'path'),
+    ),
+}
+
+
+def sample_requests(count, seed=0):
+    """``(method, endpoint, resolver match)`` of ``count`` plausible API requests."""
+    rng = random.Random(seed)
+    # Routes with several arguments are logged by path, like any other miss.
+    templates = [template for template in route_templates().values() if template.count('{}') <= 1]
+    requests = []
+    for _ in range(count):
+        endpoint = rng.choice(templates).format(rng.randint(1, 100000))
+        method = rng.choice(('GET', 'GET', 'GET', 'POST', 'PATCH', 'DELETE'))
+        # Django resolves every request anyway; only the encoding is timed.
+        requests.append((method, endpoint, resolve(f'/api{endpoint}')))
+    return requests
+
+
+def text_row(method, endpoint, match, timestamp, user_id):
+    return (f'{method} request to {endpoint}', method, endpoint, timestamp, user_id)
+
+
+def compact_row(method, endpoint, match, timestamp, user_id):
+    route, object_id, path = encode_endpoint(endpoint, match)
+    return (timestamp, user_id, ActivityLog.method_code(method), route, object_id, path)
+
+
+def format_size(value, unit):
+    return 'n/a' if value is None else f'{value:.0f}{unit}'
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the size and insert cost of the old text ActivityLog layout with the compact one, "
+        "using scratch tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000)
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per INSERT, as the log writer batches them.')
+
+    def handle(self, *args, **options):
+        requests = sample_requests(options['rows'])
+        pk = 'bigserial PRIMARY KEY' if connection.vendor == 'postgresql' else 'integer PRIMARY KEY'
+        self.stdout.write(f"{options['rows']} rows, {options['batch_size']} per INSERT")
+        self.stdout.write(f"{'layout':<10}{'insert µs/row':>16}{'bytes/row':>12}{'total size':>14}")
+        for name, build in (('text', text_row), ('compact', compact_row)):
+            columns, fields = LAYOUTS[name]
+            table = f'benchmark_activitylog_{name}'
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {table}')
+                cursor.execute(f'CREATE TABLE {table} ({columns.format(pk=pk)})')
+                cursor.execute(f'CREATE INDEX {table}_user_ts ON {table} (user_id, "timestamp" DESC)')
+                try:
+                    elapsed = self.insert(cursor, table, fields, build, requests, options['batch_size'])
+                    size = self.table_size(cursor, table)
+                finally:
+                    cursor.execute(f'DROP TABLE {table}')
+            self.stdout.write(
+                f'{name:<10}{elapsed / len(requests) * 1e6:>16.1f}'
+                f'{format_size(size / len(requests) if size else None, ""):>12}'
+                f'{format_size(size / 1024 if size else None, " KiB"):>14}'
+            )
+
+    def insert(self, cursor, table, fields, build, requests, batch_size):
+        """Seconds spent building and inserting the rows, batch by batch."""
+        names = ', '.join(connection.ops.quote_name(field) for field in fields)
+        sql = f"INSERT INTO {table} ({names}) VALUES ({', '.join(['%s'] * len(fields))})"
+        timestamp = now()
+        started = time.perf_counter()
+        for start in range(0, len(requests), batch_size):
+            batch = requests[start:start + batch_size]
+            rows = [build(method, endpoint, match, timestamp, 1) for method, endpoint, match in batch]
+            cursor.executemany(sql, rows)
+        return time.perf_counter() - started
+
+    def table_size(self, cursor, table):
+        """Bytes used by the table and its indexes, if the backend can tell."""
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+            return cursor.fetchone()[0]
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name = %s', [table, f'{table}_user_ts'])
+            except DatabaseError:
+                return None  # SQLite built without the dbstat table
+            return cursor.fetchone()[0]
+        return None
@@ -0,0 +1,99 @@
+import datetime
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from crm_api.activity import activity_log_buffer
+from crm_api.benchmarks import CASES, SKIPPED, EndpointBenchmark, case_name, compare, row_counts, uncovered_routes
+from crm_api.seed import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a throwaway test database to each --scale in turn and measure latency, query count and peak "
+        "memory of every API endpoint, writing the results as JSON (see crm_api/benchmarks.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[1, 10], help='Seed scales to measure at, ascending.')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per endpoint.')
+        parser.add_argument('--case', action='append', default=[], help='Only cases containing this text (repeatable).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='JSON file to write (default: benchmark-<timestamp>.json).')
+        parser.add_argument('--compare', metavar='BASELINE', help='Earlier results file to compare against.')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive')
+
+    def handle(self, *args, **options):
+        scales = options['scales']
+        if scales != sorted(set(scales)) or scales[0] < 1:
+            raise CommandError('--scales must be positive and ascending')
+        missing = uncovered_routes()
+        if missing:
+            raise CommandError(f"No benchmark case for: {', '.join(missing)} (add one to CASES or SKIPPED)")
+        cases = [case for case in CASES if not options['case'] or any(text in case_name(case) for text in options['case'])]
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)
+
+        started_at = datetime.datetime.now(datetime.timezone.utc)
+        output = options['output'] or f"benchmark-{started_at:%Y%m%dT%H%M%S}.json"
+        report = {
+            'created_at': started_at.isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'iterations': options['iterations'],
+            'skipped': SKIPPED,
+            'scales': [],
+        }
+
+        # Never measured against real data: a test database is created,
+        # seeded and destroyed like the test runner does.
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=not options['interactive'], serialize=False)
+        try:
+            seeded = 0
+            for scale in scales:
+                self.stdout.write(f'Seeding to scale {scale}...')
+                Seeder(scale - seeded, seed=options['seed'] + scale).run()
+                seeded = scale
+                results = EndpointBenchmark(options['iterations']).run(cases)
+                report['scales'].append({'scale': scale, 'rows': row_counts(), 'results': results})
+                self.print_results(scale, results)
+        finally:
+            activity_log_buffer.stop()  # Its writer thread would outlive the database
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(output, 'w') as handle:
+            json.dump(report, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {output}'))
+        if baseline is not None:
+            self.print_comparison(compare(baseline, report))
+
+    def print_results(self, scale, results):
+        self.stdout.write(
+            f"{'scale ' + str(scale):<34}{'status':>7}{'queries':>8}{'median ms':>11}{'p95 ms':>10}"
+            f"{'peak KiB':>10}{'bytes':>10}"
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['case']:<34}{result['status']:>7}{result['queries']:>8}{result['median_ms']:>11.2f}"
+                f"{result['p95_ms']:>10.2f}{result['peak_memory_kib']:>10.1f}{result['response_bytes']:>10}"
+            )
+
+    def print_comparison(self, rows):
+        self.stdout.write(f"{'scale':<7}{'case':<34}{'median ms':>20}{'change':>9}{'queries':>10}{'peak KiB':>20}")
+        for scale, name, old, new in rows:
+            change = (new['median_ms'] - old['median_ms']) / old['median_ms'] * 100 if old['median_ms'] else 0.0
+            self.stdout.write(
+                f"{scale:<7}{name:<34}{old['median_ms']:>9.2f} -> {new['median_ms']:<7.2f}{change:>+8.0f}%"
+                f"{old['queries']:>4} -> {new['queries']:<3}"
+                f"{old['peak_memory_kib']:>9.1f} -> {new['peak_memory_kib']:<8.1f}"
+            )
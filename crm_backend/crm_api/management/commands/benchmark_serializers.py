@@ -0,0 +1,72 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from crm_api.renderers import FastJSONRenderer, MessagePackRenderer
+from crm_api.serializers import (
+    AccountSerializer, ActivityLogSerializer, ContactSerializer, LeadSerializer, NoteSerializer,
+    OpportunitySerializer, QuoteSerializer, TaskSerializer, UserSerializer,
+)
+
+SERIALIZERS = (
+    UserSerializer, AccountSerializer, ContactSerializer, OpportunitySerializer, LeadSerializer,
+    ActivityLogSerializer, TaskSerializer, QuoteSerializer, NoteSerializer,
+)
+RENDERERS = (JSONRenderer, FastJSONRenderer, MessagePackRenderer)
+
+
+def drf_page(serializer_class, queryset):
+    return JSONRenderer().render(serializer_class(serializer_class.optimize_queryset(queryset), many=True).data)
+
+
+def compiled_page(serializer_class, queryset):
+    compiled = serializer_class.get_compiled()
+    return JSONRenderer().render(compiled.render(compiled.values(queryset)))
+
+
+def median_ms(render, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        render(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time one page of each list endpoint rendered by its DRF serializer and by the compiled values() "
+        "version (see crm_api/compiled.py), checking that both give the same bytes, then the time each "
+        "renderer takes to encode the page. Reads the current database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help='Rows per page (the largest page_size is 500).')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{options['rows']} rows per page, median of {options['repeat']}")
+        self.stdout.write(f"{'serializer':<26}{'rows':>6}{'DRF ms':>10}{'compiled ms':>13}{'speedup':>9}")
+        pages = []
+        for serializer_class in SERIALIZERS:
+            name = serializer_class.__name__
+            queryset = serializer_class.Meta.model.objects.order_by('-id')[:options['rows']]
+            pages.append((name, serializer_class(serializer_class.optimize_queryset(queryset), many=True).data))
+            if serializer_class.get_compiled() is None:
+                self.stdout.write(f'{name:<26}{"not compiled":>38}')
+                continue
+            expected = drf_page(serializer_class, queryset)
+            if compiled_page(serializer_class, queryset) != expected:
+                raise CommandError(f'{name}: the compiled output differs from the serializer')
+            drf = median_ms(drf_page, options['repeat'], serializer_class, queryset)
+            compiled = median_ms(compiled_page, options['repeat'], serializer_class, queryset)
+            self.stdout.write(
+                f'{name:<26}{queryset.count():>6}{drf:>10.2f}{compiled:>13.2f}{drf / compiled:>8.1f}x'
+            )
+
+        self.stdout.write(f"{'render ms':<26}" + ''.join(f'{renderer.__name__:>22}' for renderer in RENDERERS))
+        for name, data in pages:
+            timings = [median_ms(renderer().render, options['repeat'], data) for renderer in RENDERERS]
+            self.stdout.write(f'{name:<26}' + ''.join(f'{timing:>22.2f}' for timing in timings))
@@ -0,0 +1,150 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from crm_api.models import Account, Contact, Opportunity, Lead, ActivityLog, Task, Quote, Note
+from crm_api.pagination import KeysetPagination
+from crm_api.serializers import (
+    AccountSerializer, ContactSerializer, OpportunitySerializer, LeadSerializer, TaskSerializer, QuoteSerializer,
+    NoteSerializer,
+)
+
+
+def list_page(serializer_class, queryset, ordering=KeysetPagination.ordering):
+    # The same query list_response() runs.
+    paginator = KeysetPagination(ordering=ordering)
+    compiled = serializer_class.get_compiled()
+    if compiled is not None:
+        queryset = compiled.values(queryset, paginator.ordering_fields)
+    else:
+        queryset = serializer_class.optimize_queryset(queryset, extra_fields=paginator.ordering_fields)
+    return queryset.order_by(*paginator.ordering)[:paginator.page_size + 1]
+
+
+def explain(queryset, **options):
+    # QuerySet.explain() mishandles querysets that filter on a window
+    # function, so prefix the compiled SQL ourselves.
+    sql, params = queryset.query.sql_with_params()
+    prefix = connection.ops.explain_query_prefix(**options)
+    with connection.cursor() as cursor:
+        cursor.execute(f'{prefix} {sql}', params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def uses_index(plan, index):
+    """Whether ``plan`` scans ``index`` or, on a partitioned table, one of its per-partition indexes."""
+    if index in plan:
+        return True
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [index],
+        )
+        return any(name in plan for name, in cursor.fetchall())
+
+
+def view_queries():
+    """
+    (label, queryset, index the plan is expected to use) for each view. The
+    index may be a tuple when the planner can pick any of them depending on
+    data distribution.
+    """
+    return [
+        ('account_list_create', list_page(AccountSerializer, Account.objects.all()), 'account_created_idx'),
+        ('contact_list_create', list_page(ContactSerializer, Contact.objects.all()), 'contact_created_idx'),
+        ('opportunity_list_create', list_page(OpportunitySerializer, Opportunity.objects.all()), 'opportunity_created_idx'),
+        ('lead_list_create', list_page(LeadSerializer, Lead.objects.all()), 'lead_created_idx'),
+        ('task_list_create', list_page(TaskSerializer, Task.objects.all()), 'task_created_idx'),
+        ('quote_list_create', list_page(QuoteSerializer, Quote.objects.all()), 'quote_created_idx'),
+        ('note_list_create', list_page(NoteSerializer, Note.objects.all()), 'note_created_idx'),
+        (
+            'note_list_create (related_to)',
+            list_page(NoteSerializer, Note.objects.filter(related_to_type='Account', related_to_id=1)),
+            'note_related_created_idx',
+        ),
+        (
+            'lead_list_create (status)',
+            list_page(LeadSerializer, Lead.objects.filter(status='New')),
+            'lead_status_created_idx',
+        ),
+        (
+            'opportunity_list_create (sales_stage)',
+            list_page(OpportunitySerializer, Opportunity.objects.filter(sales_stage='Prospecting')),
+            'opportunity_stage_created_idx',
+        ),
+        (
+            'task_list_create (mine, open, due this week)',
+            list_page(
+                TaskSerializer,
+                Task.objects.filter(
+                    assigned_to_id=1,
+                    status__in=['Not Started', 'In Progress'],
+                    due_date__gte=datetime.date(2025, 1, 6),
+                    due_date__lte=datetime.date(2025, 1, 12),
+                ),
+                ordering=('due_date', 'id'),
+            ),
+            ('task_assignee_status_due_idx', 'task_due_date_idx'),
+        ),
+        (
+            'user_activity_logs',
+            ActivityLog.objects.filter(user_id=1).order_by('-timestamp')[:10],
+            'activitylog_user_ts_idx',
+        ),
+        (
+            'dashboard_metrics (customers)',
+            Account.objects.filter(account_type='Customer').values('id'),
+            'account_type_idx',
+        ),
+        (
+            'dashboard_metrics (tasks by status)',
+            Task.objects.filter(status__in=[choice for choice, _ in Task.status_choices]).annotate(row_number=Window(
+                RowNumber(), partition_by=F('status'), order_by=F('modified_at').desc(),
+            )).filter(row_number__lte=3).values('id', 'status'),
+            'task_status_modified_idx',
+        ),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the query behind each list/dashboard view. Use against a "
+        "seeded database; --check fails if a view no longer uses its index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Exit with an error if an expected index is not used.')
+        parser.add_argument('--analyze', action='store_true', help='Use EXPLAIN ANALYZE (PostgreSQL only).')
+
+    def handle(self, *args, **options):
+        missing = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small or freshly seeded tables make sequential scans look
+                # cheapest; we want to know whether an index *can* be used.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for label, queryset, indexes in view_queries():
+                indexes = (indexes,) if isinstance(indexes, str) else indexes
+                explain_options = {'analyze': True} if options['analyze'] and connection.vendor == 'postgresql' else {}
+                plan = explain(queryset, **explain_options)
+                used = next((index for index in indexes if uses_index(plan, index)), None)
+                if not used:
+                    missing.append(label)
+                self.stdout.write(self.style.MIGRATE_HEADING(label))
+                self.stdout.write(plan)
+                if used:
+                    self.stdout.write(self.style.SUCCESS(f'uses {used}'))
+                else:
+                    self.stdout.write(self.style.WARNING(f"does not use {' or '.join(indexes)}"))
+                self.stdout.write('')
+
+        if missing and options['check']:
+            raise CommandError(f"Expected index not used by: {', '.join(missing)}")
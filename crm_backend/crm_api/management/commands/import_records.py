@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_api.importer import IMPORTERS, run_import
+from crm_api.models import ImportJob, User
+
+
+class Command(BaseCommand):
+    help = "Import accounts, contacts, leads or opportunities from a .csv or .xlsx file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=sorted(IMPORTERS))
+        parser.add_argument('file')
+        parser.add_argument('--user', required=True, help='Username recorded as creator of the imported rows.')
+        parser.add_argument('--workers', type=int, default=None, help='Validation processes (0 validates inline).')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first()
+        if not user:
+            raise CommandError(f"User {options['user']} not found")
+
+        job = ImportJob.objects.create(entity=options['model'], file_name=options['file'], created_by=user)
+        self.stdout.write(f'Import job {job.id} started')
+        job = run_import(job, options['file'], workers=options['workers'])
+
+        summary = (
+            f'{job.processed_rows} rows processed: {job.created_rows} created, '
+            f'{job.duplicate_rows} duplicates skipped, {job.failed_rows} failed'
+        )
+        for error in job.errors[:20]:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        if job.status == 'Failed':
+            raise CommandError(f'{summary}. Import failed: {job.message}')
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from crm_api.activity import activity_settings
+from crm_api.retention import apply_retention, ensure_partitions, is_partitioned
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming ActivityLog partitions and drop (optionally archiving) months past the "
+        "retention period. Run it daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        config = activity_settings()
+        parser.add_argument(
+            '--retention-months', type=int, default=config['RETENTION_MONTHS'],
+            help='Whole months kept before the current one.',
+        )
+        parser.add_argument(
+            '--archive-dir', default=config['ARCHIVE_DIR'],
+            help='Write expired months here as activitylog-YYYY-MM.csv.gz before dropping them.',
+        )
+        parser.add_argument(
+            '--months-ahead', type=int, default=config['PARTITIONS_AHEAD'],
+            help='Monthly partitions to keep created ahead of time (PostgreSQL).',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be removed.')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if is_partitioned() and not dry_run:
+            for month in ensure_partitions(options['months_ahead']):
+                self.stdout.write(f'{month:%Y-%m}: partition created')
+
+        results = apply_retention(options['retention_months'], options['archive_dir'], dry_run=dry_run)
+        for month, action, rows in results:
+            verb = f'would be {action}' if dry_run else action
+            detail = f' ({rows} rows)' if rows is not None else ''
+            self.stdout.write(f'{month:%Y-%m}: {verb}{detail}')
+        self.stdout.write(self.style.SUCCESS(f'{len(results)} months expired'))
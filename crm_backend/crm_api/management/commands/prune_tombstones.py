@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from crm_api.sync import prune_tombstones, sync_settings
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete sync tombstones (records of deletes for /api/sync/) older than the retention period. "
+        "Clients with an older sync token must then sync again from scratch. Run it daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=sync_settings()['TOMBSTONE_DAYS'], help='Days of tombstones kept.',
+        )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'{deleted} tombstones deleted'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from crm_api.querystats import ORDERINGS, report, reset_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the query fingerprints recorded by the running servers, per view, with their "
+        "slowest samples. Reads the snapshots every worker writes to QUERY_STATS['SNAPSHOT_DIR']."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Only this URL name, e.g. dashboard-metrics.')
+        parser.add_argument('--order', choices=sorted(ORDERINGS), default='total')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--samples', action='store_true', help='Also print the slowest samples.')
+        parser.add_argument('--reset', action='store_true', help='Forget everything recorded so far.')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            reset_stats()
+            self.stdout.write(self.style.SUCCESS('Query stats reset'))
+            return
+
+        data = report(view=options['view'], order=options['order'], limit=options['limit'])
+        for row in data['results']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{row['view']}  [{row['fingerprint']}]"))
+            self.stdout.write(
+                f"  {row['count']} calls, total {row['total_ms']:.1f} ms, mean {row['mean_ms']:.2f} ms, "
+                f"p95 {row['p95_ms']:.2f} ms, max {row['max_ms']:.2f} ms"
+            )
+            self.stdout.write(f"  {row['sql']}")
+            if options['samples']:
+                for sample in row['samples']:
+                    params = f"  {sample['params']}" if sample['params'] is not None else ''  # See KEEP_PARAMS
+                    self.stdout.write(f"    {sample['duration_ms']:.2f} ms  {sample['origin']}{params}")
+        if data['dropped']:
+            self.stdout.write(self.style.WARNING(f"{data['dropped']} queries not tracked (MAX_FINGERPRINTS reached)"))
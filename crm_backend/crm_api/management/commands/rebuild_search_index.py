@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_api.models import SearchEntry
+from crm_api.search import SOURCES, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for accounts, contacts, leads and opportunities."
+
+    def add_arguments(self, parser):
+        parser.add_argument('entities', nargs='*', help=f"Entities to rebuild: {', '.join(sorted(SOURCES))} (default: all).")
+        parser.add_argument('--clear', action='store_true', help='Delete existing entries first.')
+
+    def handle(self, *args, **options):
+        unknown = set(options['entities']) - set(SOURCES)
+        if unknown:
+            raise CommandError(f"Unknown entity: {', '.join(sorted(unknown))}")
+
+        for entity in options['entities'] or sorted(SOURCES):
+            if options['clear']:
+                SearchEntry.objects.filter(entity=entity).delete()
+            count = rebuild_index(entity)
+            self.stdout.write(f'{entity}: {count} rows indexed')
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
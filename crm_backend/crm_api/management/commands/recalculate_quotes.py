@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from crm_api.models import Quote
+from crm_api.quotes import BATCH_SIZE, recalculate_quotes
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored totals of quotes from their line items."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='Quote ids to recalculate (default: all).')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Quotes updated per statement.')
+
+    def handle(self, *args, **options):
+        quotes = Quote.objects.filter(id__in=options['ids']) if options['ids'] else Quote.objects.all()
+        count = recalculate_quotes(quotes, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{count} quotes recalculated'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from crm_api.seed import CHUNK_SIZE, PASSWORD, ROWS_PER_SCALE, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Add synthetic users, accounts, contacts, leads, opportunities, tasks, quotes, notes and activity logs "
+        "(--scale 1 is about 4,000 rows; see crm_api/seed.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Multiplier for the row counts.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Rows per COPY / bulk_create call.')
+
+    def handle(self, *args, **options):
+        if options['scale'] < 1:
+            raise CommandError('--scale must be at least 1')
+        total = sum(ROWS_PER_SCALE.values()) * options['scale']
+        self.stdout.write(f"Seeding about {total:,} rows (scale {options['scale']})")
+        seeder = Seeder(options['scale'], seed=options['seed'], chunk_size=options['chunk_size'], stdout=self.stdout)
+        counts = seeder.run()
+        created = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'{created:,} rows in {seeder.elapsed:.1f}s ({created / seeder.elapsed * 60:,.0f} rows/min, '
+            f'search index included); every user\'s password is "{PASSWORD}"'
+        ))
@@ -0,0 +1,200 @@
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+
+from .activity import activity_log_buffer
+
+DEFAULTS = {
+    # Measure every request (a few microseconds each).
+    'ENABLED': True,
+    # Who gets the per-request breakdown as a Server-Timing header: 'admins'
+    # (superusers), True for everyone, or False. Query counts and timings
+    # help to probe the server, so not everyone by default.
+    'SERVER_TIMING': 'admins',
+    # Upper bounds (seconds) of the latency histogram buckets.
+    'BUCKETS': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+    # /metrics answers admins' JWTs and, when set, "Authorization: Bearer <TOKEN>".
+    'TOKEN': None,
+    # Serve /metrics to anyone, e.g. when only the scraper can reach it.
+    'PUBLIC': False,
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+current_request = ContextVar('crm_request_metrics', default=None)
+
+
+def metrics_settings():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+class RequestMetrics:
+    """What one request spent, filled in by RequestMetricsMiddleware and the hooks below."""
+
+    __slots__ = ('queries', 'sql_time', 'serialize_time', 'render_time', 'serializing', '_render_started')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.serializing = False
+        self._render_started = None
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper() for the whole request.
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.queries += 1
+
+    def render_starting(self):
+        self._render_started = perf_counter()
+
+    def rendered(self, response):
+        # Post-render callback: must return None to keep the response.
+        if self._render_started is not None:
+            self.render_time += perf_counter() - self._render_started
+
+    def server_timing(self, duration):
+        # SQL run while serializing counts towards both db and serialize.
+        return (
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries", '
+            f'serialize;dur={self.serialize_time * 1000:.1f}, '
+            f'render;dur={self.render_time * 1000:.1f}, '
+            f'total;dur={duration * 1000:.1f}'
+        )
+
+
+@contextmanager
+def serialization_timer():
+    """Count the enclosed time as serialization on the current request (outermost call only)."""
+    metrics = current_request.get()
+    if metrics is None or metrics.serializing:
+        yield
+        return
+    metrics.serializing = True
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serialize_time += perf_counter() - started
+        metrics.serializing = False
+
+
+class ViewStats:
+    __slots__ = ('buckets', 'duration', 'queries', 'sql_time', 'serialize_time', 'render_time', 'response_bytes', 'statuses')
+
+    def __init__(self, bucket_count):
+        self.buckets = [0] * (bucket_count + 1)  # the last one is +Inf
+        self.duration = 0.0
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.response_bytes = 0
+        self.statuses = {}
+
+    def copy(self):
+        copied = ViewStats(0)
+        for attr in self.__slots__:
+            setattr(copied, attr, getattr(self, attr))
+        copied.buckets = list(self.buckets)
+        copied.statuses = dict(self.statuses)
+        return copied
+
+
+class MetricsRegistry:
+    """
+    Aggregates request metrics per (URL name, method) and renders them in
+    the Prometheus text format.
+
+    Counters live in process memory: with several worker processes each
+    scrape reports the worker that served it, so scrape workers separately
+    (or run one per pod) rather than summing across a load balancer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, method, status, duration, metrics, response_bytes, buckets):
+        index = bisect_left(buckets, duration)
+        with self._lock:
+            stats = self._views.get((view, method))
+            if stats is None:
+                stats = self._views[(view, method)] = ViewStats(len(buckets))
+            stats.buckets[index] += 1
+            stats.duration += duration
+            stats.queries += metrics.queries
+            stats.sql_time += metrics.sql_time
+            stats.serialize_time += metrics.serialize_time
+            stats.render_time += metrics.render_time
+            stats.response_bytes += response_bytes or 0
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def render(self, buckets):
+        with self._lock:
+            views = sorted((key, stats.copy()) for key, stats in self._views.items())
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        family('crm_request_duration_seconds', 'histogram', 'Request latency by URL name and method.')
+        for (view, method), stats in views:
+            labels = f'view="{escape(view)}",method="{method}"'
+            cumulative = 0
+            for bound, count in zip([*buckets, '+Inf'], stats.buckets):
+                cumulative += count
+                lines.append(f'crm_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'crm_request_duration_seconds_sum{{{labels}}} {stats.duration}')
+            lines.append(f'crm_request_duration_seconds_count{{{labels}}} {cumulative}')
+
+        family('crm_requests_total', 'counter', 'Requests by URL name, method and status code.')
+        for (view, method), stats in views:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(f'crm_requests_total{{view="{escape(view)}",method="{method}",status="{status}"}} {count}')
+
+        totals = (
+            ('crm_db_queries_total', 'SQL queries run.', 'queries'),
+            ('crm_db_query_seconds_total', 'Time spent in SQL.', 'sql_time'),
+            ('crm_serialization_seconds_total', 'Time spent in serializer .data.', 'serialize_time'),
+            ('crm_render_seconds_total', 'Time spent rendering responses.', 'render_time'),
+            ('crm_response_bytes_total', 'Response body bytes (streamed responses excluded).', 'response_bytes'),
+        )
+        for name, help_text, attr in totals:
+            family(name, 'counter', help_text)
+            for (view, method), stats in views:
+                lines.append(f'{name}{{view="{escape(view)}",method="{method}"}} {getattr(stats, attr)}')
+
+        buffer_stats = activity_log_buffer.stats()
+        family('crm_activity_log_queued', 'gauge', 'Activity log entries waiting to be written.')
+        lines.append(f"crm_activity_log_queued {buffer_stats['queued']}")
+        for key in ('enqueued', 'dropped', 'written', 'failed'):
+            family(f'crm_activity_log_{key}_total', 'counter', f'Activity log entries {key}.')
+            lines.append(f'crm_activity_log_{key}_total {buffer_stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+registry = MetricsRegistry()
@@ -1,6 +1,134 @@
+import sys
+import threading
+from time import perf_counter
+
 from .models import ActivityLog
+from .activity import activity_log_buffer, activity_settings, should_log
+from .authentication import is_superuser_request
+from .metrics import RequestMetrics, current_request, metrics_settings, registry, view_name
+from .profiling import profiler_settings, sampler, save_profile, view_label
+from .querystats import QueryRecorder, query_stats_settings, recording
+from .renderers import compression_settings
+from .routes import encode_endpoint
+from django.db import connection
+from django.http import FileResponse
+from django.middleware.gzip import GZipMiddleware
 from django.utils.timezone import now
 
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware with a size threshold: bodies under
+    ``COMPRESSION['MIN_SIZE']`` bytes are sent as they are. Streamed
+    responses (``?stream=1`` lists) are always compressed; exports, which
+    gzip themselves, are left alone. Like GZipMiddleware it pads the
+    output at random against BREACH.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < compression_settings()['MIN_SIZE']:
+            return response
+        return super().process_response(request, response)
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures each request (queries, SQL time, serializer ``.data`` time,
+    rendering time, response size), adds a Server-Timing header (for admins
+    by default) and feeds the per-view counters served at /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = metrics_settings()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        started = perf_counter()
+        try:
+            with connection.execute_wrapper(metrics.execute_wrapper):
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        duration = perf_counter() - started
+
+        size = None if response.streaming else len(response.content)
+        registry.observe(
+            view_name(request), request.method, response.status_code, duration, metrics, size, config['BUCKETS'],
+        )
+        if config['SERVER_TIMING'] == 'admins':
+            # DRF authenticates inside the view and sets request.user.
+            user = getattr(request, 'user', None)
+            send_timing = user is not None and user.is_authenticated and user.is_superuser
+        else:
+            send_timing = config['SERVER_TIMING']
+        if send_timing:
+            response['Server-Timing'] = metrics.server_timing(duration)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook returns.
+        metrics = current_request.get()
+        if metrics is not None:
+            metrics.render_starting()
+            response.add_post_render_callback(metrics.rendered)
+        return response
+
+
+class QueryStatsMiddleware:
+    """Fingerprints and times every query of the request (see querystats.py)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = query_stats_settings()
+        if not config['ENABLED']:
+            return self.get_response(request)
+        recorder = QueryRecorder(request, config)
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        if response.streaming and not response.is_async and not isinstance(response, FileResponse):
+            # The body's queries run as the server iterates it, after we return.
+            response.streaming_content = recording(response.streaming_content, recorder)
+        return response
+
+
+class ProfilerMiddleware:
+    """
+    Samples the request's stack (see profiling.py) and saves a collapsed-stack
+    profile when it took longer than THRESHOLD or an admin sent HEADER.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = profiler_settings()
+        # Checked up front: the sampler isn't started for anyone else's header.
+        forced = config['HEADER'] in request.headers and is_superuser_request(request)
+        if not (config['ENABLED'] or forced):
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        # Frames from here up belong to the server, not the request.
+        samples = sampler.start(thread_id, sys._getframe(), config['INTERVAL'])
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            sampler.stop(thread_id)
+        duration = perf_counter() - started
+
+        if samples and ((config['ENABLED'] and duration >= config['THRESHOLD']) or forced):
+            save_profile(view_label(request), samples, duration, config)
+        return response
+
+
 class ActivityLoggerMiddleware:
     def __init__(self, get_response):
         self.get_response = get_response
@@ -9,12 +137,24 @@ class ActivityLoggerMiddleware:
         response = self.get_response(request)
 
         if request.user.is_authenticated:
-            ActivityLog.objects.create(
-                user=request.user,
-                action=f"{request.method} request to {request.path.replace('/api', '')}",
-                method=request.method,
-                endpoint=request.path.replace("/api", ""),
+            config = activity_settings()
+            if not should_log(request, config):
+                return response
+
+            endpoint = request.path.replace("/api", "")
+            route, object_id, path = encode_endpoint(endpoint, getattr(request, "resolver_match", None))
+            entry = ActivityLog(
+                user_id=request.user.pk,
+                method=ActivityLog.method_code(request.method),
+                route=route,
+                object_id=object_id,
+                path=path,
                 timestamp=now()
             )
+            if config['ASYNC']:
+                # Queued and written in batches by a background thread
+                activity_log_buffer.add(entry, config)
+            else:
+                entry.save()
 
         return response
\ No newline at end of file
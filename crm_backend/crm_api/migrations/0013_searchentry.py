@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:32
+
+from django.db import migrations, models
+
+
+def add_search_document(apps, schema_editor):
+    # Full-text search is PostgreSQL-only; other backends use the
+    # LIKE-based fallback in crm_api/search.py.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE crm_api_searchentry ADD COLUMN document tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(content, '')), 'C')"
+        ") STORED"
+    )
+    schema_editor.execute(
+        "CREATE INDEX searchentry_document_idx ON crm_api_searchentry USING GIN (document)"
+    )
+
+
+def remove_search_document(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("ALTER TABLE crm_api_searchentry DROP COLUMN document")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_api', '0012_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('account', 'Account'), ('contact', 'Contact'), ('lead', 'Lead'), ('opportunity', 'Opportunity')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('content', models.TextField(blank=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('entity', 'object_id'), name='searchentry_unique_object')],
+            },
+        ),
+        migrations.RunPython(add_search_document, remove_search_document),
+    ]
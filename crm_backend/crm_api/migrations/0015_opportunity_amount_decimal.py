@@ -0,0 +1,79 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:40
+
+import logging
+import re
+import unicodedata
+from decimal import Decimal
+
+from django.db import migrations, models, transaction
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+MAX_AMOUNT = Decimal('999999999999.99')
+CURRENCY_CODES = re.compile(r'^(USD|INR|RS\.?)|(USD|INR)$', re.IGNORECASE)
+# Plain digits, or commas between groups of three (1,200,000) or in lakh
+# grouping (12,00,000); an optional decimal part.
+NUMBER = re.compile(r'^-?(\d+|\d{1,3}(,\d{3})+|\d{1,2}(,\d{2})*,\d{3})(\.\d+)?$')
+
+
+def parse_amount(value):
+    """
+    The free-text amount as a Decimal, or None if it isn't a plain number.
+    Only currency symbols and codes, spaces and thousands separators are
+    dropped: "10k" or "1e3" are reported rather than read as 10 or 13.
+    """
+    cleaned = ''.join(char for char in value or '' if unicodedata.category(char) != 'Sc' and not char.isspace())
+    cleaned = CURRENCY_CODES.sub('', cleaned)
+    if not NUMBER.match(cleaned):
+        return None
+    amount = Decimal(cleaned.replace(',', '')).quantize(Decimal('0.01'))
+    return amount if abs(amount) <= MAX_AMOUNT else None
+
+
+def backfill_amounts(apps, schema_editor):
+    for model_name in ('Lead', 'Opportunity'):
+        model = apps.get_model('crm_api', model_name)
+        last_id = 0
+        while True:
+            rows = list(
+                model.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'opportunity_amount')[:BATCH_SIZE]
+            )
+            if not rows:
+                break
+            updates = []
+            for pk, value in rows:
+                amount = parse_amount(value)
+                if amount is None:
+                    # Left NULL; 0016 stops until these are fixed by hand.
+                    logger.warning('%s %s: unparseable amount %r left NULL', model_name, pk, value)
+                updates.append(model(id=pk, amount_decimal=amount))
+            # Not atomic: each batch commits on its own, so a large table
+            # isn't rewritten in one long transaction.
+            with transaction.atomic(using=schema_editor.connection.alias):
+                model.objects.bulk_update(updates, ['amount_decimal'])
+            last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('crm_api', '0014_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='amount_decimal',
+            field=models.DecimalField(decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.AddField(
+            model_name='opportunity',
+            name='amount_decimal',
+            field=models.DecimalField(decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.RunPython(backfill_amounts, migrations.RunPython.noop),
+    ]
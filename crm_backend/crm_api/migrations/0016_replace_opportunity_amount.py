@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+def check_amounts(apps, schema_editor):
+    # 0015 leaves amounts it couldn't parse NULL (and logs them); they must
+    # be corrected before the column becomes NOT NULL.
+    unparsed = {
+        model_name: list(
+            apps.get_model('crm_api', model_name).objects.filter(amount_decimal__isnull=True)
+            .order_by('id').values_list('id', flat=True)[:20]
+        )
+        for model_name in ('Lead', 'Opportunity')
+    }
+    unparsed = {model_name: ids for model_name, ids in unparsed.items() if ids}
+    if unparsed:
+        raise RuntimeError(
+            'Set amount_decimal on these rows (first 20 ids each; their old '
+            f'opportunity_amount could not be parsed), then migrate again: {unparsed}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_api', '0015_opportunity_amount_decimal'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_amounts, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='lead',
+            name='opportunity_amount',
+        ),
+        migrations.RemoveField(
+            model_name='opportunity',
+            name='opportunity_amount',
+        ),
+        migrations.RenameField(
+            model_name='lead',
+            old_name='amount_decimal',
+            new_name='opportunity_amount',
+        ),
+        migrations.RenameField(
+            model_name='opportunity',
+            old_name='amount_decimal',
+            new_name='opportunity_amount',
+        ),
+        migrations.AlterField(
+            model_name='lead',
+            name='opportunity_amount',
+            field=models.DecimalField(decimal_places=2, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='opportunity',
+            name='opportunity_amount',
+            field=models.DecimalField(decimal_places=2, max_digits=14),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-18 19:39
+
+from decimal import Decimal
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_quote_number_sequence(apps, schema_editor):
+    # Quote numbers come from a sequence on PostgreSQL (see
+    # models.next_quote_number); start it after any existing quote.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("CREATE SEQUENCE IF NOT EXISTS crm_api_quote_number_seq")
+    schema_editor.execute(
+        "SELECT setval('crm_api_quote_number_seq', COALESCE(MAX(quote_number), 0) + 1, false) FROM crm_api_quote"
+    )
+
+
+def drop_quote_number_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP SEQUENCE IF EXISTS crm_api_quote_number_seq")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_api', '0016_replace_opportunity_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuoteLineItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('product_name', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True, null=True)),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=12, validators=[django.core.validators.MinValueValidator(Decimal(0))])),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal(0))])),
+                ('discount_percent', models.DecimalField(decimal_places=2, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(Decimal(0)), django.core.validators.MaxValueValidator(Decimal(100))])),
+                ('tax_percent', models.DecimalField(decimal_places=2, default=0, max_digits=5, validators=[django.core.validators.MinValueValidator(Decimal(0)), django.core.validators.MaxValueValidator(Decimal(100))])),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='quote',
+            name='quote_number',
+            field=models.IntegerField(blank=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['-created_at', '-id'], name='quote_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='quotelineitem',
+            name='quote',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='line_items', to='crm_api.quote'),
+        ),
+        migrations.RunPython(create_quote_number_sequence, drop_quote_number_sequence),
+    ]
@@ -0,0 +1,125 @@
+import datetime
+import re
+
+from django.db import migrations, transaction
+
+TABLE = 'crm_api_activitylog'
+SEQUENCE = 'crm_api_activitylog_id_seq'
+MONTHS_AHEAD = 3
+COPY_BATCH_SIZE = 50000
+INDEX_NAME_RE = re.compile(r'CREATE (UNIQUE )?INDEX (\S+) ')
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def table_definitions(cursor, table):
+    """The ``CREATE INDEX`` statements and foreign keys of ``table``, minus its primary key."""
+    cursor.execute(
+        "SELECT indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN "
+        "(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'p')",
+        [table, table],
+    )
+    indexes = [
+        # Indexes of a partitioned table are reported as "ON ONLY <table>".
+        re.sub(r' ON (ONLY )?\S+ ', f' ON {TABLE} ', indexdef, count=1)
+        for indexdef, in cursor.fetchall()
+    ]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+        [table],
+    )
+    return indexes, cursor.fetchall()
+
+
+def rebuild_table(schema_editor, partitioned):
+    """
+    Move crm_api_activitylog into a new table (partitioned by month or
+    plain), keeping the index and constraint names Django knows about.
+
+    The old table is renamed and the new one created with its keys and
+    indexes in one short transaction; from then on requests write to the
+    new table. The old rows follow in id ranges, each range committed on
+    its own, so the log is never locked for a single table-sized copy.
+    """
+    connection = schema_editor.connection
+    execute = schema_editor.execute
+    old = f'{TABLE}_old'
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            indexes, foreign_keys = table_definitions(cursor, TABLE)
+            cursor.execute(f'SELECT MIN("timestamp"), MIN(id), MAX(id) FROM {TABLE}')
+            first, min_id, max_id = cursor.fetchone()
+            cursor.execute(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")
+            old_sequence, = cursor.fetchone()
+
+        execute(f'ALTER TABLE {TABLE} RENAME TO {old}')
+        # Free the names the new table's keys, indexes and sequence take.
+        execute(f'ALTER INDEX {TABLE}_pkey RENAME TO {old}_pkey')
+        for indexdef in indexes:
+            execute(f'DROP INDEX {INDEX_NAME_RE.match(indexdef)[2]}')
+        if old_sequence:
+            execute(f'ALTER SEQUENCE {old_sequence} RENAME TO {old}_id_seq')
+
+        if partitioned:
+            execute(f'CREATE TABLE {TABLE} (LIKE {old}) PARTITION BY RANGE ("timestamp")')
+            this_month = datetime.datetime.now(datetime.timezone.utc).date().replace(day=1)
+            month = min(first.date().replace(day=1), this_month) if first else this_month
+            while month <= add_months(this_month, MONTHS_AHEAD):
+                execute(
+                    f'CREATE TABLE {TABLE}_p{month:%Y_%m} PARTITION OF {TABLE} '
+                    f"FOR VALUES FROM ('{month} 00:00+00') TO ('{add_months(month, 1)} 00:00+00')"
+                )
+                month = add_months(month, 1)
+            execute(f'CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT')
+            # The partition key has to be part of the primary key, and identity
+            # columns are not supported on partitioned tables before PostgreSQL 17.
+            execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id, "timestamp")')
+            execute(f'CREATE SEQUENCE {SEQUENCE} OWNED BY {TABLE}.id')
+            execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        else:
+            execute(f'CREATE TABLE {TABLE} (LIKE {old})')
+            execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY (id)')
+            execute(f'ALTER TABLE {TABLE} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+        # New rows are numbered after every old one, so the copy can't collide.
+        execute(f"SELECT setval(pg_get_serial_sequence('{TABLE}', 'id'), {(max_id or 0) + 1}, false)")
+        for indexdef in indexes:
+            execute(indexdef)
+        for name, definition in foreign_keys:
+            execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {name} {definition}')
+
+    for start in range(min_id or 0, (max_id or 0) + 1, COPY_BATCH_SIZE):
+        with transaction.atomic(using=connection.alias):
+            execute(f'INSERT INTO {TABLE} SELECT * FROM {old} WHERE id >= {start} AND id < {start + COPY_BATCH_SIZE}')
+    # Drops the old sequence and foreign keys with it.
+    execute(f'DROP TABLE {old}')
+
+
+def partition_activitylog(apps, schema_editor):
+    # Monthly range partitions on PostgreSQL, so old months can be dropped
+    # whole (see crm_api/retention.py). Other backends keep a plain table.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    rebuild_table(schema_editor, partitioned=True)
+
+
+def unpartition_activitylog(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    rebuild_table(schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    # rebuild_table() commits as it goes.
+    atomic = False
+
+    dependencies = [
+        ('crm_api', '0017_quote_line_items'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_activitylog, unpartition_activitylog),
+    ]
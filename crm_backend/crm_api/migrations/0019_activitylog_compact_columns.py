@@ -0,0 +1,127 @@
+import re
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+METHOD_CODES = {'GET': 1, 'POST': 2, 'PUT': 3, 'PATCH': 4, 'DELETE': 5, 'HEAD': 6, 'OPTIONS': 7}
+MAX_PATH_LENGTH = 255
+
+# routes.ROUTE_IDS and the endpoints of urls.py as they were when this
+# migration was written, so later URL changes can't alter the backfill.
+# Routes with string arguments (user-detail, current-user) always kept
+# the path, so they aren't listed.
+ROUTES = {
+    '/login/': 1,
+    '/logout/': 2,
+    '/create-user/': 3,
+    '/users/': 4,
+    '/choices/': 7,
+    '/user-choices/': 8,
+    '/accounts/': 9,
+    '/accounts/export/': 10,
+    '/accounts/{}/': 11,
+    '/accounts/bulk/': 12,
+    '/account/choices/': 13,
+    '/contacts/': 14,
+    '/contacts/export/': 15,
+    '/contacts/{}/': 16,
+    '/contacts/bulk/': 17,
+    '/opportunities/': 18,
+    '/opportunities/export/': 19,
+    '/opportunity/{}/': 20,
+    '/opportunities/bulk/': 21,
+    '/opportunity-choices/': 22,
+    '/leads/': 23,
+    '/leads/export/': 24,
+    '/lead/{}/': 25,
+    '/leads/bulk/': 26,
+    '/lead-choices/': 27,
+    '/activity-logs/': 28,
+    '/tasks/': 29,
+    '/tasks/export/': 30,
+    '/task/{}/': 31,
+    '/dashboard-metrics/': 32,
+    '/forecast/': 33,
+    '/quotes/': 34,
+    '/quotes/export/': 35,
+    '/quote/{}/': 36,
+    '/quote-choices/': 37,
+    '/notes/': 38,
+    '/notes/export/': 39,
+    '/note/{}/': 40,
+    '/note-choices/': 41,
+    '/imports/': 42,
+    '/import/{}/': 43,
+    '/search/': 44,
+}
+# The id in an endpoint: digits the URL's int converter accepts and that
+# spell the same number again (no leading zeros).
+OBJECT_ID_RE = re.compile(r'/(0|[1-9][0-9]*)/$')
+
+
+def compact_endpoint(endpoint):
+    """
+    ``(route, object_id, path)`` as routes.encode_endpoint() produced them:
+    a route (and id) only when they give back exactly this endpoint, else
+    route 0 and the path. Endpoints were logged without the /api prefix.
+    """
+    endpoint = endpoint or ''
+    if endpoint in ROUTES:
+        return ROUTES[endpoint], None, None
+    match = OBJECT_ID_RE.search(endpoint)
+    if match:
+        route = ROUTES.get(f'{endpoint[:match.start()]}/{{}}/')
+        if route is not None:
+            return route, int(match[1]), None
+    return 0, None, endpoint[:MAX_PATH_LENGTH]
+
+
+def backfill_compact_columns(apps, schema_editor):
+    ActivityLog = apps.get_model('crm_api', 'ActivityLog')
+    last_id = 0
+    while True:
+        rows = list(
+            ActivityLog.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'method', 'endpoint')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        entries = []
+        for pk, method, endpoint in rows:
+            route, object_id, path = compact_endpoint(endpoint)
+            entries.append(ActivityLog(
+                id=pk, method_code=METHOD_CODES.get(method, 0), route=route, object_id=object_id, path=path,
+            ))
+        ActivityLog.objects.bulk_update(entries, ['method_code', 'route', 'object_id', 'path'])
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_api', '0018_partition_activitylog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitylog',
+            name='method_code',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='route',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='object_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='activitylog',
+            name='path',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.RunPython(backfill_compact_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crm_api', '0019_activitylog_compact_columns'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='activitylog',
+            name='action',
+        ),
+        migrations.RemoveField(
+            model_name='activitylog',
+            name='endpoint',
+        ),
+        migrations.RemoveField(
+            model_name='activitylog',
+            name='method',
+        ),
+        migrations.RenameField(
+            model_name='activitylog',
+            old_name='method_code',
+            new_name='method',
+        ),
+        migrations.AlterField(
+            model_name='activitylog',
+            name='method',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'OTHER'), (1, 'GET'), (2, 'POST'), (3, 'PUT'), (4, 'PATCH'), (5, 'DELETE'), (6, 'HEAD'), (7, 'OPTIONS')]),
+        ),
+        migrations.AlterField(
+            model_name='activitylog',
+            name='route',
+            field=models.PositiveSmallIntegerField(),
+        ),
+    ]
@@ -1,7 +1,13 @@
+from decimal import Decimal
+
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from django.db import models
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import connection, models
+from django.db.models.functions import Lower
 from django.utils.timezone import now as timezone_now
 
+from .routes import decode_endpoint
+
 
 class UserManager(BaseUserManager):
     def create_user(self, username, email, password=None, **extra_fields):
@@ -150,6 +156,13 @@ class Account(models.Model):
         'User', on_delete=models.SET_NULL, null=True, blank=True, related_name='modified_accounts'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='account_created_idx'),
+            models.Index(fields=['account_type'], name='account_type_idx'),
+            models.Index(fields=['modified_at', 'id'], name='account_modified_idx'),  # /api/sync/
+        ]
+
     def __str__(self):
         return self.name
 
@@ -207,7 +220,7 @@ class Lead(models.Model):
     status_description = models.TextField(blank=True, null=True)
     lead_source = models.CharField(max_length=100, choices=lead_source_choices)
     lead_source_description = models.TextField(blank=True, null=True)
-    opportunity_amount = models.CharField(max_length=10)
+    opportunity_amount = models.DecimalField(max_digits=14, decimal_places=2)
     referred_by = models.CharField(max_length=100)
     reports_to = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True)
     # campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE)
@@ -227,6 +240,16 @@ class Lead(models.Model):
     modified_at = models.DateTimeField(auto_now=True)
     modified_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="modified_leads")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='lead_created_idx'),
+            # Case-insensitive duplicate check on import
+            models.Index(Lower('email_address'), name='lead_email_lower_idx'),
+            # Lead list filtered by status
+            models.Index(fields=['status', '-created_at', '-id'], name='lead_status_created_idx'),
+            models.Index(fields=['modified_at', 'id'], name='lead_modified_idx'),  # /api/sync/
+        ]
+
     
     
     def __str__(self):
@@ -290,6 +313,14 @@ class Contact(models.Model):
     modified_at = models.DateTimeField(auto_now=True)
     modified_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="modified_contacts")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='contact_created_idx'),
+            # Case-insensitive duplicate check on import
+            models.Index(Lower('email_address'), name='contact_email_lower_idx'),
+            models.Index(fields=['modified_at', 'id'], name='contact_modified_idx'),  # /api/sync/
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
@@ -338,7 +369,7 @@ class Opportunity(models.Model):
     
     opportunity_name = models.CharField(max_length=255, null=False)
     currency = models.CharField(max_length=10, choices=currency_choices)
-    opportunity_amount = models.CharField(max_length=10)
+    opportunity_amount = models.DecimalField(max_digits=14, decimal_places=2)
     sales_stage = models.CharField(max_length=100, choices=sale_stage_choices)
     probability = models.IntegerField()
     next_step = models.CharField(max_length=255)
@@ -353,6 +384,15 @@ class Opportunity(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="created_opportunities")
     modified_at = models.DateTimeField(auto_now=True)
     modified_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="modified_opportunities")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='opportunity_created_idx'),
+            # Opportunity list filtered by stage / ranged on close date
+            models.Index(fields=['sales_stage', '-created_at', '-id'], name='opportunity_stage_created_idx'),
+            models.Index(fields=['expected_close_date'], name='opportunity_close_date_idx'),
+            models.Index(fields=['modified_at', 'id'], name='opportunity_modified_idx'),  # /api/sync/
+        ]
     
     #To make Campaign Model
     # campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE)
@@ -361,12 +401,47 @@ class Opportunity(models.Model):
         return self.opportunity_name
 
 
+# On PostgreSQL the table is range-partitioned by month on timestamp
+# (migration 0018; primary key (id, timestamp)) so expired months can be
+# dropped whole; see crm_api/retention.py.
 class ActivityLog(models.Model):
+    # Rows are kept compact: the method as a small int and the endpoint as
+    # a route id (see routes.py) plus the id captured from the URL; action
+    # and endpoint are rebuilt on read.
+    method_choices = [
+        (0, 'OTHER'),
+        (1, 'GET'),
+        (2, 'POST'),
+        (3, 'PUT'),
+        (4, 'PATCH'),
+        (5, 'DELETE'),
+        (6, 'HEAD'),
+        (7, 'OPTIONS'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="activity_logs")
-    action = models.CharField(max_length=255)  # Description of the activity
-    method = models.CharField(max_length=10)  # HTTP method (GET, POST, etc.)
-    endpoint = models.CharField(max_length=255)  # API endpoint or page
-    timestamp = models.DateTimeField(auto_now_add=True)  # When the activity occurred
+    method = models.PositiveSmallIntegerField(choices=method_choices)  # HTTP method (GET, POST, etc.)
+    route = models.PositiveSmallIntegerField()  # routes.ROUTE_IDS; 0 when the endpoint has no route
+    object_id = models.BigIntegerField(null=True, blank=True)  # The <int:...> id in the URL, if any
+    path = models.CharField(max_length=255, null=True, blank=True)  # Endpoint, only when it has no route
+    timestamp = models.DateTimeField(default=timezone_now)  # When the activity occurred
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-timestamp'], name='activitylog_user_ts_idx'),
+        ]
+
+    @classmethod
+    def method_code(cls, method):
+        return next((code for code, name in cls.method_choices if name == method), 0)
+
+    @property
+    def endpoint(self):
+        return decode_endpoint(self.route, self.object_id, self.path)
+
+    @property
+    def action(self):
+        return f"{self.get_method_display()} request to {self.endpoint}"
 
     def __str__(self):
         return f"{self.user.username} - {self.action} at {self.timestamp}"
@@ -410,6 +485,17 @@ class Task(models.Model):
     parent_type = models.CharField(max_length=100, choices=parent_type_choices)
     description = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='task_created_idx'),
+            # Dashboard: latest tasks per status
+            models.Index(fields=['status', '-modified_at'], name='task_status_modified_idx'),
+            # Task list: "my open tasks due this week", and due-date ranges
+            models.Index(fields=['assigned_to', 'status', 'due_date'], name='task_assignee_status_due_idx'),
+            models.Index(fields=['due_date'], name='task_due_date_idx'),
+            models.Index(fields=['modified_at', 'id'], name='task_modified_idx'),  # /api/sync/
+        ]
+
     def __str__(self):
         return self.subject
 
@@ -448,7 +534,7 @@ class Quote(models.Model):
         ('INR', 'INR'),
     ]
     quote_title = models.CharField(max_length=255, null=False)
-    quote_number = models.IntegerField(unique=True, null=False)
+    quote_number = models.IntegerField(unique=True, null=False, blank=True)  # Allocated on first save
     valid_until = models.DateField(null=False)
     assigned_to = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='assigned_quotes')
     approval_status = models.CharField(max_length=50, null=False, choices=approval_status_choices)
@@ -484,12 +570,58 @@ class Quote(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='created_quotes')
     modified_at = models.DateTimeField(auto_now=True)
     modified_by = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='modified_quotes')
-    
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='quote_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.quote_number is None:
+            self.quote_number = next_quote_number()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.quote_title
 
 
+QUOTE_NUMBER_SEQUENCE = 'crm_api_quote_number_seq'
+
+
+def next_quote_number():
+    """
+    Allocate the next quote number. On PostgreSQL it comes from a sequence
+    (see migration 0017), so concurrent creates never collide on the unique
+    constraint; other backends fall back to MAX + 1.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [QUOTE_NUMBER_SEQUENCE])
+            return cursor.fetchone()[0]
+    return (Quote.objects.aggregate(number=models.Max('quote_number'))['number'] or 0) + 1
+
+
+class QuoteLineItem(models.Model):
+    quote = models.ForeignKey(Quote, on_delete=models.CASCADE, related_name='line_items')
+    position = models.PositiveIntegerField(default=0)
+    product_name = models.CharField(max_length=255)
+    description = models.TextField(blank=True, null=True)
+    quantity = models.DecimalField(max_digits=12, decimal_places=2, validators=[MinValueValidator(Decimal(0))])
+    unit_price = models.DecimalField(max_digits=15, decimal_places=2, validators=[MinValueValidator(Decimal(0))])
+    discount_percent = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0, validators=[MinValueValidator(Decimal(0)), MaxValueValidator(Decimal(100))]
+    )
+    tax_percent = models.DecimalField(
+        max_digits=5, decimal_places=2, default=0, validators=[MinValueValidator(Decimal(0)), MaxValueValidator(Decimal(100))]
+    )
+
+    class Meta:
+        ordering = ['position', 'id']
+
+    def __str__(self):
+        return self.product_name
+
+
 class Note(models.Model):
     subject = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
@@ -508,5 +640,83 @@ class Note(models.Model):
     modified_at = models.DateTimeField(auto_now=True)
     modified_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="modified_notes")
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='note_created_idx'),
+            # Notes attached to a record, most recent first. Unattached notes
+            # are never looked up this way, so they are left out of the index.
+            models.Index(
+                fields=['related_to_type', 'related_to_id', '-created_at', '-id'],
+                condition=models.Q(related_to_type__isnull=False),
+                name='note_related_created_idx',
+            ),
+            models.Index(fields=['modified_at', 'id'], name='note_modified_idx'),  # /api/sync/
+        ]
+
+    def __str__(self):
+        return self.subject
+
+class ImportJob(models.Model):
+    status_choices = [
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Completed', 'Completed'),
+        ('Failed', 'Failed'),
+    ]
+    entity = models.CharField(max_length=50)  # accounts, contacts, leads or opportunities
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=status_choices, default='Pending')
+    processed_rows = models.IntegerField(default=0)
+    created_rows = models.IntegerField(default=0)
+    duplicate_rows = models.IntegerField(default=0)
+    failed_rows = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)  # First failures, as {"row": n, "errors": {...}}
+    message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone_now)
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="import_jobs")
+    modified_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.entity} import {self.file_name} ({self.status})"
+
+
+class SearchEntry(models.Model):
+    entity_choices = [
+        ('account', 'Account'),
+        ('contact', 'Contact'),
+        ('lead', 'Lead'),
+        ('opportunity', 'Opportunity'),
+    ]
+    entity = models.CharField(max_length=20, choices=entity_choices)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    content = models.TextField(blank=True)  # Normalized text of every searchable field
+    # On PostgreSQL migration 0013 adds a generated, GIN-indexed tsvector
+    # column "document" over title and content (see crm_api/search.py).
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['entity', 'object_id'], name='searchentry_unique_object'),
+        ]
+
+    def __str__(self):
+        return f"{self.entity} {self.object_id}: {self.title}"
+
+
+class Tombstone(models.Model):
+    # A hard-deleted record, kept so /api/sync/ can report the delete to
+    # clients holding a copy (see crm_api/sync.py). Pruned after
+    # SYNC['TOMBSTONE_DAYS'] by `manage.py prune_tombstones`.
+    entity = models.CharField(max_length=20)  # accounts, contacts, leads, opportunities, tasks or notes
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone_now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_idx'),
+        ]
+
     def __str__(self):
-        return self.subject
\ No newline at end of file
+        return f"{self.entity} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,188 @@
+import base64
+import json
+from types import SimpleNamespace
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from .fieldsets import sparse_serializer
+from .filters import facet_counts, filter_list, list_ordering
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination, newest first by default.
+
+    Unlike offset pagination the cost of a page does not grow with its
+    position, so deep pages on large tables stay cheap. ``ordering`` may
+    be any list of non-null fields ending in a unique one (``id``); the
+    cursor holds the last row's value for each of them.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 500
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    @property
+    def ordering_fields(self):
+        return tuple(name.lstrip('-') for name in self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        queryset = self.filter_queryset(queryset, request)
+
+        # Fetch one extra row to find out whether there is a next page.
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
+
+    def filter_queryset(self, queryset, request):
+        """Apply the keyset ordering and the position encoded in ?cursor=."""
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model)
+        if position is None:
+            return queryset
+
+        # (a < x) OR (a = x AND b < y) OR ... for each key in turn.
+        condition = Q()
+        for index, name in enumerate(self.ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            step = Q(**{f'{name.lstrip("-")}__{lookup}': position[index]})
+            for previous, value in zip(self.ordering_fields[:index], position):
+                step &= Q(**{previous: value})
+            condition |= step
+        return queryset.filter(condition)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            decoded = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if decoded['ordering'] != list(self.ordering) or len(decoded['values']) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.ordering_fields, decoded['values'])
+            ]
+        except (TypeError, ValueError, KeyError, UnicodeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if any(value is None for value in position):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, instance, model=None):
+        """The cursor after ``instance``: a model instance, or a ``values()`` row of ``model``."""
+        if isinstance(instance, dict):
+            fields = [model._meta.get_field(name) for name in self.ordering_fields]
+            instance = SimpleNamespace(**{field.attname: instance[field.name] for field in fields})
+        else:
+            fields = [instance._meta.get_field(name) for name in self.ordering_fields]
+        values = [field.value_to_string(instance) for field in fields]
+        raw = json.dumps({'ordering': list(self.ordering), 'values': values}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1], self.model))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+def stream_ndjson(queryset, serializer_class, chunk_size=2000):
+    """
+    Stream a queryset as newline-delimited JSON.
+
+    Rows are pulled from the database in chunks with ``.iterator()`` and
+    serialized one at a time, so memory use does not depend on table size.
+    """
+    compiled = serializer_class.get_compiled()
+    if compiled is not None:
+        queryset = compiled.values(queryset)
+    serializer = compiled or serializer_class()
+    encoder = JSONEncoder(ensure_ascii=False)
+
+    def rows():
+        for instance in queryset.iterator(chunk_size=chunk_size):
+            yield encoder.encode(serializer.to_representation(instance)) + '\n'
+
+    return StreamingHttpResponse(rows(), content_type='application/x-ndjson')
+
+
+def wants_stream(request):
+    return request.query_params.get('stream') in ('1', 'true')
+
+
+def list_response(request, queryset, serializer_class):
+    """
+    Build the GET response for a ``*_list_create`` view: the filters,
+    ``?ordering=`` and ``?facets=`` from crm_api/filters.py, then one
+    keyset page by default, or the whole (ordered, cursor-positioned)
+    queryset as NDJSON when ``?stream=1`` is passed.
+
+    ``?fields=`` and ``?expand=`` narrow the serializer (see fieldsets.py).
+    Serializers that compile (see compiled.py) are rendered from
+    ``values()`` rows instead of model instances.
+    """
+    serializer_class = sparse_serializer(request, serializer_class)
+    queryset = filter_list(request, queryset)
+    paginator = KeysetPagination(ordering=list_ordering(request, queryset.model))
+    compiled = serializer_class.get_compiled()
+    if compiled is None:
+        queryset = serializer_class.optimize_queryset(queryset, extra_fields=paginator.ordering_fields)
+    if wants_stream(request):
+        return stream_ndjson(paginator.filter_queryset(queryset, request), serializer_class)
+
+    facets = facet_counts(request, queryset)
+    if compiled is not None:
+        page = paginator.paginate_queryset(compiled.values(queryset, paginator.ordering_fields), request)
+        data = compiled.render(page)
+    else:
+        page = paginator.paginate_queryset(queryset, request)
+        data = serializer_class(page, many=True).data
+    response = paginator.get_paginated_response(data)
+    if facets is not None:
+        response.data['facets'] = facets
+    return response
@@ -0,0 +1,174 @@
+import itertools
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+DEFAULTS = {
+    # Sample every request and keep the profiles of those slower than
+    # THRESHOLD seconds. Off by default; HEADER works either way.
+    'ENABLED': False,
+    'THRESHOLD': 1.0,
+    # Admins can ask for a profile of any request by sending this header.
+    'HEADER': 'X-Profile',
+    # Seconds between stack samples.
+    'INTERVAL': 0.005,
+    # Profiles are written to <DIR>/<view>/ as collapsed stacks (one
+    # "frame;frame;frame count" line per distinct stack; feed them to
+    # flamegraph.pl or speedscope). None = <tmp>/crm-profiles.
+    'DIR': None,
+    # Oldest files beyond this many per view are deleted.
+    'MAX_PER_VIEW': 20,
+}
+
+FILE_RE = re.compile(r'^(?P<created>\d{8}T\d{6})-(?P<duration>\d+)ms-(?P<samples>\d+)s-[\w-]+\.collapsed$')
+# View directory names; not starting with a dot rules out "." and "..".
+NAME_RE = re.compile(r'^[\w-][\w.-]*$')
+
+_sequence = itertools.count()
+
+
+def profiler_settings():
+    return {**DEFAULTS, **getattr(settings, 'PROFILER', {})}
+
+
+def profile_dir(config):
+    return config['DIR'] or os.path.join(tempfile.gettempdir(), 'crm-profiles')
+
+
+def frame_label(code, module):
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """
+    One daemon thread that samples the stacks of every request being
+    profiled, instead of tracing calls: the profiled request runs at full
+    speed and the cost is a ``sys._current_frames()`` every INTERVAL while
+    at least one profile is running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> (Counter of stacks, frame sampling stops at)
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def start(self, thread_id, root, interval):
+        samples = Counter()
+        with self._lock:
+            self._active[thread_id] = (samples, root)
+            if self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, args=(interval,), name='profiler', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return samples
+
+    def stop(self, thread_id):
+        with self._lock:
+            self._active.pop(thread_id, None)
+
+    def _run(self, interval):
+        labels = {}
+        while True:
+            with self._lock:
+                active = list(self._active.items())
+                if not active:
+                    self._wakeup.clear()
+            if not active:
+                self._wakeup.wait()
+                continue
+            frames = sys._current_frames()
+            for thread_id, (samples, root) in active:
+                frame = frames.get(thread_id)
+                stack = []
+                while frame is not None and frame is not root:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = frame_label(code, frame.f_globals.get('__name__', '?'))
+                    stack.append(label)
+                    frame = frame.f_back
+                if stack:
+                    samples[';'.join(reversed(stack))] += 1
+            del frames
+            time.sleep(interval)
+
+
+def view_label(request):
+    """The view function's name (``lead_list_create``), used as the profile directory."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    func = getattr(match.func, 'view_class', match.func)
+    return func.__name__
+
+
+def save_profile(view, samples, duration, config):
+    directory = os.path.join(profile_dir(config), view)
+    os.makedirs(directory, exist_ok=True)
+    name = (
+        f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{round(duration * 1000)}ms-"
+        f"{sum(samples.values())}s-{os.getpid()}-{next(_sequence)}.collapsed"
+    )
+    with open(os.path.join(directory, name), 'w') as handle:
+        for stack, count in samples.most_common():
+            handle.write(f'{stack} {count}\n')
+
+    files = sorted(entry for entry in os.listdir(directory) if FILE_RE.match(entry))
+    for old in files[:-config['MAX_PER_VIEW']]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except OSError:
+            pass
+    return name
+
+
+def list_profiles(config=None, view=None):
+    """Saved profiles, newest first."""
+    config = config or profiler_settings()
+    root = profile_dir(config)
+    if view and not NAME_RE.match(view):
+        return []
+    try:
+        views = [view] if view else sorted(name for name in os.listdir(root) if NAME_RE.match(name))
+    except OSError:
+        return []
+    profiles = []
+    for name in views:
+        try:
+            entries = os.listdir(os.path.join(root, name))
+        except OSError:
+            continue
+        for entry in entries:
+            match = FILE_RE.match(entry)
+            if match:
+                profiles.append({
+                    'view': name,
+                    'file': entry,
+                    'created_at': time.strftime(
+                        '%Y-%m-%dT%H:%M:%SZ', time.strptime(match['created'], '%Y%m%dT%H%M%S'),
+                    ),
+                    'duration_ms': int(match['duration']),
+                    'samples': int(match['samples']),
+                })
+    profiles.sort(key=lambda profile: profile['file'][:15], reverse=True)
+    return profiles
+
+
+def profile_path(view, name, config=None):
+    """Path of a saved profile, or ``None`` if the names are not safe or it does not exist."""
+    if not NAME_RE.match(view) or not FILE_RE.match(name):
+        return None
+    path = os.path.join(profile_dir(config or profiler_settings()), view, name)
+    return path if os.path.isfile(path) else None
+
+
+sampler = StackSampler()
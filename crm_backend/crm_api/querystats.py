@@ -0,0 +1,408 @@
+import atexit
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from rest_framework.fields import Field
+
+from .metrics import view_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Fingerprint and time every ORM query run while serving a request.
+    'ENABLED': True,
+    # Slowest executions kept per (view, fingerprint), with their origin.
+    'SAMPLES': 5,
+    # Also keep the samples' parameters. They can hold personal data and
+    # are written to SNAPSHOT_DIR, so only for debugging.
+    'KEEP_PARAMS': False,
+    # Distinct (view, fingerprint) pairs tracked per process; others are counted as dropped.
+    'MAX_FINGERPRINTS': 2000,
+    # Each process writes its stats here every SNAPSHOT_INTERVAL seconds so the
+    # query-stats endpoint and command see all workers. None = <tmp>/crm-query-stats.
+    # Created private (0700); an existing directory must belong to this user.
+    'SNAPSHOT_DIR': None,
+    'SNAPSHOT_INTERVAL': 30.0,
+}
+
+# Latency histogram for percentiles: bucket i holds durations up to
+# HISTOGRAM_BASE * HISTOGRAM_FACTOR ** i (10µs .. ~13s, 25% wide).
+HISTOGRAM_BASE = 1e-5
+HISTOGRAM_FACTOR = 1.25
+HISTOGRAM_BUCKETS = 64
+MAX_PARAM_LENGTH = 200
+RESET_FILE = 'RESET'
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?(?![\w"])')
+PLACEHOLDER_RE = re.compile(r'%s')
+LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+REPEATED_LIST_RE = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+SPACE_RE = re.compile(r'\s+')
+# Our own execute wrappers sit between the ORM and the caller.
+INSTRUMENTATION_MODULES = {__name__, 'crm_api.metrics'}
+
+
+def query_stats_settings():
+    return {**DEFAULTS, **getattr(settings, 'QUERY_STATS', {})}
+
+
+def snapshot_dir(config):
+    return config['SNAPSHOT_DIR'] or os.path.join(tempfile.gettempdir(), 'crm-query-stats')
+
+
+def ensure_snapshot_dir(directory):
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    # A shared <tmp> lets anyone create the directory first.
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f'{directory} is not a directory owned by this user')
+    if info.st_mode & 0o077:
+        os.chmod(directory, 0o700)
+
+
+def normalize(sql):
+    """
+    The statement with literals and placeholders replaced by ``?``, IN
+    lists and multi-row VALUES collapsed, so ``id IN (1, 2)`` and
+    ``id IN (3)`` share a fingerprint.
+    """
+    sql = STRING_RE.sub('?', sql)
+    sql = PLACEHOLDER_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = LIST_RE.sub('(...)', sql)
+    sql = REPEATED_LIST_RE.sub('(...), ...', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+_fingerprints = {}
+
+
+def fingerprint(sql):
+    """``(hash, normalized sql)``; the ORM repeats the same strings, so results are memoized."""
+    cached = _fingerprints.get(sql)
+    if cached is None:
+        normalized = normalize(sql)
+        cached = (hashlib.sha1(normalized.encode()).hexdigest()[:12], normalized)
+        if len(_fingerprints) < 10000:
+            _fingerprints[sql] = cached
+    return cached
+
+
+def query_origin():
+    """
+    Where the running query comes from: ``Serializer.field`` when a DRF
+    field fetched it (lazy relations), else the innermost crm_api function,
+    e.g. ``views.dashboard_metrics``.
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'get_attribute':
+            field = frame.f_locals.get('self')
+            if isinstance(field, Field) and field.parent is not None:
+                return f'{type(field.parent).__name__}.{field.field_name}'
+        module = frame.f_globals.get('__name__', '')
+        if module.startswith('crm_api.') and module not in INSTRUMENTATION_MODULES:
+            return f"{module[len('crm_api.'):]}.{getattr(code, 'co_qualname', code.co_name)}"
+        frame = frame.f_back
+    return 'unknown'
+
+
+def histogram_index(duration):
+    if duration <= HISTOGRAM_BASE:
+        return 0
+    return min(math.ceil(math.log(duration / HISTOGRAM_BASE, HISTOGRAM_FACTOR)), HISTOGRAM_BUCKETS - 1)
+
+
+def percentile(histogram, count, maximum, fraction):
+    """Upper bound of the bucket holding the ``fraction`` quantile, capped at the observed max."""
+    wanted = fraction * count
+    seen = 0
+    for index in sorted(histogram):
+        seen += histogram[index]
+        if seen >= wanted:
+            return min(HISTOGRAM_BASE * HISTOGRAM_FACTOR ** index, maximum)
+    return maximum
+
+
+class FingerprintStats:
+    __slots__ = ('count', 'total', 'max', 'histogram', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = {}
+        self.samples = []  # min-heap of (duration, at, params, origin)
+
+    def add_sample(self, sample, limit):
+        if len(self.samples) < limit:
+            heapq.heappush(self.samples, sample)
+        elif sample > self.samples[0]:
+            heapq.heapreplace(self.samples, sample)
+
+    def merge(self, other, limit):
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for index, count in other.histogram.items():
+            self.histogram[index] = self.histogram.get(index, 0) + count
+        for sample in other.samples:
+            self.add_sample(sample, limit)
+
+    def to_json(self):
+        return [self.count, self.total, self.max, dict(self.histogram), list(self.samples)]
+
+    @classmethod
+    def from_json(cls, data):
+        stats = cls()
+        stats.count, stats.total, stats.max, histogram, samples = data
+        stats.histogram = {int(index): count for index, count in histogram.items()}
+        stats.samples = [tuple(sample) for sample in samples]
+        heapq.heapify(stats.samples)
+        return stats
+
+
+class QueryStatsCollector:
+    """
+    Per-process query statistics keyed by (view, fingerprint).
+
+    Recording a query costs a memoized fingerprint lookup and a few dict
+    updates; the stack is only walked for executions slow enough to enter
+    the kept samples. A daemon thread snapshots the stats to SNAPSHOT_DIR
+    so readers in other processes can merge every worker's numbers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._sql = {}
+        self.dropped = 0
+        self._since = time.time()
+        self._thread = None
+        self._pid = None
+
+    def record(self, view, sql, params, duration, config):
+        key, normalized = fingerprint(sql)
+        limit = config['SAMPLES']
+        with self._lock:
+            stats = self._stats.get((view, key))
+            if stats is None:
+                if len(self._stats) >= config['MAX_FINGERPRINTS']:
+                    self.dropped += 1
+                    return
+                stats = self._stats[(view, key)] = FingerprintStats()
+                self._sql[key] = normalized
+            stats.count += 1
+            stats.total += duration
+            if duration > stats.max:
+                stats.max = duration
+            index = histogram_index(duration)
+            stats.histogram[index] = stats.histogram.get(index, 0) + 1
+            keep = len(stats.samples) < limit or duration > stats.samples[0][0]
+        if keep:
+            kept_params = repr(params)[:MAX_PARAM_LENGTH] if config['KEEP_PARAMS'] else None
+            sample = (duration, time.time(), kept_params, query_origin())
+            with self._lock:
+                stats.add_sample(sample, limit)
+        self._ensure_snapshots(config)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'process': process_id(),
+                'since': self._since,
+                'written_at': time.time(),
+                'dropped': self.dropped,
+                'sql': dict(self._sql),
+                'stats': [[view, key, stats.to_json()] for (view, key), stats in self._stats.items()],
+            }
+
+    def clear(self):
+        with self._lock:
+            self._stats = {}
+            self._sql = {}
+            self.dropped = 0
+            self._since = time.time()
+
+    def write_snapshot(self, config):
+        directory = snapshot_dir(config)
+        try:
+            ensure_snapshot_dir(directory)
+            if self._since < reset_time(directory):
+                self.clear()
+            path = os.path.join(directory, f'{process_id()}.json')
+            with open(f'{path}.tmp', 'w') as handle:
+                json.dump(self.snapshot(), handle)
+            os.replace(f'{path}.tmp', path)
+        except OSError:
+            logger.exception('Failed to write query stats snapshot')
+
+    @property
+    def started(self):
+        return self._pid == os.getpid()
+
+    def _ensure_snapshots(self, config):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, args=(config,), name='query-stats-snapshot', daemon=True,
+            )
+            self._thread.start()
+
+    def _run(self, config):
+        while True:
+            time.sleep(config['SNAPSHOT_INTERVAL'])
+            self.write_snapshot(config)
+
+
+def process_id():
+    return f'{os.uname().nodename}-{os.getpid()}'
+
+
+def reset_time(directory):
+    try:
+        return os.path.getmtime(os.path.join(directory, RESET_FILE))
+    except OSError:
+        return 0.0
+
+
+def load_stats(config=None):
+    """
+    ``({(view, fingerprint): FingerprintStats}, {fingerprint: sql}, dropped)``
+    merged from every process's snapshot, with this process's live numbers
+    in place of its own (possibly stale) snapshot.
+    """
+    config = config or query_stats_settings()
+    directory = snapshot_dir(config)
+    reset = reset_time(directory)
+    snapshots = []
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith('.json')]
+    except OSError:
+        names = []
+    for name in names:
+        try:
+            with open(os.path.join(directory, name)) as handle:
+                data = json.load(handle)
+        except (OSError, ValueError):
+            continue
+        if data['process'] != process_id() and data['written_at'] >= reset:
+            snapshots.append(data)
+    snapshots.append(collector.snapshot())
+
+    merged, sql, dropped = {}, {}, 0
+    for data in snapshots:
+        sql.update(data['sql'])
+        dropped += data['dropped']
+        for view, key, raw in data['stats']:
+            stats = merged.setdefault((view, key), FingerprintStats())
+            stats.merge(FingerprintStats.from_json(raw), config['SAMPLES'])
+    return merged, sql, dropped
+
+
+def reset_stats(config=None):
+    """Forget collected stats in every process (others clear on their next snapshot)."""
+    config = config or query_stats_settings()
+    directory = snapshot_dir(config)
+    ensure_snapshot_dir(directory)
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            os.remove(os.path.join(directory, name))
+    with open(os.path.join(directory, RESET_FILE), 'w') as handle:
+        handle.write(str(time.time()))
+    collector.clear()
+
+
+ORDERINGS = {
+    'total': lambda stats: stats.total,
+    'count': lambda stats: stats.count,
+    'max': lambda stats: stats.max,
+    'p95': lambda stats: percentile(stats.histogram, stats.count, stats.max, 0.95),
+}
+
+
+def report(view=None, order='total', limit=50, config=None):
+    """The top ``limit`` (view, fingerprint) rows by ``order``, as plain dicts."""
+    merged, sql, dropped = load_stats(config)
+    rows = [
+        (key, stats) for key, stats in merged.items()
+        if view is None or key[0] == view
+    ]
+    rows.sort(key=lambda row: ORDERINGS[order](row[1]), reverse=True)
+    return {
+        'dropped': dropped,
+        'results': [
+            {
+                'view': row_view,
+                'fingerprint': key,
+                'sql': sql.get(key, ''),
+                'count': stats.count,
+                'total_ms': round(stats.total * 1000, 3),
+                'mean_ms': round(stats.total / stats.count * 1000, 3),
+                'p95_ms': round(percentile(stats.histogram, stats.count, stats.max, 0.95) * 1000, 3),
+                'max_ms': round(stats.max * 1000, 3),
+                'samples': [
+                    {
+                        'duration_ms': round(duration * 1000, 3),
+                        'at': at,
+                        'params': params,
+                        'origin': origin,
+                    }
+                    for duration, at, params, origin in sorted(stats.samples, reverse=True)
+                ],
+            }
+            for (row_view, key), stats in rows[:limit]
+        ],
+    }
+
+
+class QueryRecorder:
+    """
+    ``connection.execute_wrapper()`` recording each query against the
+    request's view. For a streamed response it is installed again while
+    the body is iterated (see ``recording()``), since ``?stream=1`` lists
+    and exports run their queries after the view has returned.
+    """
+
+    def __init__(self, request, config):
+        self.request = request
+        self.config = config
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            collector.record(view_name(self.request), sql, params, time.perf_counter() - started, self.config)
+
+
+def recording(content, recorder):
+    with connection.execute_wrapper(recorder):
+        yield from content
+
+
+def write_final_snapshot():
+    if collector.started:
+        collector.write_snapshot(query_stats_settings())
+
+
+collector = QueryStatsCollector()
+atexit.register(write_final_snapshot)
@@ -0,0 +1,99 @@
+from collections import defaultdict
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.utils import timezone
+
+from .models import Quote, QuoteLineItem
+
+CENTS = Decimal('0.01')
+HUNDRED = Decimal(100)
+LINE_FIELDS = ('quantity', 'unit_price', 'discount_percent', 'tax_percent')
+TOTAL_FIELDS = ('total', 'discount', 'sub_total', 'tax', 'grand_total')
+BATCH_SIZE = 1000
+
+
+def money(value):
+    return Decimal(value or 0).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def line_amounts(quantity, unit_price, discount_percent, tax_percent):
+    """``(gross, discount, tax)`` of one line, each rounded to cents."""
+    gross = money(Decimal(quantity) * Decimal(unit_price))
+    discount = money(gross * Decimal(discount_percent or 0) / HUNDRED)
+    tax = money((gross - discount) * Decimal(tax_percent or 0) / HUNDRED)
+    return gross, discount, tax
+
+
+def compute_totals(lines, shipping=None, shipping_tax=None):
+    """
+    Quote totals from ``(quantity, unit_price, discount_percent,
+    tax_percent)`` tuples, in one pass:
+
+    - total: sum of quantity * unit_price
+    - discount: sum of the line discounts
+    - sub_total: total - discount
+    - tax: sum of the line taxes, charged on the discounted amount
+    - grand_total: sub_total + tax + shipping + shipping_tax
+    """
+    total = discount = tax = Decimal(0)
+    for line in lines:
+        line_gross, line_discount, line_tax = line_amounts(*line)
+        total += line_gross
+        discount += line_discount
+        tax += line_tax
+    sub_total = total - discount
+    return {
+        'total': total,
+        'discount': discount,
+        'sub_total': sub_total,
+        'tax': tax,
+        'grand_total': sub_total + tax + money(shipping) + money(shipping_tax),
+    }
+
+
+def line_tuple(line):
+    """``LINE_FIELDS`` of a line item instance or validated-data dict."""
+    if isinstance(line, dict):
+        return tuple(line.get(field, 0) for field in LINE_FIELDS)
+    return tuple(getattr(line, field) for field in LINE_FIELDS)
+
+
+def replace_line_items(quote, lines):
+    """Replace the quote's line items with ``lines`` (validated dicts), in list order."""
+    QuoteLineItem.objects.filter(quote=quote).delete()
+    QuoteLineItem.objects.bulk_create([
+        QuoteLineItem(quote=quote, position=position, **line)
+        for position, line in enumerate(lines)
+    ])
+
+
+def recalculate_quotes(queryset=None, batch_size=BATCH_SIZE):
+    """
+    Recompute the stored totals of every quote in ``queryset`` (default:
+    all). Each batch costs one query for the quotes, one for their lines
+    and one ``bulk_update``. Returns the number of quotes updated.
+    """
+    queryset = (queryset if queryset is not None else Quote.objects.all()).order_by('id')
+    updated = 0
+    last_id = 0
+    while True:
+        quotes = list(queryset.filter(id__gt=last_id).values_list('id', 'shipping', 'shipping_tax')[:batch_size])
+        if not quotes:
+            return updated
+        ids = [pk for pk, _, _ in quotes]
+        lines = defaultdict(list)
+        line_rows = QuoteLineItem.objects.filter(quote_id__in=ids).order_by().values_list('quote_id', *LINE_FIELDS)
+        for quote_id, *line in line_rows:
+            lines[quote_id].append(line)
+
+        # bulk_update() skips auto_now; move modified_at so detail ETags change.
+        modified_at = timezone.now()
+        Quote.objects.bulk_update(
+            [
+                Quote(id=pk, modified_at=modified_at, **compute_totals(lines[pk], shipping, shipping_tax))
+                for pk, shipping, shipping_tax in quotes
+            ],
+            (*TOTAL_FIELDS, 'modified_at'),
+        )
+        updated += len(quotes)
+        last_id = ids[-1]
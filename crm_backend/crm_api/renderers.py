@@ -0,0 +1,140 @@
+import codecs
+import csv
+import io
+
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+DEFAULTS = {
+    # Responses of at least this many bytes are gzipped for clients that
+    # accept it (see CompressionMiddleware); smaller ones aren't worth it.
+    'MIN_SIZE': 1024,
+}
+
+
+def compression_settings():
+    return {**DEFAULTS, **getattr(settings, 'COMPRESSION', {})}
+
+
+# Types orjson and msgpack don't know (Decimal, lazy strings, querysets) and
+# datetimes go through DRF's own encoder, so they come out the same as from
+# JSONRenderer: timezone-aware datetimes as ISO 8601 with "Z" for UTC.
+# Serializer DecimalFields are strings already and keep every digit.
+encode_default = JSONEncoder().default
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Selects ``?format=csv``. Export views stream their own body; this only
+    renders the short dict/list payloads of error responses.
+    """
+
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if rows and isinstance(rows[0], dict):
+            writer.writerow(rows[0].keys())
+            writer.writerows(row.values() for row in rows)
+        else:
+            writer.writerows([row] for row in rows)
+        return buffer.getvalue().encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Newline-delimited JSON, one object per line (``?format=ndjson``)."""
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        encoder = JSONEncoder(ensure_ascii=False)
+        return ''.join(encoder.encode(row) + '\n' for row in rows).encode(self.charset)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on top of orjson: the same JSON, encoded several times
+    faster. Indented output (``Accept: application/json; indent=4``, the
+    browsable API) and anything orjson rejects, such as integers over 64
+    bits, are left to JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like JSONRenderer does, to stay a strict JavaScript subset.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser on top of orjson, for UTF-8 bodies (anything else goes to JSONParser)."""
+
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack (``Accept: application/msgpack`` or ``?format=msgpack``).
+    Values are the ones JSON would carry, so switching formats changes no
+    field's type: datetimes stay ISO 8601 strings and decimals strings.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default)
+
+
+class MessagePackParser(BaseParser):
+    """
+    ``Content-Type: application/msgpack`` bodies. Timestamps (extension
+    type -1) become timezone-aware UTC datetimes, which DateTimeFields
+    accept as they are.
+    """
+
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), timestamp=3)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError(f'MessagePack parse error - {str(exc) or type(exc).__name__}')
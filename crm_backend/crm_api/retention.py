@@ -0,0 +1,203 @@
+import csv
+import datetime
+import gzip
+import os
+import re
+
+from django.db import connection, transaction
+from django.db.models import Min
+
+from .models import ActivityLog
+from .routes import decode_endpoint
+
+TABLE = ActivityLog._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+PARTITION_RE = re.compile(rf'^{TABLE}_p(\d{{4}})_(\d{{2}})$')
+ARCHIVE_COLUMNS = ('id', 'user_id', 'method', 'endpoint', 'timestamp')
+DELETE_BATCH_SIZE = 5000
+# Give up on a partition drop rather than queue behind long transactions
+# (and block the request inserts queued behind us).
+LOCK_TIMEOUT = '5s'
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def current_month():
+    return datetime.datetime.now(datetime.timezone.utc).date().replace(day=1)
+
+
+def month_range(month):
+    """``[start, end)`` datetimes (UTC) of the month starting on ``month``."""
+    start = datetime.datetime.combine(month, datetime.time(0), tzinfo=datetime.timezone.utc)
+    end = datetime.datetime.combine(add_months(month, 1), datetime.time(0), tzinfo=datetime.timezone.utc)
+    return start, end
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month:%Y_%m}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))", [TABLE])
+        return cursor.fetchone()[0]
+
+
+def partitions():
+    """``(month, table name)`` of each monthly partition, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)",
+            [TABLE],
+        )
+        names = [name for name, in cursor.fetchall()]
+    found = []
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            found.append((datetime.date(int(match[1]), int(match[2]), 1), name))
+    return sorted(found)
+
+
+def ensure_partitions(months_ahead):
+    """
+    Create the partitions for this month and the next ``months_ahead``, so
+    inserts never fall through to the default partition. Rows already in
+    the default partition for a new month are moved into it. Returns the
+    months created.
+    """
+    existing = {month for month, _ in partitions()}
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current_month(), offset)
+        if month not in existing:
+            create_partition(month)
+            created.append(month)
+    return created
+
+
+def create_partition(month):
+    # PostgreSQL refuses to create a partition while the default partition
+    # holds rows for its range, so those rows are parked in a temporary
+    # table and put back through the parent once it exists.
+    quote = connection.ops.quote_name
+    start, end = month_range(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(
+            f'SELECT EXISTS (SELECT 1 FROM {quote(DEFAULT_PARTITION)} WHERE "timestamp" >= %s AND "timestamp" < %s)',
+            [start, end],
+        )
+        stray = cursor.fetchone()[0]
+        if stray:
+            cursor.execute(f'CREATE TEMPORARY TABLE moved_activitylog (LIKE {quote(TABLE)}) ON COMMIT DROP')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} WHERE "timestamp" >= %s AND "timestamp" < %s '
+                f'RETURNING *) INSERT INTO moved_activitylog SELECT * FROM moved',
+                [start, end],
+            )
+        cursor.execute(
+            f'CREATE TABLE {quote(partition_name(month))} PARTITION OF {quote(TABLE)} FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+        if stray:
+            cursor.execute(f'INSERT INTO {quote(TABLE)} SELECT * FROM moved_activitylog')
+
+
+def month_rows(month):
+    start, end = month_range(month)
+    return ActivityLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+
+
+def archive_month(month, directory):
+    """
+    Write the month's rows to ``<directory>/activitylog-YYYY-MM.csv.gz``,
+    streamed so memory stays flat. Returns the number of rows written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    filename = os.path.join(directory, f'activitylog-{month:%Y-%m}.csv.gz')
+    rows = (
+        month_rows(month).order_by()
+        .values_list('id', 'user_id', 'method', 'route', 'object_id', 'path', 'timestamp')
+        .iterator(chunk_size=DELETE_BATCH_SIZE)
+    )
+    methods = dict(ActivityLog.method_choices)
+    count = 0
+    # Written under a temporary name so a half-written file is never
+    # mistaken for a finished archive.
+    with gzip.open(f'{filename}.tmp', 'wt', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(ARCHIVE_COLUMNS)
+        for pk, user_id, method, route, object_id, path, timestamp in rows:
+            writer.writerow([pk, user_id, methods[method], decode_endpoint(route, object_id, path), timestamp])
+            count += 1
+    os.replace(f'{filename}.tmp', filename)
+    return count
+
+
+def drop_partition(name):
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}')
+        cursor.execute(f'DROP TABLE {quote(name)}')
+
+
+def delete_month(month, batch_size=DELETE_BATCH_SIZE):
+    """Delete the month's rows in short batches. Returns the number deleted."""
+    deleted = 0
+    while True:
+        ids = list(month_rows(month).order_by().values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += ActivityLog.objects.filter(id__in=ids).delete()[0]
+
+
+def apply_retention(retention_months, archive_dir=None, dry_run=False):
+    """
+    Remove activity older than ``retention_months`` whole months, archiving
+    each month to ``archive_dir`` first when given.
+
+    On PostgreSQL expired monthly partitions are detached and dropped, which
+    costs no row-by-row DELETE and leaves nothing to vacuum. Rows outside
+    those partitions (the whole table on other backends, stray rows in the
+    default partition on PostgreSQL) are deleted a month at a time in
+    batches. Returns ``(month, action, rows)`` tuples; ``rows`` is ``None``
+    for partitions dropped without archiving.
+    """
+    cutoff = add_months(current_month(), -retention_months)
+    results = []
+    dropped = set()
+
+    if is_partitioned():
+        for month, name in partitions():
+            if month >= cutoff:
+                break
+            if dry_run:
+                rows = month_rows(month).count()
+            else:
+                rows = archive_month(month, archive_dir) if archive_dir else None
+                drop_partition(name)
+            results.append((month, 'dropped', rows))
+            dropped.add(month)
+
+    oldest = ActivityLog.objects.filter(timestamp__lt=month_range(cutoff)[0]).aggregate(oldest=Min('timestamp'))['oldest']
+    month = oldest.date().replace(day=1) if oldest else cutoff
+    while month < cutoff:
+        if month not in dropped:
+            if dry_run:
+                rows = month_rows(month).count()
+            else:
+                if archive_dir:
+                    archive_month(month, archive_dir)
+                rows = delete_month(month)
+            if rows:
+                results.append((month, 'deleted', rows))
+        month = add_months(month, 1)
+    return results
@@ -0,0 +1,99 @@
+import re
+from functools import lru_cache
+
+# Stable small ids of the named routes in urls.py, stored in
+# ActivityLog.route instead of the request path. Only ever append: logged
+# rows keep their ids forever. Routes missing here are still logged, with
+# their path spelled out.
+ROUTE_IDS = {
+    'login': 1,
+    'logout': 2,
+    'user-create-list': 3,
+    'user-list': 4,
+    'user-detail': 5,
+    'current-user': 6,
+    'choices': 7,
+    'user-choices': 8,
+    'account-list-create': 9,
+    'account-export': 10,
+    'account-detail': 11,
+    'account-bulk': 12,
+    'account-choices': 13,
+    'contact-list-create': 14,
+    'contact-export': 15,
+    'contact-detail': 16,
+    'contact-bulk': 17,
+    'opportunity-list-create': 18,
+    'opportunity-export': 19,
+    'opportunity-detail': 20,
+    'opportunity-bulk': 21,
+    'opportunity-choices': 22,
+    'lead-list-create': 23,
+    'lead-export': 24,
+    'lead-detail': 25,
+    'lead-bulk': 26,
+    'lead-choices': 27,
+    'user-activity-logs': 28,
+    'task-list-create': 29,
+    'task-export': 30,
+    'task-detail': 31,
+    'dashboard-metrics': 32,
+    'forecast': 33,
+    'quote-list-create': 34,
+    'quote-export': 35,
+    'quote-detail': 36,
+    'quote-choices': 37,
+    'note-list-create': 38,
+    'note-export': 39,
+    'note-detail': 40,
+    'note-choices': 41,
+    'import-create': 42,
+    'import-detail': 43,
+    'search': 44,
+    'query-stats': 45,
+    'profile-list': 46,
+    'profile-detail': 47,
+    'sync': 48,
+}
+UNMATCHED = 0
+MAX_PATH_LENGTH = 255
+
+
+@lru_cache(maxsize=None)
+def route_templates():
+    """Route id -> endpoint format string, e.g. ``/lead/{}/`` for lead-detail."""
+    from .urls import urlpatterns
+
+    return {
+        ROUTE_IDS[pattern.name]: '/' + re.sub(r'<[^>]+>', '{}', str(pattern.pattern))
+        for pattern in urlpatterns
+        if pattern.name in ROUTE_IDS
+    }
+
+
+def decode_endpoint(route, object_id, path):
+    """The endpoint (``/lead/12/``) of a logged request."""
+    template = route_templates().get(route)
+    if path is not None or template is None:
+        return path
+    return template.format(object_id) if object_id is not None else template
+
+
+def encode_endpoint(endpoint, match):
+    """
+    ``(route, object_id, path)`` for ``endpoint`` as resolved by ``match``.
+    Only a route and an integer id are kept when they spell the endpoint
+    out again exactly; anything else (unknown routes, string arguments,
+    404s) keeps the path instead.
+    """
+    route = ROUTE_IDS.get(match.url_name) if match is not None and not match.namespace else None
+    if route is not None:
+        captured = list(match.captured_kwargs.values())
+        object_id = captured[0] if len(captured) == 1 else None
+        if (
+            len(captured) <= 1
+            and (object_id is None or isinstance(object_id, int))
+            and decode_endpoint(route, object_id, None) == endpoint
+        ):
+            return route, object_id, None
+    return UNMATCHED, None, endpoint[:MAX_PATH_LENGTH]
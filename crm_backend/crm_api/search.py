@@ -0,0 +1,154 @@
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Account, Contact, Lead, Opportunity, SearchEntry
+
+SearchSource = namedtuple('SearchSource', ['model', 'fields', 'title', 'subtitle'])
+
+SOURCES = {
+    'account': SearchSource(
+        Account,
+        ['name', 'website', 'email_address', 'office_phone'],
+        lambda row: row['name'],
+        lambda row: row['email_address'] or '',
+    ),
+    'contact': SearchSource(
+        Contact,
+        ['first_name', 'last_name', 'email_address', 'office_phone', 'mobile'],
+        lambda row: f"{row['first_name']} {row['last_name']}",
+        lambda row: row['email_address'] or '',
+    ),
+    'lead': SearchSource(
+        Lead,
+        ['first_name', 'last_name', 'email_address', 'office_phone', 'mobile', 'account_name'],
+        lambda row: f"{row['first_name']} {row['last_name']}",
+        lambda row: row['email_address'] or '',
+    ),
+    'opportunity': SearchSource(
+        Opportunity,
+        ['opportunity_name'],
+        lambda row: row['opportunity_name'],
+        lambda row: '',
+    ),
+}
+
+ENTITY_BY_MODEL = {source.model: entity for entity, source in SOURCES.items()}
+
+TERM_RE = re.compile(r'\w+')
+MAX_TERMS = 10
+
+
+def normalize(text):
+    """Lowercase words only, so emails, URLs and phone numbers split into searchable terms."""
+    return ' '.join(TERM_RE.findall(text.lower()))
+
+
+def build_entry(entity, row):
+    source = SOURCES[entity]
+    words = []
+    for field in source.fields:
+        value = row[field]
+        if not value:
+            continue
+        words.append(normalize(str(value)))
+        digits = re.sub(r'\D', '', str(value))
+        if len(digits) >= 5 and digits != str(value):
+            # Phone numbers are also searchable without separators.
+            words.append(digits)
+    return SearchEntry(
+        entity=entity,
+        object_id=row['id'],
+        title=source.title(row)[:255],
+        subtitle=source.subtitle(row)[:255],
+        content=' '.join(words),
+    )
+
+
+def index_instances(entity, instances):
+    fields = ['id', *SOURCES[entity].fields]
+    entries = [build_entry(entity, {field: getattr(instance, field) for field in fields}) for instance in instances]
+    save_entries(entries)
+
+
+def index_rows(entity, rows):
+    save_entries([build_entry(entity, row) for row in rows])
+
+
+def save_entries(entries):
+    if entries:
+        SearchEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['entity', 'object_id'],
+            update_fields=['title', 'subtitle', 'content'],
+        )
+
+
+def remove_objects(entity, ids):
+    SearchEntry.objects.filter(entity=entity, object_id__in=ids).delete()
+
+
+def rebuild_index(entity, chunk_size=2000):
+    """Re-index every row of ``entity``; returns the number of rows indexed."""
+    source = SOURCES[entity]
+    count = 0
+    batch = []
+    for row in source.model.objects.order_by('id').values('id', *source.fields).iterator(chunk_size=chunk_size):
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            index_rows(entity, batch)
+            count += len(batch)
+            batch = []
+    index_rows(entity, batch)
+    return count + len(batch)
+
+
+def search(query, entities=None):
+    """
+    Return a queryset of matching entries, best match first, as dicts with
+    ``entity``, ``object_id``, ``title``, ``subtitle`` and ``rank``.
+
+    On PostgreSQL this is a prefix tsquery against the GIN-indexed
+    ``document`` column; elsewhere it falls back to LIKE matching with a
+    simple title-weighted rank.
+    """
+    terms = TERM_RE.findall(query.lower())[:MAX_TERMS]
+    entries = SearchEntry.objects.all()
+    if entities:
+        entries = entries.filter(entity__in=entities)
+    if not terms:
+        return entries.none()
+
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        entries = entries.filter(
+            RawSQL("document @@ to_tsquery('simple', %s)", (tsquery,), output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL("ts_rank(document, to_tsquery('simple', %s))", (tsquery,), output_field=FloatField())
+        )
+    else:
+        rank = Value(0.0)
+        for term in terms:
+            entries = entries.filter(content__contains=term)
+            rank = rank + Case(
+                When(title__icontains=term, then=Value(1.0)), default=Value(0.1), output_field=FloatField()
+            )
+        entries = entries.annotate(rank=rank)
+
+    return entries.order_by('-rank', 'id').values('entity', 'object_id', 'title', 'subtitle', 'rank')
+
+
+def index_saved(sender, instance, **kwargs):
+    index_instances(ENTITY_BY_MODEL[sender], [instance])
+
+
+def index_bulk_saved(sender, instances, **kwargs):
+    index_instances(ENTITY_BY_MODEL[sender], instances)
+
+
+def index_deleted(sender, instance, **kwargs):
+    remove_objects(ENTITY_BY_MODEL[sender], [instance.pk])
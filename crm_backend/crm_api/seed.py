@@ -0,0 +1,493 @@
+import datetime
+import io
+import itertools
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from .activity import activity_settings
+from .dashboard import invalidate_dashboard_snapshot
+from .forecast import invalidate_forecast
+from .models import (
+    QUOTE_NUMBER_SEQUENCE, Account, ActivityLog, Contact, Lead, Note, Opportunity, Quote, QuoteLineItem, Task, User,
+)
+from .quotes import compute_totals
+from .retention import ensure_partitions, is_partitioned
+from .routes import route_templates
+from .search import SOURCES, index_rows
+
+# Rows created per unit of --scale, in load order (parents first).
+ROWS_PER_SCALE = {
+    User: 5,
+    Account: 50,
+    Contact: 150,
+    Lead: 250,
+    Opportunity: 100,
+    Task: 500,
+    Quote: 50,
+    QuoteLineItem: 150,  # On average; each quote gets 1-5 lines
+    Note: 250,
+    ActivityLog: 2500,
+}
+# Every seeded user can log in with this password (hashed once per run).
+PASSWORD = 'crm-seed'
+CHUNK_SIZE = 20000
+
+FIRST_NAMES = (
+    'Aarav', 'Ada', 'Alan', 'Amara', 'Ananya', 'Ben', 'Chen', 'Chloe', 'Diego', 'Elena', 'Farah', 'Grace',
+    'Hiro', 'Ines', 'Ivan', 'Jo', 'Kofi', 'Lena', 'Maya', 'Noah', 'Omar', 'Priya', 'Rosa', 'Sam', 'Tariq',
+    'Uma', 'Vikram', 'Wei', 'Yara', 'Zoe',
+)
+LAST_NAMES = (
+    'Agrawal', 'Brown', 'Costa', 'Dubois', 'Evans', 'Fischer', 'Garcia', 'Hughes', 'Iyer', 'Jensen', 'Kim',
+    'Lopez', 'Mehta', 'Nakamura', 'Okafor', 'Patel', 'Quinn', 'Rossi', 'Singh', 'Tanaka', 'Usman', 'Varga',
+    'Walsh', 'Xu', 'Young', 'Zhang',
+)
+COMPANY_WORDS = (
+    'Acme', 'Apex', 'Blue', 'Bright', 'Cedar', 'Delta', 'Echo', 'Nova', 'Orbit', 'Pine', 'Quantum', 'River',
+    'Summit', 'Terra', 'Vertex', 'Zen',
+)
+COMPANY_SUFFIXES = ('Labs', 'Systems', 'Industries', 'Holdings', 'Partners', 'Works', 'Group', 'Solutions')
+CITIES = (
+    ('Mumbai', 'Maharashtra', 'India'), ('Bengaluru', 'Karnataka', 'India'), ('Delhi', 'Delhi', 'India'),
+    ('Austin', 'Texas', 'USA'), ('Boston', 'Massachusetts', 'USA'), ('Seattle', 'Washington', 'USA'),
+    ('London', 'England', 'UK'), ('Toronto', 'Ontario', 'Canada'),
+)
+STREETS = ('Main St', 'Park Ave', 'MG Road', 'High St', 'Lake View', 'Station Rd', 'Church St', 'Hill Rd')
+DEPARTMENTS = ('Sales', 'Marketing', 'Purchasing', 'Finance', 'Operations', 'IT', 'Support')
+JOB_TITLES = ('Buyer', 'Manager', 'Director', 'VP Sales', 'Engineer', 'Analyst', 'CTO', 'Founder')
+PRODUCTS = ('Licence', 'Support plan', 'Onboarding', 'Training day', 'Hardware kit', 'Consulting hour')
+METHOD_WEIGHTS = ((1, 70), (2, 12), (3, 8), (4, 4), (5, 6))  # ActivityLog.method codes
+
+
+def choices(model, field):
+    return [value for value, _ in model._meta.get_field(field).choices]
+
+
+def money(rng, low, high):
+    return Decimal(rng.randrange(low * 100, high * 100)).scaleb(-2)
+
+
+class Seeder:
+    """
+    Generates ``ROWS_PER_SCALE * scale`` rows of every model and loads them
+    with COPY on PostgreSQL (``bulk_create`` elsewhere).
+
+    Primary keys are allocated up front from each table's current maximum,
+    so foreign keys are filled in without reading anything back, and the
+    same ``seed`` always produces the same rows on an empty database.
+    Seeding an existing database only adds rows; nothing is changed.
+    """
+
+    def __init__(self, scale, seed=0, chunk_size=CHUNK_SIZE, stdout=None):
+        self.scale = scale
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.stdout = stdout
+        self.rng = random.Random(seed)
+        self.now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        self.ids = {}  # model -> range of the ids created by this run
+        self.counts = {}
+
+    def run(self):
+        """Seed every model; returns ``{model name: rows created}``."""
+        started = time.perf_counter()
+        self.password = make_password(PASSWORD)
+        self.quote_base = (Quote.objects.aggregate(number=Max('quote_number'))['number'] or 0) + 1
+        if is_partitioned():
+            ensure_partitions(activity_settings()['PARTITIONS_AHEAD'])
+
+        for model, per_scale in ROWS_PER_SCALE.items():
+            if model is QuoteLineItem:
+                continue  # Written with their quotes
+            count = per_scale * self.scale
+            first = (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+            self.ids[model] = range(first, first + count)
+            loaded = (Quote, QuoteLineItem) if model is Quote else (model,)
+            model_started = time.perf_counter()
+            with transaction.atomic():
+                for each in loaded:
+                    self.load(each, getattr(self, f'{each._meta.model_name}_rows')())
+            for each in loaded:
+                self.log(each, time.perf_counter() - model_started)
+
+        self.reset_sequences()
+        self.index_search()
+        invalidate_dashboard_snapshot()
+        invalidate_forecast()
+        self.elapsed = time.perf_counter() - started
+        return {model.__name__: count for model, count in self.counts.items()}
+
+    def log(self, model, elapsed):
+        if self.stdout is not None:
+            count = self.counts.get(model, 0)
+            self.stdout.write(f'{model.__name__:<16}{count:>12,} rows {count / max(elapsed, 1e-9):>12,.0f} rows/s')
+
+    # Loading
+
+    def load(self, model, rows):
+        fields = model._meta.concrete_fields
+        # Generators fill in every column they care about; the rest get
+        # the field default, as Model() would.
+        defaults = {field.attname: field.get_default() for field in fields}
+        names = [field.attname for field in fields]
+        batch = []
+        for row in rows:
+            batch.append(tuple(row.get(name, defaults[name]) for name in names))
+            if len(batch) >= self.chunk_size:
+                self.write(model, fields, batch)
+                batch = []
+        self.write(model, fields, batch)
+
+    def write(self, model, fields, batch):
+        if not batch:
+            return
+        if connection.vendor == 'postgresql':
+            self.copy(model, fields, batch)
+        else:
+            names = [field.attname for field in fields]
+            model.objects.bulk_create([model(**dict(zip(names, row))) for row in batch], batch_size=1000)
+        self.counts[model] = self.counts.get(model, 0) + len(batch)
+
+    def copy(self, model, fields, batch):
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        sql = f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN'
+        data = io.StringIO()
+        for row in batch:
+            data.write('\t'.join(map(copy_value, row)))
+            data.write('\n')
+        data.seek(0)
+        with connection.cursor() as cursor:
+            if hasattr(cursor, 'copy_expert'):  # psycopg2
+                cursor.copy_expert(sql, data)
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(data.getvalue())
+
+    def reset_sequences(self):
+        # The ids were chosen here, so move the sequences past them.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(self.counts)):
+                cursor.execute(sql)
+            if connection.vendor == 'postgresql' and self.counts.get(Quote):
+                cursor.execute(
+                    'SELECT setval(%s, %s)', [QUOTE_NUMBER_SEQUENCE, self.quote_base + self.counts[Quote] - 1],
+                )
+
+    def index_search(self):
+        # bulk_create and COPY skip the signals that keep the index current.
+        for entity, source in SOURCES.items():
+            ids = self.ids[source.model]
+            rows = (
+                source.model.objects.filter(id__gte=ids.start, id__lt=ids.stop).order_by('id')
+                .values('id', *source.fields).iterator(chunk_size=self.chunk_size)
+            )
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= 2000:
+                    index_rows(entity, batch)
+                    batch = []
+            index_rows(entity, batch)
+
+    # Row generators
+
+    def pick(self, model):
+        ids = self.ids[model]
+        return self.rng.randrange(ids.start, ids.stop)
+
+    def moment(self, days=365):
+        return self.now - datetime.timedelta(seconds=self.rng.randrange(days * 86400))
+
+    def person(self):
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        return first, last
+
+    def phone(self):
+        return f'+1-555-{self.rng.randrange(10000000):07d}'
+
+    def address(self, prefix):
+        city, state, country = self.rng.choice(CITIES)
+        return {
+            f'{prefix}_street': f'{self.rng.randrange(1, 999)} {self.rng.choice(STREETS)}',
+            f'{prefix}_city': city,
+            f'{prefix}_state': state,
+            f'{prefix}_country': country,
+            f'{prefix}_postal_code': f'{self.rng.randrange(10000, 99999)}',
+        }
+
+    def audit(self, days=365):
+        created = self.moment(days)
+        user = self.pick(User)
+        return {
+            'created_at': created,
+            'modified_at': created,
+            'created_by_id': user,
+            'modified_by_id': user,
+            'assigned_to_id': self.rng.choice((user, self.pick(User))),
+        }
+
+    def user_rows(self):
+        user_types = choices(User, 'user_type')
+        for pk in self.ids[User]:
+            first, last = self.person()
+            created = self.moment()
+            admin = pk == self.ids[User].start or self.rng.random() < 0.02
+            yield {
+                'id': pk,
+                'password': self.password,
+                'username': f'{first.lower()}.{last.lower()}{pk}',
+                'email': f'{first.lower()}.{last.lower()}{pk}@example.com',
+                'full_name': f'{first} {last}',
+                'is_superuser': admin,
+                'is_staff': admin,
+                'user_type': 'Admin' if admin else self.rng.choice(user_types),
+                'department': self.rng.choice(DEPARTMENTS),
+                'mobile': self.phone(),
+                'created_at': created,
+                'modified_at': created,
+                'password_last_changed': created,
+                **self.address('address'),
+            }
+
+    def account_rows(self):
+        account_types = choices(Account, 'account_type')
+        industries = choices(Account, 'industry_type')
+        for pk in self.ids[Account]:
+            name = f'{self.rng.choice(COMPANY_WORDS)} {self.rng.choice(COMPANY_SUFFIXES)} {pk}'
+            slug = name.lower().replace(' ', '')
+            audit = self.audit()
+            yield {
+                'id': pk,
+                'name': name,
+                'assigned_to_id': audit['assigned_to_id'],
+                'modified_by_id': audit['modified_by_id'],
+                'created_at': audit['created_at'],
+                'modified_at': audit['modified_at'],
+                'website': f'https://{slug}.example.com',
+                'office_phone': self.phone(),
+                'email_address': f'info@{slug}.example.com',
+                **self.address('billing'),
+                **self.address('shipping'),
+                'account_type': self.rng.choice(account_types),
+                'industry_type': self.rng.choice(industries),
+                'annual_revenue': self.rng.randrange(100000, 500000000),
+                'employees': str(self.rng.choice((5, 20, 50, 200, 1000, 5000))),
+            }
+
+    def contact_rows(self):
+        titles = choices(Contact, 'title')
+        sources = choices(Contact, 'lead_source')
+        for pk in self.ids[Contact]:
+            first, last = self.person()
+            yield {
+                'id': pk,
+                'title': self.rng.choice(titles),
+                'first_name': first,
+                'last_name': last,
+                'office_phone': self.phone(),
+                'mobile': self.phone(),
+                'email_address': f'{first.lower()}.{last.lower()}{pk}@example.com',
+                'job_title': self.rng.choice(JOB_TITLES),
+                'account_id': self.contact_account(pk),
+                'department': self.rng.choice(DEPARTMENTS),
+                **self.address('primary_address'),
+                **self.address('alternate_address'),
+                'lead_source': self.rng.choice(sources),
+                **self.audit(),
+            }
+
+    def contact_account(self, contact_id):
+        # Contacts are spread over the accounts evenly, so a quote can pick
+        # a contact of its account without a lookup table.
+        accounts = self.ids[Account]
+        return accounts.start + (contact_id - self.ids[Contact].start) % len(accounts)
+
+    def lead_rows(self):
+        titles = choices(Lead, 'title')
+        statuses = choices(Lead, 'status')
+        sources = choices(Lead, 'lead_source')
+        for pk in self.ids[Lead]:
+            first, last = self.person()
+            company = f'{self.rng.choice(COMPANY_WORDS)} {self.rng.choice(COMPANY_SUFFIXES)}'
+            yield {
+                'id': pk,
+                'title': self.rng.choice(titles),
+                'first_name': first,
+                'last_name': last,
+                'email_address': f'{first.lower()}.{last.lower()}{pk}@example.net',
+                'mobile': self.phone(),
+                'office_phone': self.phone(),
+                'job_title': self.rng.choice(JOB_TITLES),
+                'department': self.rng.choice(DEPARTMENTS),
+                'account_name': company,
+                'status': self.rng.choice(statuses),
+                'lead_source': self.rng.choice(sources),
+                'opportunity_amount': money(self.rng, 1000, 250000),
+                'referred_by': self.rng.choice(FIRST_NAMES),
+                'reports_to_id': self.manager(pk),
+                **self.address('primary_address'),
+                **self.address('alternate_address'),
+                **self.audit(),
+            }
+
+    def manager(self, lead_id):
+        # Only earlier leads, so each COPY chunk references rows already loaded.
+        if lead_id == self.ids[Lead].start or self.rng.random() >= 0.1:
+            return None
+        return self.rng.randrange(self.ids[Lead].start, lead_id)
+
+    def opportunity_rows(self):
+        stages = choices(Opportunity, 'sales_stage')
+        sources = choices(Opportunity, 'lead_source')
+        business_types = choices(Opportunity, 'business_type')
+        for pk in self.ids[Opportunity]:
+            stage = self.rng.choice(stages)
+            yield {
+                'id': pk,
+                'opportunity_name': f'{self.rng.choice(PRODUCTS)} deal {pk}',
+                'currency': self.rng.choice(('USD', 'INR')),
+                'opportunity_amount': money(self.rng, 1000, 500000),
+                'sales_stage': stage,
+                'probability': 100 if stage == 'Closed Won' else 0 if stage == 'Closed Lost' else self.rng.randrange(5, 95, 5),
+                'next_step': self.rng.choice(('Call back', 'Send proposal', 'Demo', 'Negotiate')),
+                'account_id': self.opportunity_account(pk),
+                'expected_close_date': (self.now + datetime.timedelta(days=self.rng.randrange(-180, 365))).date(),
+                'business_type': self.rng.choice(business_types),
+                'lead_source': self.rng.choice(sources),
+                **self.audit(),
+            }
+
+    def opportunity_account(self, opportunity_id):
+        accounts = self.ids[Account]
+        return accounts.start + (opportunity_id - self.ids[Opportunity].start) * 7 % len(accounts)
+
+    def task_rows(self):
+        statuses = choices(Task, 'status')
+        parent_types = choices(Task, 'parent_type')
+        for pk in self.ids[Task]:
+            audit = self.audit()
+            start = (audit['created_at'] + datetime.timedelta(days=self.rng.randrange(0, 14))).date()
+            yield {
+                'id': pk,
+                'subject': f"{self.rng.choice(('Call', 'Email', 'Meet', 'Follow up with'))} {self.rng.choice(FIRST_NAMES)}",
+                'status': self.rng.choice(statuses),
+                'start_date': start,
+                'due_date': start + datetime.timedelta(days=self.rng.randrange(1, 30)),
+                'priority': self.rng.choice(('High', 'Medium', 'Low')),
+                'contact_name_id': self.pick(Contact),
+                'parent_type': self.rng.choice(parent_types),
+                **audit,
+            }
+
+    def quote_rows(self):
+        approval = choices(Quote, 'approval_status')
+        stages = choices(Quote, 'quote_stage')
+        invoice = choices(Quote, 'invoice_status')
+        terms = choices(Quote, 'payment_terms')
+        for offset, pk in enumerate(self.ids[Quote]):
+            opportunity = self.pick(Opportunity)
+            account = self.opportunity_account(opportunity)
+            accounts = self.ids[Account]
+            shipping = money(self.rng, 0, 200)
+            shipping_tax = (shipping * Decimal('0.18')).quantize(Decimal('0.01'))
+            audit = self.audit()
+            yield {
+                'id': pk,
+                'quote_title': f'Quote {self.quote_base + offset}',
+                'quote_number': self.quote_base + offset,
+                'valid_until': (audit['created_at'] + datetime.timedelta(days=30)).date(),
+                'approval_status': self.rng.choice(approval),
+                'opportunity_id': opportunity,
+                'quote_stage': self.rng.choice(stages),
+                'invoice_status': self.rng.choice(invoice),
+                'payment_terms': self.rng.choice(terms),
+                'payment_terms_other': '',
+                'account_id': account,
+                # The first contact of the same account (see contact_account).
+                'contact_id': self.ids[Contact].start + (account - accounts.start),
+                **self.address('billing_address'),
+                **self.address('shipping_address'),
+                'currency': self.rng.choice(('USD', 'INR')),
+                'shipping': shipping,
+                'shipping_tax': shipping_tax,
+                **compute_totals([line[3:] for line in self.lines(pk)], shipping, shipping_tax),
+                **audit,
+            }
+
+    def lines(self, quote_id):
+        """``(position, product, quote_id, quantity, unit_price, discount, tax)`` of a quote's lines."""
+        rng = random.Random(self.seed * 1000003 + quote_id)  # Same lines for quote_rows() and quotelineitem_rows()
+        return [
+            (
+                position, rng.choice(PRODUCTS), quote_id, Decimal(rng.randrange(1, 20)), money(rng, 10, 5000),
+                Decimal(rng.choice((0, 0, 5, 10))), Decimal(rng.choice((0, 5, 18))),
+            )
+            for position in range(rng.randrange(1, 6))
+        ]
+
+    def quotelineitem_rows(self):
+        ids = itertools.count((QuoteLineItem.objects.aggregate(last=Max('id'))['last'] or 0) + 1)
+        for quote_id in self.ids[Quote]:
+            for position, product, quote_id, quantity, unit_price, discount, tax in self.lines(quote_id):
+                yield {
+                    'id': next(ids),
+                    'quote_id': quote_id,
+                    'position': position,
+                    'product_name': product,
+                    'quantity': quantity,
+                    'unit_price': unit_price,
+                    'discount_percent': discount,
+                    'tax_percent': tax,
+                }
+
+    def note_rows(self):
+        related = (('Account', Account), ('Contact', Contact), ('Opportunity', Opportunity), ('Lead', Lead), ('Task', Task))
+        for pk in self.ids[Note]:
+            kind, model = self.rng.choice(related)
+            attached = self.rng.random() < 0.8
+            yield {
+                'id': pk,
+                'subject': f'{kind} note {pk}',
+                'description': 'Discussed pricing and next steps.',
+                'related_to_type': kind if attached else None,
+                'related_to_id': self.pick(model) if attached else None,
+                **self.audit(),
+            }
+
+    def activitylog_rows(self):
+        templates = [(route, template.count('{}')) for route, template in route_templates().items() if template.count('{}') <= 1]
+        methods, weights = zip(*METHOD_WEIGHTS)
+        start = self.now - datetime.timedelta(days=90)
+        step = datetime.timedelta(days=90) / max(len(self.ids[ActivityLog]), 1)
+        for offset, pk in enumerate(self.ids[ActivityLog]):
+            route, has_id = self.rng.choice(templates)
+            yield {
+                'id': pk,
+                'user_id': self.pick(User),
+                'method': self.rng.choices(methods, weights)[0],
+                'route': route,
+                'object_id': self.rng.randrange(1, 100000) if has_id else None,
+                'path': None,
+                'timestamp': start + step * offset,  # In time order, as they are logged
+            }
+
+
+COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def copy_value(value):
+    """``value`` in COPY's text format."""
+    if value is None:
+        return '\\N'
+    if value.__class__ is str:
+        return value.translate(COPY_ESCAPES)
+    if value is True or value is False:
+        return 't' if value else 'f'
+    return str(value)
@@ -1,10 +1,148 @@
 from rest_framework import serializers
 from django.contrib.auth.hashers import make_password
-from .models import User, Account, Contact, Opportunity, Lead, ActivityLog, Task, Quote, Note
+from django.db import transaction
+from .compiled import compile_serializer
+from .metrics import serialization_timer
+from .models import User, Account, Contact, Opportunity, Lead, ActivityLog, Task, Quote, QuoteLineItem, Note, ImportJob
+from .quotes import TOTAL_FIELDS, compute_totals, line_amounts, line_tuple, replace_line_items
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with serialization_timer():
+            return super().data
+
+
+class QueryPlanMixin:
+    """
+    Derives a queryset plan from the serializer's own field declarations.
+
+    Dotted sources such as ``source='assigned_to.username'`` become
+    ``select_related('assigned_to')`` so related rows are fetched in the same
+    query, nested ``many=True`` serializers over a reverse relation become
+    ``prefetch_related()``, nested serializers over a foreign key join in
+    with their own plan, and for reads the column list is narrowed with
+    ``only()`` to what the serializer actually renders.
+
+    Time spent in ``.data`` (of the serializer or its ``many=True`` list) is
+    reported to the request metrics (see metrics.py). ``get_compiled()``
+    gives the same output from ``values()`` rows (see compiled.py).
+    """
+
+    @property
+    def data(self):
+        with serialization_timer():
+            return super().data
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # many=True builds Meta.list_serializer_class; time it too.
+        meta = getattr(cls, 'Meta', None)
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+    @classmethod
+    def get_query_plan(cls):
+        plan = cls.__dict__.get('_query_plan')
+        if plan is None:
+            plan = cls._build_query_plan()
+            cls._query_plan = plan
+        return plan
+
+    @classmethod
+    def get_compiled(cls):
+        """The cached CompiledSerializer, or ``None`` if this serializer can't be compiled."""
+        if '_compiled' not in cls.__dict__:
+            cls._compiled = compile_serializer(cls)
+        return cls._compiled
+
+    @classmethod
+    def _build_query_plan(cls):
+        model = cls.Meta.model
+        concrete = {f.name for f in model._meta.concrete_fields}
+        reverse = {rel.get_accessor_name() for rel in model._meta.related_objects if rel.one_to_many}
+        select_related = []
+        prefetch_related = []
+        only = ['id']
+        for field in cls().fields.values():
+            if field.write_only:
+                continue
+            attrs = field.source_attrs
+            if isinstance(field, serializers.ListSerializer) and attrs and attrs[0] in reverse:
+                prefetch_related.append(attrs[0])
+                continue
+            if isinstance(field, QueryPlanMixin) and len(attrs) == 1 and attrs[0] in concrete:
+                # An expanded foreign key (see fieldsets.py): joined, with
+                # the nested serializer's own plan under its prefix.
+                nested_select, _, nested_only = type(field).get_query_plan()
+                for name in (attrs[0], *(f'{attrs[0]}__{name}' for name in nested_select)):
+                    if name not in select_related:
+                        select_related.append(name)
+                if nested_only is None:
+                    only = None
+                elif only is not None:
+                    only.extend(f'{attrs[0]}__{name}' for name in nested_only)
+                continue
+            if not attrs or attrs[0] not in concrete:
+                # Source is '*', a method or a property: we cannot tell
+                # which columns it needs, so don't narrow the column list.
+                only = None
+                continue
+            if len(attrs) > 1:
+                if attrs[0] not in select_related:
+                    select_related.append(attrs[0])
+                if only is not None:
+                    only.append('__'.join(attrs[:2]))
+            elif only is not None and attrs[0] not in only:
+                only.append(attrs[0])
+        return tuple(select_related), tuple(prefetch_related), tuple(only) if only is not None else None
+
+    @classmethod
+    def optimize_queryset(cls, queryset, read_only=True, extra_fields=()):
+        """
+        Apply the plan to ``queryset``. Column narrowing is only done for
+        reads: saving an instance with deferred fields would skip them
+        (including ``auto_now`` timestamps) in the UPDATE.
+        """
+        select_related, prefetch_related, only = cls.get_query_plan()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        if read_only and only is not None:
+            queryset = queryset.only(*only, *extra_fields)
+        return queryset
+
+
+class AuditMixin:
+    """
+    Stamps ``created_by`` (on create) and ``modified_by`` with the
+    requesting user, where the model has them.
+
+    The bulk endpoints (bulk.py) write with ``bulk_create()`` and
+    ``bulk_update()``, which never call ``create()``/``update()``; they
+    apply ``audit_fields()`` themselves and refuse serializers that
+    override create()/update() any further.
+    """
+
+    def audit_fields(self, created):
+        request = self.context.get('request')
+        if not (request and hasattr(request, 'user')):
+            return {}
+        concrete = {field.name for field in self.Meta.model._meta.concrete_fields}
+        names = ('created_by', 'modified_by') if created else ('modified_by',)
+        return {name: request.user for name in names if name in concrete}
+
+    def create(self, validated_data):
+        return super().create({**validated_data, **self.audit_fields(created=True)})
+
+    def update(self, instance, validated_data):
+        return super().update(instance, {**validated_data, **self.audit_fields(created=False)})
 
 
 # User Serializer
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(QueryPlanMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False)
     modified_by_username = serializers.CharField(source='modified_by.username', read_only=True)
     assigned_to_username = serializers.CharField(source='assigned_to.username', read_only=True)
@@ -78,7 +216,7 @@ class UserRegisterSerializer(serializers.ModelSerializer):
 
 
 # Account Serializer
-class AccountSerializer(serializers.ModelSerializer):
+class AccountSerializer(AuditMixin, QueryPlanMixin, serializers.ModelSerializer):
     assigned_to_username = serializers.CharField(source='assigned_to.username', read_only=True)
 
     class Meta:
@@ -109,21 +247,9 @@ class AccountSerializer(serializers.ModelSerializer):
             'modified_by',  # Include modified_by in the serializer
         ]
 
-    def create(self, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['modified_by'] = request.user
-        return super().create(validated_data)
-
-    def update(self, instance, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['modified_by'] = request.user
-        return super().update(instance, validated_data)
-
 
 # Contact Serializer
-class ContactSerializer(serializers.ModelSerializer):
+class ContactSerializer(AuditMixin, QueryPlanMixin, serializers.ModelSerializer):
     class Meta:
         model = Contact
         fields = [
@@ -156,21 +282,8 @@ class ContactSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_by', 'modified_by']
 
-    def create(self, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['created_by'] = request.user
-            validated_data['modified_by'] = request.user
-        return super().create(validated_data)
-
-    def update(self, instance, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['modified_by'] = request.user
-        return super().update(instance, validated_data)
-
 
-class OpportunitySerializer(serializers.ModelSerializer):
+class OpportunitySerializer(AuditMixin, QueryPlanMixin, serializers.ModelSerializer):
     class Meta:
         model = Opportunity
         fields = [
@@ -192,21 +305,8 @@ class OpportunitySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_by', 'modified_by']
 
-    def create(self, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['created_by'] = request.user
-            validated_data['modified_by'] = request.user
-        return super().create(validated_data)
 
-    def update(self, instance, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['modified_by'] = request.user
-        return super().update(instance, validated_data)
-
-
-class LeadSerializer(serializers.ModelSerializer):
+class LeadSerializer(AuditMixin, QueryPlanMixin, serializers.ModelSerializer):
     class Meta:
         model = Lead
         fields = [
@@ -244,28 +344,20 @@ class LeadSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_by', 'modified_by']
 
-    def create(self, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['created_by'] = request.user
-            validated_data['modified_by'] = request.user
-        return super().create(validated_data)
-
-    def update(self, instance, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['modified_by'] = request.user
-        return super().update(instance, validated_data)
 
+class ActivityLogSerializer(QueryPlanMixin, serializers.ModelSerializer):
+    # Stored compactly (see ActivityLog); rendered as before.
+    action = serializers.CharField(read_only=True)
+    method = serializers.CharField(source='get_method_display', read_only=True)
+    endpoint = serializers.CharField(read_only=True)
 
-class ActivityLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = ActivityLog
         fields = ['id', 'user', 'action', 'method', 'endpoint', 'timestamp']
         read_only_fields = ['user', 'timestamp']
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskSerializer(AuditMixin, QueryPlanMixin, serializers.ModelSerializer):
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     modified_by_username = serializers.CharField(source='modified_by.username', read_only=True)
     assigned_to_username = serializers.CharField(source='assigned_to.username', read_only=True)
@@ -295,21 +387,32 @@ class TaskSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_by', 'modified_by', 'created_at', 'modified_at']
 
-    def create(self, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['created_by'] = request.user
-            validated_data['modified_by'] = request.user
-        return super().create(validated_data)
 
-    def update(self, instance, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['modified_by'] = request.user
-        return super().update(instance, validated_data)
+class QuoteLineItemSerializer(QueryPlanMixin, serializers.ModelSerializer):
+    amount = serializers.SerializerMethodField()
 
+    class Meta:
+        model = QuoteLineItem
+        fields = [
+            'id',
+            'position',
+            'product_name',
+            'description',
+            'quantity',
+            'unit_price',
+            'discount_percent',
+            'tax_percent',
+            'amount',  # Discounted line amount, before tax
+        ]
+        read_only_fields = ['id', 'position']
+
+    def get_amount(self, line):
+        gross, discount, _ = line_amounts(*line_tuple(line))
+        return str(gross - discount)
 
-class QuoteSerializer(serializers.ModelSerializer):
+
+class QuoteSerializer(QueryPlanMixin, serializers.ModelSerializer):
+    line_items = QuoteLineItemSerializer(many=True, required=False)
     assigned_to_username = serializers.CharField(source='assigned_to.username', read_only=True)
     opportunity_name = serializers.CharField(source='opportunity.opportunity_name', read_only=True)
     account_name = serializers.CharField(source='account.name', read_only=True)
@@ -357,6 +460,7 @@ class QuoteSerializer(serializers.ModelSerializer):
             'shipping_tax',
             'tax',
             'grand_total',
+            'line_items',
             'created_at',
             'created_by',
             'created_by_username',
@@ -364,23 +468,61 @@ class QuoteSerializer(serializers.ModelSerializer):
             'modified_by',
             'modified_by_username',
         ]
-        read_only_fields = ['created_by', 'modified_by', 'created_at', 'modified_at']
+        # Money columns are computed from the line items (see crm_api/quotes.py)
+        # and the number is allocated from a sequence.
+        read_only_fields = [
+            'quote_number', *TOTAL_FIELDS, 'created_by', 'modified_by', 'created_at', 'modified_at',
+        ]
+
+    def validate_line_items(self, lines):
+        # PUT is partial, and that carries into the nested serializer; lines
+        # are always replaced whole, so check them as on create.
+        if not self.partial:
+            return lines
+        serializer = QuoteLineItemSerializer(data=self.initial_data['line_items'], many=True)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
 
     def create(self, validated_data):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             validated_data['created_by'] = request.user
             validated_data['modified_by'] = request.user
-        return super().create(validated_data)
+        lines = validated_data.pop('line_items', [])
+        validated_data.update(compute_totals(
+            [line_tuple(line) for line in lines],
+            validated_data.get('shipping'),
+            validated_data.get('shipping_tax'),
+        ))
+        with transaction.atomic():
+            quote = super().create(validated_data)
+            replace_line_items(quote, lines)
+        return quote
 
     def update(self, instance, validated_data):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
             validated_data['modified_by'] = request.user
-        return super().update(instance, validated_data)
+        lines = validated_data.pop('line_items', None)
+        if lines is not None:
+            line_values = [line_tuple(line) for line in lines]
+        else:
+            line_values = [line_tuple(line) for line in instance.line_items.all()]
+        validated_data.update(compute_totals(
+            line_values,
+            validated_data.get('shipping', instance.shipping),
+            validated_data.get('shipping_tax', instance.shipping_tax),
+        ))
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if lines is not None:
+                replace_line_items(instance, lines)
+                # Drop line items prefetched before the update.
+                getattr(instance, '_prefetched_objects_cache', {}).pop('line_items', None)
+        return instance
 
 
-class NoteSerializer(serializers.ModelSerializer):
+class NoteSerializer(AuditMixin, QueryPlanMixin, serializers.ModelSerializer):
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
     modified_by_username = serializers.CharField(source='modified_by.username', read_only=True)
     assigned_to_username = serializers.CharField(source='assigned_to.username', read_only=True)
@@ -404,15 +546,24 @@ class NoteSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_by', 'modified_by', 'created_at', 'modified_at']
 
-    def create(self, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['created_by'] = request.user
-            validated_data['modified_by'] = request.user
-        return super().create(validated_data)
 
-    def update(self, instance, validated_data):
-        request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            validated_data['modified_by'] = request.user
-        return super().update(instance, validated_data)
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id',
+            'entity',
+            'file_name',
+            'status',
+            'processed_rows',
+            'created_rows',
+            'duplicate_rows',
+            'failed_rows',
+            'errors',
+            'message',
+            'created_at',
+            'created_by',
+            'modified_at',
+            'finished_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,46 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal
+
+from .authentication import invalidate_cached_user
+from .changefeed import publish_bulk_saved, publish_deleted, publish_saved
+from .dashboard import invalidate_dashboard_snapshot
+from .forecast import invalidate_forecast
+from .models import User, Account, Contact, Opportunity, Lead, Task
+from .search import index_saved, index_bulk_saved, index_deleted
+from .sync import ENTITY_BY_MODEL, record_tombstone
+
+# Sent after bulk_create()/bulk_update() writes, which skip post_save.
+# Arguments: sender (the model), instances, created.
+post_bulk_save = Signal()
+
+
+def connect_signals():
+    # Anything shown on the dashboard invalidates its cached snapshot.
+    for model in (Account, Opportunity, Lead, Task):
+        post_save.connect(invalidate_dashboard_snapshot, sender=model, dispatch_uid=f'dashboard-save-{model.__name__}')
+        post_delete.connect(invalidate_dashboard_snapshot, sender=model, dispatch_uid=f'dashboard-delete-{model.__name__}')
+        post_bulk_save.connect(invalidate_dashboard_snapshot, sender=model, dispatch_uid=f'dashboard-bulk-{model.__name__}')
+
+    post_save.connect(invalidate_forecast, sender=Opportunity, dispatch_uid='forecast-save')
+    post_delete.connect(invalidate_forecast, sender=Opportunity, dispatch_uid='forecast-delete')
+    post_bulk_save.connect(invalidate_forecast, sender=Opportunity, dispatch_uid='forecast-bulk')
+
+    # Authenticated users are cached by id (see crm_api/authentication.py).
+    post_save.connect(invalidate_cached_user, sender=User, dispatch_uid='auth-user-save')
+    post_delete.connect(invalidate_cached_user, sender=User, dispatch_uid='auth-user-delete')
+
+    # Keep the search index in step with the searchable models.
+    for model in (Account, Contact, Lead, Opportunity):
+        post_save.connect(index_saved, sender=model, dispatch_uid=f'search-save-{model.__name__}')
+        post_delete.connect(index_deleted, sender=model, dispatch_uid=f'search-delete-{model.__name__}')
+        post_bulk_save.connect(index_bulk_saved, sender=model, dispatch_uid=f'search-bulk-{model.__name__}')
+
+    # Deletes of synced models are kept as tombstones for /api/sync/.
+    for model in ENTITY_BY_MODEL:
+        post_delete.connect(record_tombstone, sender=model, dispatch_uid=f'sync-delete-{model.__name__}')
+
+    # Writes to synced models are pushed to the /api/changes/ feed.
+    for model in ENTITY_BY_MODEL:
+        post_save.connect(publish_saved, sender=model, dispatch_uid=f'feed-save-{model.__name__}')
+        post_delete.connect(publish_deleted, sender=model, dispatch_uid=f'feed-delete-{model.__name__}')
+        post_bulk_save.connect(publish_bulk_saved, sender=model, dispatch_uid=f'feed-bulk-{model.__name__}')
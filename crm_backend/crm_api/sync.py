@@ -0,0 +1,158 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.timezone import now
+from rest_framework.exceptions import ValidationError
+
+from .models import Tombstone
+from .serializers import (
+    AccountSerializer, ContactSerializer, LeadSerializer, NoteSerializer, OpportunitySerializer, TaskSerializer,
+)
+
+DEFAULTS = {
+    # Rows (changed records and deletes together) per response, and the
+    # most ?limit= may ask for.
+    'PAGE_SIZE': 500,
+    'MAX_PAGE_SIZE': 2000,
+    # A window ends this many seconds before the request, so a transaction
+    # still committing rows with an earlier modified_at isn't skipped.
+    'LAG': 5.0,
+    # Tombstones are kept this long; older tokens get 410 and must resync.
+    'TOMBSTONE_DAYS': 30,
+}
+
+# Synced entities, in the order a window goes through them; deletes of all
+# of them (the tombstones) come last.
+ENTITIES = {
+    'accounts': AccountSerializer,
+    'contacts': ContactSerializer,
+    'leads': LeadSerializer,
+    'opportunities': OpportunitySerializer,
+    'tasks': TaskSerializer,
+    'notes': NoteSerializer,
+}
+ENTITY_BY_MODEL = {serializer_class.Meta.model: name for name, serializer_class in ENTITIES.items()}
+TOMBSTONES = len(ENTITIES)  # Phase number of the tombstones
+
+
+def sync_settings():
+    return {**DEFAULTS, **getattr(settings, 'SYNC', {})}
+
+
+class ExpiredToken(Exception):
+    pass
+
+
+def record_tombstone(sender, instance, **kwargs):
+    Tombstone.objects.create(entity=ENTITY_BY_MODEL[sender], object_id=instance.pk)
+
+
+def prune_tombstones(days):
+    """Delete tombstones older than ``days``; returns how many went."""
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=now() - datetime.timedelta(days=days)).delete()
+    return deleted
+
+
+def encode_token(position):
+    raw = json.dumps(position, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_token(token):
+    """
+    The window and position a token stands for: ``since`` and ``until``
+    bound the window, ``phase`` and ``after`` (the last ``(timestamp, id)``
+    returned) where in it to carry on.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        since = datetime.datetime.fromisoformat(position['since']) if position['since'] else None
+        until = datetime.datetime.fromisoformat(position['until']) if position['until'] else None
+        phase = int(position['phase'])
+        after = position['after']
+        if after is not None:
+            after = (datetime.datetime.fromisoformat(after[0]), int(after[1]))
+    except (TypeError, ValueError, KeyError, IndexError, UnicodeError):
+        raise ValidationError({'since': ['Invalid sync token.']})
+    if not 0 <= phase <= TOMBSTONES or any(value is not None and value.tzinfo is None for value in (since, until)):
+        raise ValidationError({'since': ['Invalid sync token.']})
+    return since, until, phase, after
+
+
+def window_rows(queryset, field, since, until, after, limit):
+    """Up to ``limit`` rows of ``queryset`` in the window, in ``(field, id)`` order after ``after``."""
+    queryset = queryset.filter(**{f'{field}__lte': until})
+    if since is not None:
+        queryset = queryset.filter(**{f'{field}__gt': since})
+    if after is not None:
+        queryset = queryset.filter(Q(**{f'{field}__gt': after[0]}) | Q(**{field: after[0], 'id__gt': after[1]}))
+    return list(queryset.order_by(field, 'id')[:limit])
+
+
+def changes(token=None, limit=None):
+    """
+    One page of what changed in a window: ``(changes, deleted, next
+    token, has_more)``.
+
+    Without a token the window runs from the beginning (every record, no
+    deletes). A window is fixed when it starts, so paging through it with
+    the returned tokens sees a consistent range, and records changed
+    meanwhile are left to the next window. Once ``has_more`` is false the
+    token starts that next window; clients keep it for their next sync.
+    Rows come in ``(modified_at, id)`` order from the sync indexes.
+    """
+    config = sync_settings()
+    if token:
+        since, until, phase, after = decode_token(token)
+        if since is not None and since < now() - datetime.timedelta(days=config['TOMBSTONE_DAYS']):
+            raise ExpiredToken
+    else:
+        since, until, phase, after = None, None, 0, None
+    if until is None:
+        until = now() - datetime.timedelta(seconds=config['LAG'])
+        if since is not None and until < since:
+            until = since
+
+    changed = {name: [] for name in ENTITIES}
+    deleted = {name: [] for name in ENTITIES}
+    remaining = limit or config['PAGE_SIZE']
+    names = list(ENTITIES)
+    while phase < TOMBSTONES or (phase == TOMBSTONES and since is not None):
+        if phase < TOMBSTONES:
+            serializer_class = ENTITIES[names[phase]]
+            compiled = serializer_class.get_compiled()
+            queryset = compiled.values(serializer_class.Meta.model.objects.all(), ('modified_at', 'id'))
+            rows = window_rows(queryset, 'modified_at', since, until, after, remaining + 1)
+            page = rows[:remaining]
+            changed[names[phase]].extend(compiled.render(page))
+            last = (page[-1]['modified_at'], page[-1]['id']) if page else None
+        else:
+            tombstones = Tombstone.objects.values_list('entity', 'object_id', 'deleted_at', 'id', named=True)
+            rows = window_rows(tombstones, 'deleted_at', since, until, after, remaining + 1)
+            page = rows[:remaining]
+            for row in page:
+                deleted[row.entity].append(row.object_id)
+            last = (page[-1].deleted_at, page[-1].id) if page else None
+        if len(rows) > remaining:
+            after = last
+            break
+        remaining -= len(rows)
+        phase, after = phase + 1, None
+        if not remaining:
+            break
+    else:
+        phase = TOMBSTONES + 1  # The window is done (a first sync skips the deletes)
+
+    if phase > TOMBSTONES:
+        position = {'since': until.isoformat(), 'until': None, 'phase': 0, 'after': None}
+    else:
+        position = {
+            'since': since.isoformat() if since else None,
+            'until': until.isoformat(),
+            'phase': phase,
+            'after': [after[0].isoformat(), after[1]] if after else None,
+        }
+    return changed, deleted, encode_token(position), phase <= TOMBSTONES
@@ -1,3 +1,1436 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import decimal
+import gzip
+import importlib
+import json
+import os
+import queue
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import skipIf, skipUnless
 
-# Create your tests here.
+import msgpack
+import openpyxl
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import resolve
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .activity import ActivityLogBuffer, activity_log_buffer, activity_settings, should_log
+from .authentication import USER_CACHE_KEY, CachedJWTAuthentication, add_user_claims
+from .benchmarks import uncovered_routes
+from .bulk import write_chunk
+from .importer import run_import
+from .dashboard import CACHE_KEY as DASHBOARD_CACHE_KEY
+from .changefeed import ChangeFeedApplication, Overflow, change_feed
+from .fieldsets import fieldset_serializer
+from .metrics import RequestMetrics, metrics_settings, registry as metrics_registry
+from .models import User, Account, ActivityLog, Contact, ImportJob, Task, Note, Quote, QuoteLineItem, SearchEntry
+from .profiling import NAME_RE, StackSampler, list_profiles, profile_path
+from .querystats import collector as query_stats_collector, query_stats_settings
+from .quotes import compute_totals, line_tuple, recalculate_quotes
+from .renderers import FastJSONRenderer, MessagePackRenderer
+from .search import search
+from .seed import PASSWORD, ROWS_PER_SCALE, Seeder
+from . import middleware, querystats, retention, serializers
+
+
+def create_account(user, **kwargs):
+    fields = {
+        'name': 'Acme',
+        'assigned_to': user,
+        'office_phone': '555-0100',
+        'email_address': 'info@acme.test',
+        'billing_street': '1 Main St',
+        'billing_postal_code': '10001',
+        'billing_city': 'Springfield',
+        'billing_state': 'State',
+        'billing_country': 'Country',
+        'shipping_street': '1 Main St',
+        'shipping_postal_code': '10001',
+        'shipping_city': 'Springfield',
+        'shipping_state': 'State',
+        'shipping_country': 'Country',
+        'account_type': 'Customer',
+        'industry_type': 'Banking',
+        'annual_revenue': 1000,
+        'employees': '10',
+    }
+    fields.update(kwargs)
+    return Account.objects.create(**fields)
+
+
+def create_contact(user, account, **kwargs):
+    fields = {
+        'title': 'Mr.',
+        'first_name': 'John',
+        'last_name': 'Doe',
+        'office_phone': '555-0101',
+        'mobile': '555-0102',
+        'email_address': 'john@acme.test',
+        'job_title': 'Buyer',
+        'account': account,
+        'assigned_to': user,
+        'department': 'Purchasing',
+        'primary_address_street': '1 Main St',
+        'primary_address_postal_code': '10001',
+        'primary_address_city': 'Springfield',
+        'primary_address_state': 'State',
+        'primary_address_country': 'Country',
+        'alternate_address_street': '',
+        'alternate_address_postal_code': '',
+        'alternate_address_city': '',
+        'alternate_address_state': '',
+        'alternate_address_country': '',
+        'lead_source': 'Email',
+        'created_by': user,
+        'modified_by': user,
+    }
+    fields.update(kwargs)
+    return Contact.objects.create(**fields)
+
+
+def create_task(user, contact, **kwargs):
+    fields = {
+        'subject': 'Follow up',
+        'created_by': user,
+        'modified_by': user,
+        'assigned_to': user,
+        'status': 'Not Started',
+        'start_date': datetime.date(2025, 1, 1),
+        'due_date': datetime.date(2025, 1, 8),
+        'priority': 'High',
+        'contact_name': contact,
+        'parent_type': 'Contact',
+    }
+    fields.update(kwargs)
+    return Task.objects.create(**fields)
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class QueryCountTests(TestCase):
+    """List and detail views must run a constant number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.account = create_account(cls.user)
+        cls.contact = create_contact(cls.user, cls.account)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_rows(self, count):
+        for i in range(count):
+            other = User.objects.create_user(f'user{i}', f'user{i}@acme.test')
+            create_task(other, self.contact, subject=f'Task {i}')
+            Note.objects.create(subject=f'Note {i}', assigned_to=other, created_by=other, modified_by=other)
+
+    def test_task_list_query_count_is_constant(self):
+        self.create_rows(20)
+        # One SELECT for the page and one INSERT from ActivityLoggerMiddleware.
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/tasks/?page_size=20')
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertEqual(response.data['results'][0]['contact_name_full'], 'John')
+
+    def test_note_list_query_count_is_constant(self):
+        self.create_rows(20)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/notes/?page_size=20')
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_user_list_query_count_is_constant(self):
+        self.create_rows(20)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/users/')
+        self.assertEqual(len(response.data), 21)
+
+    def test_task_detail_query_count(self):
+        task = create_task(self.user, self.contact)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/task/{task.id}/')
+        self.assertEqual(response.data['assigned_to_username'], 'owner')
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class SeedTests(TestCase):
+    """seed_crm data must be internally consistent and cover every model."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = Seeder(1, seed=7).run()
+
+    def test_row_counts(self):
+        for model, per_scale in ROWS_PER_SCALE.items():
+            if model is not QuoteLineItem:
+                self.assertEqual(model.objects.count(), per_scale, model.__name__)
+        self.assertEqual(QuoteLineItem.objects.count(), self.counts['QuoteLineItem'])
+        self.assertEqual(SearchEntry.objects.count(), 550)  # accounts, contacts, leads and opportunities
+
+    def test_related_rows_agree(self):
+        for quote in Quote.objects.select_related('opportunity', 'contact'):
+            self.assertEqual(quote.account_id, quote.opportunity.account_id)
+            self.assertEqual(quote.contact.account_id, quote.account_id)
+            lines = [line_tuple(line) for line in quote.line_items.all()]
+            self.assertEqual(quote.grand_total, compute_totals(lines, quote.shipping, quote.shipping_tax)['grand_total'])
+
+    def test_seeded_user_can_log_in(self):
+        user = User.objects.filter(is_superuser=True).first()
+        response = APIClient().post('/api/login/', {'username': user.username, 'password': PASSWORD}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_every_route_is_benchmarked(self):
+        self.assertEqual(uncovered_routes(), [])
+
+    def test_compiled_serializers_match(self):
+        User.objects.create_user('orphan', 'orphan@acme.test')  # no modified_by, assigned_to or created_by
+        render = JSONRenderer().render
+        for serializer_class in (
+            serializers.UserSerializer, serializers.AccountSerializer, serializers.ContactSerializer,
+            serializers.OpportunitySerializer, serializers.LeadSerializer, serializers.TaskSerializer,
+            serializers.NoteSerializer,
+        ):
+            compiled = serializer_class.get_compiled()
+            queryset = serializer_class.Meta.model.objects.order_by('id')
+            expected = render(serializer_class(queryset, many=True).data)
+            self.assertEqual(render(compiled.render(compiled.values(queryset))), expected, serializer_class.__name__)
+        self.assertIsNone(serializers.QuoteSerializer.get_compiled())  # nested line items
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class RendererTests(TestCase):
+    """The orjson and MessagePack renderers must carry the same values as DRF's JSONRenderer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.contact = create_contact(cls.user, create_account(cls.user))
+        for i in range(20):
+            create_task(cls.user, cls.contact, subject=f'Task {i}', description='\u2028 é' * 20)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_fast_json_matches_json_renderer(self):
+        data = {
+            'amount': decimal.Decimal('12.50'),
+            'at': timezone.now(),
+            'on': datetime.date(2025, 1, 8),
+            1: None,
+            'users': User.objects.values_list('username', flat=True),
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        response = self.client.get('/api/tasks/?page_size=20')
+        self.assertEqual(response.content, JSONRenderer().render(response.data))
+
+    def test_msgpack_negotiation(self):
+        response = self.client.get('/api/tasks/?page_size=20', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        expected = self.client.get('/api/tasks/?page_size=20').json()
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+        self.assertEqual(msgpack.unpackb(MessagePackRenderer().render({'at': timezone.now()}))['at'][-1], 'Z')
+
+        task = Task.objects.first()
+        body = {**expected['results'][-1], 'description': 'Sent as MessagePack'}
+        response = self.client.put(f'/api/task/{task.id}/', msgpack.packb(body), content_type='application/msgpack')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['description'], 'Sent as MessagePack')
+        response = self.client.put(f'/api/task/{task.id}/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(COMPRESSION={'MIN_SIZE': 2000})
+    def test_compression_threshold(self):
+        small = self.client.get('/api/tasks/?page_size=1', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+        large = self.client.get('/api/tasks/?page_size=20', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(large['Content-Encoding'], 'gzip')
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class FieldsetTests(TestCase):
+    """?fields= and ?expand= must narrow the output and the SQL, and expand with joins."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.contact = create_contact(cls.user, create_account(cls.user))
+        for i in range(5):
+            create_task(cls.user, cls.contact, subject=f'Task {i}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_sparse_list(self):
+        with self.assertNumQueries(2) as queries:
+            response = self.client.get('/api/tasks/?fields=id,subject')
+        self.assertEqual(list(response.data['results'][0]), ['id', 'subject'])
+        self.assertNotIn('description', queries.captured_queries[0]['sql'])
+
+    def test_expand_list_and_detail(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/tasks/?fields=subject&expand=assigned_to,contact_name')
+        task = response.data['results'][0]
+        self.assertEqual(list(task), ['subject', 'assigned_to', 'contact_name'])
+        self.assertEqual(task['assigned_to']['username'], 'owner')
+        self.assertEqual(task['contact_name']['first_name'], 'John')
+
+        task_id = Task.objects.first().id
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/task/{task_id}/?expand=assigned_to')
+        self.assertEqual(response.data['assigned_to']['username'], 'owner')
+        self.assertEqual(response.data['assigned_to_username'], 'owner')
+
+    def test_expanded_null_key(self):
+        response = self.client.get('/api/users/?fields=username&expand=modified_by')
+        self.assertEqual(response.data, [{'username': 'owner', 'modified_by': None}])
+
+    def test_unknown_names(self):
+        self.assertEqual(self.client.get('/api/tasks/?fields=nope').status_code, 400)
+        self.assertEqual(self.client.get('/api/tasks/?expand=subject').status_code, 400)
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False}, SYNC={'LAG': 0, 'PAGE_SIZE': 4})
+class SyncTests(TestCase):
+    """/api/sync/ must page through a window and report changes and deletes exactly once."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.contact = create_contact(cls.user, create_account(cls.user))
+        for i in range(5):
+            create_task(cls.user, cls.contact, subject=f'Task {i}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def sync(self, token=None):
+        """Every page of one window: ``({entity: ids}, {entity: ids}, next token)``."""
+        changed, deleted = {}, {}
+        while True:
+            response = self.client.get('/api/sync/', {'since': token} if token else {})
+            self.assertEqual(response.status_code, 200)
+            for entity, rows in response.data['changes'].items():
+                changed.setdefault(entity, []).extend(row['id'] for row in rows)
+            for entity, ids in response.data['deleted'].items():
+                deleted.setdefault(entity, []).extend(ids)
+            token = response.data['next']
+            if not response.data['has_more']:
+                return changed, deleted, token
+
+    def test_full_then_delta(self):
+        changed, deleted, token = self.sync()
+        self.assertEqual(len(changed['tasks']), 5)
+        self.assertEqual(changed['contacts'], [self.contact.id])
+        self.assertEqual(sum(map(len, deleted.values())), 0)
+
+        tasks = list(Task.objects.order_by('id'))
+        tasks[0].subject = 'Renamed'
+        tasks[0].save()
+        deleted_id = tasks[1].id
+        self.client.delete(f'/api/task/{deleted_id}/')
+        changed, deleted, token = self.sync(token)
+        self.assertEqual(changed['tasks'], [tasks[0].id])
+        self.assertEqual(deleted['tasks'], [deleted_id])
+
+        changed, deleted, _ = self.sync(token)
+        self.assertEqual(sum(map(len, changed.values())) + sum(map(len, deleted.values())), 0)
+
+    def test_invalid_and_expired_tokens(self):
+        self.assertEqual(self.client.get('/api/sync/', {'since': 'nope'}).status_code, 400)
+        with override_settings(SYNC={'TOMBSTONE_DAYS': 0}):
+            _, _, token = self.sync()
+            self.assertEqual(self.client.get('/api/sync/', {'since': token}).status_code, 410)
+
+
+class FeedConnection:
+    """An ASGI connection to the change feed, driven by the test."""
+
+    def __init__(self, scope_type, query, headers=()):
+        scope = {
+            'type': scope_type, 'path': '/api/changes/', 'method': 'GET', 'query_string': query.encode(),
+            'headers': list(headers),
+        }
+        self.received = asyncio.Queue()
+        self.sent = asyncio.Queue()
+        self.task = asyncio.ensure_future(ChangeFeedApplication(None)(scope, self.received.get, self.sent.put))
+
+    async def next(self):
+        return await asyncio.wait_for(self.sent.get(), 5)
+
+    async def close(self, message_type):
+        await self.received.put({'type': message_type})
+        await asyncio.wait_for(self.task, 5)
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class ChangeFeedTests(TestCase):
+    """/api/changes/ must push matching writes once committed, and drop clients that fall behind."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.other = User.objects.create_user('other', 'other@acme.test', 'secret')
+        cls.contact = create_contact(cls.user, create_account(cls.user))
+        cls.token = str(AccessToken.for_user(cls.user))
+
+    def write(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_task(self.other, self.contact)
+            create_contact(self.user, self.contact.account)
+            return create_task(self.user, self.contact)
+
+    async def test_sse_filters_by_entity_and_assignee(self):
+        connection = FeedConnection('http', f'entities=tasks&assigned_to=me&token={self.token}')
+        start = await connection.next()
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+        self.assertEqual((await connection.next())['body'], b'event: ready\ndata: {}\n\n')
+
+        task = await sync_to_async(self.write)()
+        expected = f'event: change\ndata: {{"entity":"tasks","action":"created","id":{task.id},"assigned_to":{self.user.id}}}\n\n'
+        self.assertEqual((await connection.next())['body'], expected.encode())
+        await connection.close('http.disconnect')
+        self.assertTrue(connection.sent.empty())
+        self.assertEqual(change_feed.connections, 0)
+
+    async def test_sse_rejects_bad_requests(self):
+        for query, status in (('', 401), ('token=nope', 401), (f'entities=widgets&token={self.token}', 400)):
+            connection = FeedConnection('http', query)
+            self.assertEqual((await connection.next())['status'], status)
+            await asyncio.wait_for(connection.task, 5)
+
+    @override_settings(CORS_ALLOW_ALL_ORIGINS=False, CORS_ALLOWED_ORIGINS=['https://app.acme.test'], CORS_ALLOW_CREDENTIALS=True)
+    async def test_sse_cors_headers(self):
+        for origin, allowed in (('https://app.acme.test', True), ('https://evil.test', False)):
+            connection = FeedConnection('http', f'token={self.token}', [(b'origin', origin.encode())])
+            headers = dict((await connection.next())['headers'])
+            self.assertEqual(headers[b'vary'], b'origin')
+            self.assertEqual(headers.get(b'access-control-allow-origin'), origin.encode() if allowed else None)
+            self.assertEqual(headers.get(b'access-control-allow-credentials'), b'true' if allowed else None)
+            await connection.close('http.disconnect')
+
+        # Errors too, so the browser can read why it was turned away.
+        connection = FeedConnection('http', '', [(b'origin', b'https://app.acme.test')])
+        start = await connection.next()
+        self.assertEqual(start['status'], 401)
+        self.assertIn((b'access-control-allow-origin', b'https://app.acme.test'), start['headers'])
+        await asyncio.wait_for(connection.task, 5)
+
+    @override_settings(CORS_ALLOW_ALL_ORIGINS=True)
+    async def test_sse_cors_allow_all(self):
+        connection = FeedConnection('http', f'token={self.token}', [(b'origin', b'https://app.acme.test')])
+        self.assertIn((b'access-control-allow-origin', b'*'), (await connection.next())['headers'])
+        await connection.close('http.disconnect')
+
+    @override_settings(CHANGE_FEED={'HEARTBEAT': 0.01})
+    async def test_websocket_heartbeat(self):
+        connection = FeedConnection('websocket', f'token={self.token}')
+        await connection.received.put({'type': 'websocket.connect'})
+        self.assertEqual((await connection.next())['type'], 'websocket.accept')
+        self.assertEqual((await connection.next())['text'], '{"type":"ready"}')
+        self.assertEqual((await connection.next())['text'], '{"type":"heartbeat"}')
+        await connection.close('websocket.disconnect')
+
+        connection = FeedConnection('websocket', '')
+        await connection.received.put({'type': 'websocket.connect'})
+        self.assertEqual((await connection.next())['type'], 'websocket.accept')
+        self.assertEqual((await connection.next())['type'], 'websocket.send')
+        self.assertEqual((await connection.next())['code'], 4401)
+
+    async def test_overflow(self):
+        subscriber = change_feed.subscribe(entities=frozenset(['tasks']), queue_size=2)
+        try:
+            change_feed.publish([{'entity': 'notes', 'action': 'created', 'id': 1, 'assigned_to': 1}] * 5)
+            change_feed.publish([{'entity': 'tasks', 'action': 'created', 'id': 1, 'assigned_to': 1}] * 2)
+            await asyncio.sleep(0)
+            self.assertEqual(await subscriber.get(1), '{"entity":"tasks","action":"created","id":1,"assigned_to":1}')
+            change_feed.publish([{'entity': 'tasks', 'action': 'updated', 'id': 1, 'assigned_to': 1}] * 2)
+            await asyncio.sleep(0)
+            with self.assertRaises(Overflow):
+                await subscriber.get(1)
+        finally:
+            change_feed.unsubscribe(subscriber)
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class PaginationTests(TestCase):
+    """Keyset pages must visit every row once, even when created_at ties."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.contact = create_contact(cls.user, create_account(cls.user))
+        cls.tasks = [create_task(cls.user, cls.contact, subject=f'Task {i}') for i in range(7)]
+        # Ties on created_at are broken by id.
+        Task.objects.filter(id__in=[task.id for task in cls.tasks[2:5]]).update(created_at=cls.tasks[2].created_at)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_cursor_walk(self):
+        seen = []
+        url = '/api/tasks/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        expected = Task.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, list(expected))
+
+    def test_bad_cursor(self):
+        for cursor in ('nope', 'eyJvcmRlcmluZyI6WyJpZCJdLCJ2YWx1ZXMiOlsxXX0='):
+            self.assertEqual(self.client.get('/api/tasks/', {'cursor': cursor}).status_code, 404)
+
+    def test_stream(self):
+        response = self.client.get('/api/tasks/?stream=1')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        expected = Task.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual([json.loads(line)['id'] for line in lines], list(expected))
+
+
+class ActivityLogTests(TransactionTestCase):
+    """Entries must be written in batches off the request, counted when dropped, and flushed on stop()."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        self.buffer = ActivityLogBuffer()
+        self.addCleanup(self.buffer.stop)
+
+    def entry(self):
+        return ActivityLog(user=self.user, method=1, route=0, path='/tasks/')
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_batches_then_flush_on_stop(self):
+        config = {**activity_settings(), 'BATCH_SIZE': 3, 'FLUSH_INTERVAL': 60}
+        for _ in range(4):
+            self.assertTrue(self.buffer.add(self.entry(), config))
+        self.wait_for(lambda: self.buffer.written == 3)
+        self.assertEqual(self.buffer.flushes, 1)
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+        self.buffer.stop()  # Also registered with atexit for the shared buffer
+        self.assertEqual(self.buffer.stats()['written'], 4)
+        self.assertEqual(ActivityLog.objects.count(), 4)
+
+    def test_full_queue_drops(self):
+        # No writer thread, so the one-entry queue stays full.
+        self.buffer._queue = queue.Queue(maxsize=1)
+        self.buffer._ensure_started = lambda config: None
+        config = {**activity_settings(), 'ENQUEUE_TIMEOUT': 0}
+        self.assertTrue(self.buffer.add(self.entry(), config))
+        self.assertFalse(self.buffer.add(self.entry(), config))
+        self.assertEqual(self.buffer.stats(), {
+            'queued': 1, 'enqueued': 1, 'dropped': 1, 'written': 0, 'failed': 0, 'flushes': 0,
+        })
+        self.buffer.flush()
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+    @override_settings(ACTIVITY_LOG={'ASYNC': True})
+    def test_requests_are_logged_through_the_buffer(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.addCleanup(activity_log_buffer.stop)
+        client.get('/api/tasks/')
+        activity_log_buffer.stop()
+        entry = ActivityLog.objects.get()
+        self.assertEqual((entry.get_method_display(), entry.endpoint), ('GET', '/tasks/'))
+
+    def test_should_log(self):
+        factory = RequestFactory()
+        read, write = factory.get('/api/tasks/'), factory.post('/api/tasks/')
+        for request in (read, write):
+            request.resolver_match = resolve(request.path)
+        choices = factory.get('/api/choices/')
+        choices.resolver_match = resolve(choices.path)
+
+        config = activity_settings()
+        self.assertTrue(should_log(read, config))
+        self.assertFalse(should_log(choices, config))
+        self.assertFalse(should_log(read, {**config, 'EXCLUDE_READ_ONLY': True}))
+        self.assertFalse(should_log(read, {**config, 'READ_SAMPLE_RATE': 0.0}))
+        self.assertTrue(should_log(write, {**config, 'EXCLUDE_READ_ONLY': True, 'READ_SAMPLE_RATE': 0.0}))
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class DashboardTests(TestCase):
+    """The dashboard snapshot must count every task and be rebuilt after a change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.contact = create_contact(cls.user, create_account(cls.user))
+        create_task(cls.user, cls.contact)
+        create_task(cls.user, cls.contact, status='Completed')
+        create_task(cls.user, cls.contact, status='Legacy')  # Not one of the choices
+
+    def setUp(self):
+        cache.delete(DASHBOARD_CACHE_KEY)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_snapshot(self):
+        response = self.client.get('/api/dashboard-metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['customer_count'], 1)
+        self.assertEqual(response.data['recent_leads'], [])  # Admins only
+        self.assertEqual(
+            {row['status']: row['count'] for row in response.data['task_stats']},
+            {'Completed': 1, 'Legacy': 1, 'Not Started': 1},
+        )
+        self.assertEqual(len(response.data['tasks_by_status']['Not Started']), 1)
+        self.assertEqual(response.data['tasks_by_status']['Deferred'], [])
+        self.assertNotIn('Legacy', response.data['tasks_by_status'])
+
+    def test_cached_until_a_change(self):
+        self.client.get('/api/dashboard-metrics/')
+        with self.assertNumQueries(1):  # The activity log INSERT only
+            self.client.get('/api/dashboard-metrics/')
+
+        create_task(self.user, self.contact, status='Deferred')
+        response = self.client.get('/api/dashboard-metrics/')
+        self.assertIn({'status': 'Deferred', 'count': 1}, response.data['task_stats'])
+        Task.objects.filter(status='Deferred').delete()
+        response = self.client.get('/api/dashboard-metrics/')
+        self.assertNotIn('Deferred', [row['status'] for row in response.data['task_stats']])
+
+
+def account_data(user, **kwargs):
+    account = create_account(user, name='Template')
+    data = {
+        key: value for key, value in serializers.AccountSerializer(account).data.items()
+        if key not in ('id', 'assigned_to_username', 'modified_by')
+    }
+    account.delete()
+    return {**data, **kwargs}
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class BulkTests(TestCase):
+    """Bulk endpoints must write the valid rows, report the rest by index, and stamp the audit fields."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.other = User.objects.create_user('other', 'other@acme.test', 'secret')
+        cls.existing = create_account(cls.user, name='Existing')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_create(self):
+        rows = [
+            account_data(self.user, name='A'),
+            account_data(self.user, name='Existing'),  # Already in the database
+            account_data(self.user, name='A'),  # Duplicate within the batch
+            account_data(self.user, name='B', modified_by=self.other.id),
+        ]
+        response = self.client.post('/api/accounts/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([row['index'] for row in response.data['succeeded']], [0, 3])
+        self.assertEqual([row['index'] for row in response.data['failed']], [1, 2])
+        # The requesting user wins over a submitted modified_by, as in create().
+        self.assertEqual(set(Account.objects.filter(name__in=['A', 'B']).values_list('modified_by', flat=True)), {self.user.id})
+
+    def test_update(self):
+        rows = [
+            {'id': self.existing.id, 'website': 'https://acme.test', 'modified_by': self.other.id},
+            {'id': 0, 'website': 'https://nowhere.test'},
+        ]
+        self.client.force_authenticate(self.other)
+        response = self.client.patch('/api/accounts/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['failed'], [{'index': 1, 'errors': {'id': ['No such record.']}}])
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.website, self.existing.modified_by_id), ('https://acme.test', self.other.id))
+        self.assertGreater(self.existing.modified_at, self.existing.created_at)
+
+    def test_delete(self):
+        response = self.client.delete('/api/accounts/bulk/', {'ids': [self.existing.id, 0]}, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['succeeded'], [{'index': 0, 'id': self.existing.id}])
+        self.assertFalse(Account.objects.filter(id=self.existing.id).exists())
+
+    def test_integrity_error_falls_back_to_rows(self):
+        chunk = [(0, Account(**account_data(self.user, name='C', assigned_to=self.user)))]
+        chunk.append((1, Account(**account_data(self.user, name=None, assigned_to=self.user))))
+        chunk.append((2, Account(**account_data(self.user, name='D', assigned_to=self.user))))
+        failed = []
+        written = write_chunk(chunk, Account.objects.bulk_create, failed)
+        self.assertEqual([index for index, _ in written], [0, 2])
+        self.assertEqual([row['index'] for row in failed], [1])
+        self.assertEqual(Account.objects.filter(name__in=['C', 'D']).count(), 2)
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class ImportTests(TestCase):
+    """Imports must stream a file, skip duplicates, report bad rows and count everything on the job."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.other = User.objects.create_user('other', 'other@acme.test', 'secret')
+        create_account(cls.user, name='Existing')
+
+    def rows(self):
+        header = [*account_data(self.user, name='x'), 'modified_by']
+        rows = [
+            account_data(self.user, name='New', modified_by=self.other.id),
+            account_data(self.user, name='Existing'),  # Already in the database
+            account_data(self.user, name='New'),  # Repeated in the file
+            account_data(self.user, name='Unassigned', assigned_to=0),
+            account_data(self.user, name='Bad revenue', annual_revenue='lots'),
+            account_data(self.user, name='Other'),
+        ]
+        return header, [[row.get(column, '') for column in header] for row in rows]
+
+    def write_file(self, extension):
+        header, rows = self.rows()
+        handle, path = tempfile.mkstemp(suffix=extension)
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        if extension == '.csv':
+            with open(path, 'w', newline='') as output:
+                writer = csv.writer(output)
+                writer.writerow(header)
+                writer.writerows(rows)
+        else:
+            workbook = openpyxl.Workbook()
+            workbook.active.append(header)
+            for row in rows:
+                workbook.active.append(row)
+            workbook.save(path)
+        return path
+
+    def run_job(self, extension, workers):
+        job = ImportJob.objects.create(entity='accounts', file_name=f'accounts{extension}', created_by=self.user)
+        return run_import(job, self.write_file(extension), workers=workers)
+
+    def check_job(self, job):
+        self.assertEqual(job.status, 'Completed', job.message)
+        counts = (job.processed_rows, job.created_rows, job.duplicate_rows, job.failed_rows)
+        self.assertEqual(counts, (6, 2, 2, 2))
+        self.assertEqual([error['row'] for error in job.errors], [6, 5])
+        self.assertEqual(list(job.errors[0]['errors']), ['annual_revenue'])
+        self.assertEqual(list(job.errors[1]['errors']), ['assigned_to'])
+        # The job's user is recorded, not the modified_by column.
+        self.assertEqual(Account.objects.get(name='New').modified_by_id, self.user.id)
+        self.assertTrue(Account.objects.filter(name='Other').exists())
+
+    def test_csv(self):
+        self.check_job(self.run_job('.csv', workers=0))
+
+    def test_xlsx_in_worker_processes(self):
+        self.check_job(self.run_job('.xlsx', workers=1))
+
+
+def quote_data(**kwargs):
+    return {
+        'quote_title': 'Renewal',
+        'valid_until': '2025-12-31',
+        'approval_status': 'Pending',
+        'quote_stage': 'Draft',
+        'invoice_status': 'Not Invoiced',
+        'payment_terms': 'Nett 30',
+        'payment_terms_other': '-',
+        'currency': 'USD',
+        'shipping': '5.00',
+        'line_items': [
+            {'product_name': 'Seats', 'quantity': '3', 'unit_price': '19.99', 'discount_percent': '10', 'tax_percent': '8.25'},
+            {'product_name': 'Setup', 'quantity': '1', 'unit_price': '100.00'},
+        ],
+        **kwargs,
+    }
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class QuoteTests(TestCase):
+    """Quote totals must come from the line items, and PUT must replace the lines whole."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create(self, **kwargs):
+        response = self.client.post('/api/quotes/', quote_data(**kwargs), format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def test_compute_totals(self):
+        # 59.97 gross, 6.00 off (5.997 rounded), 4.45 tax on 53.97 (4.452...)
+        totals = compute_totals([(3, '19.99', 10, '8.25'), (1, 100, 0, 0)], '5.00', None)
+        self.assertEqual(totals, {
+            'total': decimal.Decimal('159.97'),
+            'discount': decimal.Decimal('6.00'),
+            'sub_total': decimal.Decimal('153.97'),
+            'tax': decimal.Decimal('4.45'),
+            'grand_total': decimal.Decimal('163.42'),
+        })
+        self.assertEqual(compute_totals([])['grand_total'], 0)
+
+    def test_create_computes_totals_and_numbers(self):
+        first = self.create()
+        self.assertEqual((first['sub_total'], first['grand_total']), ('153.97', '163.42'))
+        self.assertEqual([line['amount'] for line in first['line_items']], ['53.97', '100.00'])
+        self.assertEqual([line['position'] for line in first['line_items']], [0, 1])
+        second = self.create(quote_number=1)  # Read-only; always allocated
+        self.assertEqual(second['quote_number'], first['quote_number'] + 1)
+
+    def test_put_replaces_line_items(self):
+        quote = self.create()
+        lines = [{'product_name': 'Support', 'quantity': '2', 'unit_price': '50'}]
+        response = self.client.put(f'/api/quote/{quote["id"]}/', {'line_items': lines}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([line['product_name'] for line in response.data['line_items']], ['Support'])
+        self.assertEqual(response.data['grand_total'], '105.00')
+        self.assertEqual(QuoteLineItem.objects.filter(quote_id=quote['id']).count(), 1)
+
+        # Without line_items the lines are kept, and the totals follow the shipping.
+        response = self.client.put(f'/api/quote/{quote["id"]}/', {'shipping': '0'}, format='json')
+        self.assertEqual((len(response.data['line_items']), response.data['grand_total']), (1, '100.00'))
+
+    def test_put_validates_line_items_whole(self):
+        quote = self.create()
+        response = self.client.put(f'/api/quote/{quote["id"]}/', {'line_items': [{'product_name': 'Half'}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data['line_items'][0]), {'quantity', 'unit_price'})
+        self.assertEqual(QuoteLineItem.objects.filter(quote_id=quote['id']).count(), 2)
+
+    def test_recalculate_quotes(self):
+        quote = self.create()
+        QuoteLineItem.objects.filter(quote_id=quote['id'], product_name='Setup').update(unit_price=200)
+        Quote.objects.filter(id=quote['id']).update(grand_total=0)
+        with self.assertNumQueries(4):  # Quotes, their lines, the update, and the empty next batch
+            self.assertEqual(recalculate_quotes(batch_size=10), 1)
+        self.assertEqual(Quote.objects.get(id=quote['id']).grand_total, decimal.Decimal('263.42'))
+
+
+class AmountMigrationTests(TestCase):
+    """0015 must read plain amounts and leave anything else NULL rather than guess."""
+
+    def test_parse_amount(self):
+        parse_amount = importlib.import_module('crm_api.migrations.0015_opportunity_amount_decimal').parse_amount
+        cases = {
+            '1500': decimal.Decimal('1500.00'),
+            '$1,234.5': decimal.Decimal('1234.50'),
+            ' ₹ 12,00,000 ': decimal.Decimal('1200000.00'),
+            'INR 1,00,000.50': decimal.Decimal('100000.50'),
+            '1,00,00': None,
+            'USD 99.999': decimal.Decimal('100.00'),
+            '-20': decimal.Decimal('-20.00'),
+            '10k': None,
+            '1e3': None,
+            '1.2.3': None,
+            '1,23': None,
+            '': None,
+            None: None,
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(parse_amount(value), expected)
+
+
+class RetentionTests(TestCase):
+    """Expired activity must be archived and removed, whether or not the log is partitioned."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+
+    def log(self, month, day=2):
+        timestamp = retention.month_range(month)[0] + datetime.timedelta(days=day - 1)
+        return ActivityLog.objects.create(user=self.user, method=1, route=0, path='/x/', timestamp=timestamp)
+
+    def test_month_math(self):
+        self.assertEqual(retention.add_months(datetime.date(2025, 11, 1), 3), datetime.date(2026, 2, 1))
+        self.assertEqual(retention.add_months(datetime.date(2025, 1, 1), -1), datetime.date(2024, 12, 1))
+        self.assertEqual(retention.add_months(datetime.date(2025, 1, 1), -25), datetime.date(2022, 12, 1))
+        start, end = retention.month_range(datetime.date(2024, 2, 1))
+        self.assertEqual((start.isoformat(), end.isoformat()), ('2024-02-01T00:00:00+00:00', '2024-03-01T00:00:00+00:00'))
+        self.assertEqual(retention.partition_name(datetime.date(2024, 2, 1)), 'crm_api_activitylog_p2024_02')
+
+    def test_apply_retention(self):
+        this_month = retention.current_month()
+        expired = retention.add_months(this_month, -14)
+        self.log(expired)
+        self.log(expired, day=20)
+        kept = [self.log(retention.add_months(this_month, -12)), self.log(this_month)]
+
+        self.assertEqual(retention.apply_retention(12, dry_run=True), [(expired, 'deleted', 2)])
+        self.assertEqual(ActivityLog.objects.count(), 4)
+
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir)
+        self.assertEqual(retention.apply_retention(12, archive_dir), [(expired, 'deleted', 2)])
+        self.assertEqual(sorted(ActivityLog.objects.values_list('id', flat=True)), [entry.id for entry in kept])
+        with gzip.open(os.path.join(archive_dir, f'activitylog-{expired:%Y-%m}.csv.gz'), 'rt') as handle:
+            rows = list(csv.reader(handle))
+        self.assertEqual(rows[0], list(retention.ARCHIVE_COLUMNS))
+        self.assertEqual([row[3] for row in rows[1:]], ['/x/', '/x/'])
+        self.assertEqual(retention.apply_retention(12), [])
+
+    @skipIf(connection.vendor == 'postgresql', 'The log is partitioned on PostgreSQL')
+    def test_command_without_partitions(self):
+        self.log(retention.add_months(retention.current_month(), -3))
+        output = StringIO()
+        call_command('maintain_activity_logs', retention_months=1, stdout=output)
+        self.assertFalse(retention.is_partitioned())
+        self.assertNotIn('partition created', output.getvalue())
+        self.assertIn('1 months expired', output.getvalue())
+        self.assertFalse(ActivityLog.objects.exists())
+
+    @skipUnless(connection.vendor == 'postgresql', 'Partitions are PostgreSQL only')
+    def test_ensure_partitions_moves_rows_out_of_the_default(self):
+        month = retention.add_months(retention.current_month(), 6)
+        entry = self.log(month)
+        self.assertIn(month, retention.ensure_partitions(6))
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM {retention.TABLE} WHERE id = %s', [entry.id])
+            self.assertEqual(cursor.fetchone()[0], retention.partition_name(month))
+        self.assertEqual(retention.ensure_partitions(6), [])
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class ConditionalTests(TestCase):
+    """Detail and choices responses must answer 304 only while the body they'd send is unchanged."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.account = create_account(cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, path, etag=None, **headers):
+        if etag:
+            headers['HTTP_IF_NONE_MATCH'] = etag
+        return self.client.get(path, **headers)
+
+    def test_detail(self):
+        path = f'/api/accounts/{self.account.id}/'
+        response = self.get(path)
+        etag = response['ETag']
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Accept', response['Vary'])
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.get(path, etag).status_code, 304)
+
+        # Another media type is another body.
+        self.assertEqual(self.get(path, etag, HTTP_ACCEPT='application/msgpack').status_code, 200)
+
+        # So is a related row, though the account itself didn't change.
+        User.objects.filter(id=self.user.id).update(username='renamed')
+        response = self.get(path, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['assigned_to_username'], 'renamed')
+        self.assertEqual(self.get(path, response['ETag']).status_code, 304)
+
+        response = self.get(f'{path}?expand=assigned_to', response['ETag'])
+        self.assertEqual((response.status_code, response.data['assigned_to']['username']), (200, 'renamed'))
+
+    def test_recalculated_quote(self):
+        response = self.client.post('/api/quotes/', quote_data(), format='json')
+        path = f'/api/quote/{response.data["id"]}/'
+        etag = self.get(path)['ETag']
+        QuoteLineItem.objects.filter(quote_id=response.data['id'], product_name='Setup').update(unit_price=200)
+        recalculate_quotes()
+        response = self.get(path, etag)
+        self.assertEqual((response.status_code, response.data['grand_total']), (200, '263.42'))
+
+    def test_choices(self):
+        response = self.get('/api/choices/')
+        version = response.data['version']
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Accept', response['Vary'])
+        self.assertEqual(self.get('/api/choices/', response['ETag']).status_code, 304)
+        self.assertEqual(self.get('/api/choices/', response['ETag'], HTTP_ACCEPT='application/msgpack').status_code, 200)
+
+        response = self.get(f'/api/choices/?v={version}')
+        self.assertEqual(set(response['Cache-Control'].split(', ')), {'private', 'max-age=31536000', 'immutable'})
+        response = self.get('/api/choices/?v=stale')
+        self.assertIn('no-cache', response['Cache-Control'])
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class AuthenticationTests(TestCase):
+    """JWT users must come from the cache until saved or deleted, or from the claims in stateless mode."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+
+    def setUp(self):
+        cache.delete(USER_CACHE_KEY.format(self.user.id))
+        self.factory = RequestFactory()
+
+    def authenticate(self, method='get', token=None):
+        token = token or AccessToken.for_user(self.user)
+        request = getattr(self.factory, method)('/api/tasks/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_cached_until_saved(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.authenticate().id, self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate().id, self.user.id)
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaisesMessage(AuthenticationFailed, 'User is inactive'):
+            self.authenticate()
+
+    def test_deleted(self):
+        self.authenticate()
+        token = AccessToken.for_user(self.user)
+        self.user.delete()
+        with self.assertRaisesMessage(AuthenticationFailed, 'No such user exists'):
+            self.authenticate(token=token)
+
+    @override_settings(JWT_STATELESS_READS=True)
+    def test_stateless_reads(self):
+        token = add_user_claims(AccessToken.for_user(self.user), self.user)
+        with self.assertNumQueries(0):
+            user = self.authenticate(token=token)
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual((user.id, user.username), (self.user.id, 'owner'))
+
+        # Writes still load the user, as do tokens issued without the claims.
+        self.assertIsInstance(self.authenticate('post', token), User)
+        self.assertIsInstance(self.authenticate(), User)
+
+        token['is_active'] = False
+        with self.assertRaisesMessage(AuthenticationFailed, 'User is inactive'):
+            self.authenticate(token=token)
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class MetricsTests(TestCase):
+    """/metrics must be private unless configured otherwise, and Server-Timing only go to admins by default."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.admin = User.objects.create_superuser('admin', 'admin@acme.test', 'secret')
+
+    def setUp(self):
+        metrics_registry.reset()
+        self.addCleanup(metrics_registry.reset)
+
+    def scrape(self, authorization=None):
+        headers = {'HTTP_AUTHORIZATION': authorization} if authorization else {}
+        return self.client.get('/metrics', **headers)
+
+    def test_metrics_access(self):
+        self.assertEqual(self.scrape().status_code, 401)
+        self.assertEqual(self.scrape(f'Bearer {AccessToken.for_user(self.user)}').status_code, 401)
+        self.assertEqual(self.scrape(f'Bearer {AccessToken.for_user(self.admin)}').status_code, 200)
+        with override_settings(REQUEST_METRICS={'TOKEN': 's3cret'}):
+            self.assertEqual(self.scrape('Bearer s3cret').status_code, 200)
+            self.assertEqual(self.scrape('Bearer wrong').status_code, 401)
+        with override_settings(REQUEST_METRICS={'PUBLIC': True}):
+            self.assertEqual(self.scrape().status_code, 200)
+
+    def test_registry_output(self):
+        request_metrics = RequestMetrics()
+        request_metrics.queries, request_metrics.sql_time = 3, 0.5
+        metrics_registry.observe('task-list', 'GET', 200, 0.02, request_metrics, 100, (0.01, 0.05))
+        metrics_registry.observe('task-list', 'GET', 404, 0.2, RequestMetrics(), None, (0.01, 0.05))
+        lines = metrics_registry.render((0.01, 0.05)).splitlines()
+        for line in (
+            '# TYPE crm_request_duration_seconds histogram',
+            'crm_request_duration_seconds_bucket{view="task-list",method="GET",le="0.01"} 0',
+            'crm_request_duration_seconds_bucket{view="task-list",method="GET",le="0.05"} 1',
+            'crm_request_duration_seconds_bucket{view="task-list",method="GET",le="+Inf"} 2',
+            'crm_request_duration_seconds_count{view="task-list",method="GET"} 2',
+            'crm_requests_total{view="task-list",method="GET",status="404"} 1',
+            'crm_db_queries_total{view="task-list",method="GET"} 3',
+            'crm_response_bytes_total{view="task-list",method="GET"} 100',
+        ):
+            self.assertIn(line, lines)
+
+    def test_requests_are_counted(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        client.get('/api/tasks/')
+        self.assertIn(
+            'crm_requests_total{view="task-list-create",method="GET",status="200"} 1',
+            metrics_registry.render(metrics_settings()['BUCKETS']).splitlines(),
+        )
+
+    def test_server_timing(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertNotIn('Server-Timing', client.get('/api/tasks/'))
+        with override_settings(REQUEST_METRICS={'SERVER_TIMING': True}):
+            self.assertIn('Server-Timing', client.get('/api/tasks/'))
+        client.force_authenticate(self.admin)
+        self.assertRegex(client.get('/api/tasks/')['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", serialize;dur=')
+
+    def test_list_serializers_are_timed(self):
+        self.assertIsInstance(serializers.TaskSerializer(many=True), serializers.TimedListSerializer)
+        narrowed = fieldset_serializer(serializers.TaskSerializer, ('id', 'subject'), ())
+        self.assertIsInstance(narrowed(many=True), serializers.TimedListSerializer)
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class QueryStatsTests(TestCase):
+    """Queries must be fingerprinted by shape, including those run while a response streams."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        create_task(cls.user, create_contact(cls.user, create_account(cls.user)))
+
+    def setUp(self):
+        self.directory = os.path.join(tempfile.mkdtemp(), 'stats')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.directory))
+        self.config = {**query_stats_settings(), 'SNAPSHOT_DIR': self.directory}
+        query_stats_collector.clear()
+        self.addCleanup(query_stats_collector.clear)
+
+    def test_normalize(self):
+        self.assertEqual(
+            querystats.normalize('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (1, 2, 3) AND "a"."name" = \'O\'\'Brien\' LIMIT 21'),
+            'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) AND "a"."name" = ? LIMIT ?',
+        )
+        self.assertEqual(
+            querystats.normalize('INSERT INTO "t" ("x", "y") VALUES (%s, %s), (%s, %s),\n (%s, %s)'),
+            'INSERT INTO "t" ("x", "y") VALUES (...), ...',
+        )
+        # Digits inside identifiers are not literals.
+        self.assertEqual(querystats.normalize('SELECT "t1"."col2" FROM t1 WHERE x > -1.5'), 'SELECT "t1"."col2" FROM t1 WHERE x > ?')
+
+    def test_fingerprint(self):
+        key, sql = querystats.fingerprint('SELECT * FROM "a" WHERE "id" IN (%s, %s)')
+        self.assertEqual((key, sql), querystats.fingerprint('SELECT  *  FROM "a" WHERE "id" IN (%s)'))
+        self.assertEqual(sql, 'SELECT * FROM "a" WHERE "id" IN (...)')
+        self.assertRegex(key, r'^[0-9a-f]{12}$')
+        self.assertNotEqual(key, querystats.fingerprint('SELECT * FROM "b" WHERE "id" IN (%s)')[0])
+
+    def test_params_only_when_asked(self):
+        query_stats_collector.record('v', 'SELECT %s', ('secret',), 0.1, self.config)
+        query_stats_collector.record('v', 'SELECT %s', ('secret',), 0.1, {**self.config, 'KEEP_PARAMS': True})
+        params = [sample['params'] for sample in querystats.report(config=self.config)['results'][0]['samples']]
+        self.assertEqual(sorted(params, key=str), ["('secret',)", None])
+
+    def test_snapshot_dir_is_private(self):
+        query_stats_collector.record('v', 'SELECT 1', (), 0.1, self.config)
+        query_stats_collector.write_snapshot(self.config)
+        self.assertEqual(os.stat(self.directory).st_mode & 0o777, 0o700)
+
+        os.chmod(self.directory, 0o777)
+        querystats.reset_stats(self.config)
+        self.assertEqual(os.stat(self.directory).st_mode & 0o777, 0o700)
+
+    def test_streamed_queries_are_recorded(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with override_settings(QUERY_STATS={'SNAPSHOT_DIR': self.directory}):
+            response = client.get('/api/tasks/?stream=1')
+            self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+            results = querystats.report(view='task-list-create', config=self.config)['results']
+        self.assertTrue(any('FROM "crm_api_task"' in row['sql'] for row in results))
+
+
+class CompactEndpointMigrationTests(TestCase):
+    """0019 must encode logged endpoints from its own frozen route table."""
+
+    def test_compact_endpoint(self):
+        compact_endpoint = importlib.import_module('crm_api.migrations.0019_activitylog_compact_columns').compact_endpoint
+        cases = {
+            '/accounts/': (9, None, None),
+            '/lead/12/': (25, 12, None),
+            '/accounts/bulk/': (12, None, None),
+            '/accounts/012/': (0, None, '/accounts/012/'),  # Wouldn't spell the same endpoint again
+            '/users/bob/': (0, None, '/users/bob/'),
+            '/task/3': (0, None, '/task/3'),
+            '/sync/': (0, None, '/sync/'),  # Added after the migration
+            '/x' * 200: (0, None, ('/x' * 200)[:255]),
+        }
+        for endpoint, expected in cases.items():
+            with self.subTest(endpoint=endpoint[:20]):
+                self.assertEqual(compact_endpoint(endpoint), expected)
+
+
+class RecordingSampler(StackSampler):
+    def __init__(self):
+        super().__init__()
+        self.started = 0
+
+    def start(self, thread_id, root, interval):
+        self.started += 1
+        return super().start(thread_id, root, interval)
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class ProfilerTests(TestCase):
+    """Profiles stay under DIR, and only admins can ask for one with the header."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.admin = User.objects.create_superuser('admin', 'admin@acme.test', 'secret')
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        self.config = {'DIR': os.path.join(root, 'profiles'), 'MAX_PER_VIEW': 20}
+        os.makedirs(os.path.join(self.config['DIR'], 'task_list_create'))
+        self.name = '20240101T000000-12ms-3s-1-0.collapsed'
+        with open(os.path.join(self.config['DIR'], 'task_list_create', self.name), 'w') as handle:
+            handle.write('a;b 3\n')
+        # A profile outside DIR that ".." would reach.
+        with open(os.path.join(root, self.name), 'w') as handle:
+            handle.write('a;b 3\n')
+
+        self.sampler = RecordingSampler()
+        original, middleware.sampler = middleware.sampler, self.sampler
+        self.addCleanup(setattr, middleware, 'sampler', original)
+
+    def test_names_starting_with_a_dot_are_rejected(self):
+        for name in ('.', '..', '.hidden'):
+            self.assertIsNone(NAME_RE.match(name))
+            self.assertIsNone(profile_path(name, self.name, self.config))
+            self.assertEqual(list_profiles(self.config, view=name), [])
+        self.assertIsNotNone(profile_path('task_list_create', self.name, self.config))
+        self.assertEqual(len(list_profiles(self.config, view='task_list_create')), 1)
+        self.assertEqual(len(list_profiles(self.config)), 1)
+
+    def test_header_is_ignored_for_non_admins(self):
+        with override_settings(PROFILER=self.config):
+            self.client.get('/api/tasks/', HTTP_X_PROFILE='1')
+            self.client.get('/api/tasks/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION='Bearer garbage')
+            self.client.get(
+                '/api/tasks/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}'
+            )
+            self.assertEqual(self.sampler.started, 0)
+            self.client.get(
+                '/api/tasks/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.admin)}'
+            )
+            self.assertEqual(self.sampler.started, 1)
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class FilterTests(TestCase):
+    """?field=, ?ordering= and ?facets= on list endpoints, and what they reject."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.other = User.objects.create_user('other', 'other@acme.test', 'secret')
+        contact = create_contact(cls.user, create_account(cls.user))
+        cls.tasks = [
+            create_task(cls.user, contact, subject='B', status='Not Started', priority='High',
+                        due_date=datetime.date(2025, 1, 5)),
+            create_task(cls.user, contact, subject='A', status='Completed', priority='Low',
+                        due_date=datetime.date(2025, 1, 10)),
+            create_task(cls.user, contact, subject='C', status='Completed', priority='High',
+                        due_date=datetime.date(2025, 1, 15)),
+            create_task(cls.user, contact, subject='D', status='Deferred', priority='Medium',
+                        due_date=datetime.date(2025, 1, 20), assigned_to=cls.other),
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ids(self, params):
+        response = self.client.get('/api/tasks/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['id'] for row in response.data['results']]
+
+    def test_filters(self):
+        first, second, third, fourth = (task.id for task in self.tasks)
+        self.assertEqual(sorted(self.ids({'status': 'Completed'})), [second, third])
+        self.assertEqual(sorted(self.ids({'status': 'Completed,Deferred'})), [second, third, fourth])
+        self.assertEqual(sorted(self.ids({'status': 'Completed', 'priority': 'High'})), [third])
+        self.assertEqual(sorted(self.ids({'due_date__gte': '2025-01-10', 'due_date__lt': '2025-01-20'})), [second, third])
+        self.assertEqual(self.ids({'assigned_to': 'me', 'status': 'Deferred'}), [])
+        self.assertEqual(self.ids({'assigned_to': self.other.pk}), [fourth])
+        # Parameters that aren't filters are left alone.
+        self.assertEqual(len(self.ids({'subject': 'A'})), 4)
+
+    def test_bad_filter_values(self):
+        for params in ({'status': 'Nope'}, {'due_date__gte': 'soon'}, {'assigned_to': 'x'}):
+            response = self.client.get('/api/tasks/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+    def test_ordering(self):
+        expected = [task.id for task in sorted(self.tasks, key=lambda task: task.subject)]
+        self.assertEqual(self.ids({'ordering': 'subject'}), expected)
+        self.assertEqual(self.ids({'ordering': '-due_date'}), [task.id for task in reversed(self.tasks)])
+        by_status = self.ids({'ordering': 'status,-due_date'})
+        self.assertEqual(by_status, [self.tasks[2].id, self.tasks[1].id, self.tasks[3].id, self.tasks[0].id])
+
+    def test_bad_ordering(self):
+        for ordering in ('password', 'subject,-subject', 'assigned_to'):
+            response = self.client.get('/api/tasks/', {'ordering': ordering})
+            self.assertEqual(response.status_code, 400, ordering)
+            self.assertIn('ordering', response.data)
+
+    def test_facets(self):
+        response = self.client.get('/api/tasks/', {'facets': 'status,priority', 'priority': 'High,Low'})
+        self.assertEqual(response.status_code, 200)
+        facets = response.data['facets']
+        self.assertEqual(facets['status']['Completed'], 2)
+        self.assertEqual(facets['status']['Not Started'], 1)
+        self.assertEqual(facets['status']['Deferred'], 0)
+        self.assertEqual(facets['priority'], {'High': 2, 'Medium': 0, 'Low': 1})
+        self.assertNotIn('facets', self.client.get('/api/tasks/').data)
+        self.assertEqual(self.client.get('/api/tasks/', {'facets': 'subject'}).status_code, 400)
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class SearchTests(TestCase):
+    """The search index must follow every write path, and title matches rank first."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.account = create_account(cls.user, name='Initech', email_address='sales@initech.test')
+        cls.contact = create_contact(cls.user, cls.account, first_name='Peter', last_name='Gibbons',
+                                     email_address='peter@initech.test')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def entry(self, entity, instance):
+        return SearchEntry.objects.filter(entity=entity, object_id=instance.pk).first()
+
+    def test_index_follows_save_and_delete(self):
+        self.assertEqual(self.entry('account', self.account).title, 'Initech')
+        self.account.name = 'Initrode'
+        self.account.save()
+        self.assertEqual(self.entry('account', self.account).title, 'Initrode')
+        self.assertEqual(SearchEntry.objects.filter(entity='account', object_id=self.account.pk).count(), 1)
+        self.contact.delete()
+        self.assertIsNone(self.entry('contact', self.contact))
+
+    def test_index_follows_bulk_writes(self):
+        rows = [account_data(self.user, name='Globex'), account_data(self.user, name='Hooli')]
+        response = self.client.post('/api/accounts/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        ids = [row['id'] for row in response.data['succeeded']]
+        self.assertEqual(
+            sorted(SearchEntry.objects.filter(entity='account', object_id__in=ids).values_list('title', flat=True)),
+            ['Globex', 'Hooli'],
+        )
+        response = self.client.patch('/api/accounts/bulk/', [{'id': ids[0], 'name': 'Globex Corp'}], format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(SearchEntry.objects.get(entity='account', object_id=ids[0]).title, 'Globex Corp')
+        self.client.delete('/api/accounts/bulk/', {'ids': ids}, format='json')
+        self.assertFalse(SearchEntry.objects.filter(entity='account', object_id__in=ids).exists())
+
+    def test_ranking(self):
+        rows = list(search('initech'))
+        self.assertEqual(
+            [(row['entity'], row['object_id']) for row in rows],
+            [('account', self.account.pk), ('contact', self.contact.pk)],
+        )
+        self.assertGreater(rows[0]['rank'], rows[1]['rank'])
+        # Prefixes and every term must match.
+        self.assertEqual([row['object_id'] for row in search('gibb pet')], [self.contact.pk])
+        self.assertEqual(list(search('peter nobody')), [])
+        self.assertEqual([row['entity'] for row in search('initech', ['contact'])], ['contact'])
+        self.assertEqual(list(search('!!')), [])
+
+    def test_endpoint(self):
+        response = self.client.get('/api/search/', {'q': 'initech', 'limit': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['type'], row['id']) for row in response.data['results']], [('account', self.account.pk)])
+        self.assertIn('offset=1', response.data['next'])
+        self.assertEqual(self.client.get('/api/search/', {'q': 'x', 'type': 'task'}).status_code, 400)
+
+    @skipIf(connection.vendor == 'postgresql', 'PostgreSQL uses the tsvector document instead')
+    def test_like_fallback(self):
+        # Phone numbers are indexed with and without separators.
+        self.assertEqual([row['object_id'] for row in search('5550101', ['contact'])], [self.contact.pk])
+        rows = list(search('initech test'))
+        # One point per term found in the title, a tenth for the content.
+        self.assertEqual([row['rank'] for row in rows], [1.1, 0.2])
+
+
+@override_settings(ACTIVITY_LOG={'ASYNC': False})
+class ExportTests(TestCase):
+    """Exports must stream every row as CSV or NDJSON, gzipped for clients that accept it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', 'owner@acme.test', 'secret')
+        cls.accounts = [create_account(cls.user, name=name, annual_revenue=1500) for name in ('Acme', 'Initech, Inc.')]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, export_format, **headers):
+        response = self.client.get(f'/api/accounts/export/?format={export_format}', **headers)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return response, body.decode('utf-8')
+
+    def test_csv(self):
+        response, body = self.export('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="accounts.csv"')
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual([row['id'] for row in rows], [str(account.id) for account in self.accounts])
+        self.assertEqual(rows[1]['name'], 'Initech, Inc.')
+        self.assertEqual(rows[0]['assigned_to_username'], 'owner')
+
+    def test_ndjson(self):
+        response, body = self.export('ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['Acme', 'Initech, Inc.'])
+        self.assertEqual(rows[0]['assigned_to'], self.user.id)
+        self.assertEqual(rows[0]['assigned_to_username'], 'owner')
+
+    def test_nested_lists_are_left_out(self):
+        response = self.client.get('/api/quotes/export/?format=ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(b'line_items', b''.join(response.streaming_content))
+
+    def test_gzip(self):
+        plain_response, plain = self.export('ndjson', HTTP_ACCEPT_ENCODING='identity')
+        self.assertNotIn('Content-Encoding', plain_response)
+        response, body = self.export('ndjson', HTTP_ACCEPT_ENCODING='br, gzip;q=0.8')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(body, plain)
+        for exported in (plain_response, response):
+            self.assertIn('Accept-Encoding', exported['Vary'])
@@ -7,27 +7,41 @@ from .views import (
     user_list,
     account_list_create,
     account_detail,
+    account_bulk,
     account_choices,
     contact_detail,
     contact_list_create,
+    contact_bulk,
     current_user,
     opportunity_list_create,
     opportunity_detail,
+    opportunity_bulk,
     opportunity_choices,
     lead_list_create,
     lead_detail,
+    lead_bulk,
     lead_choices,
     user_activity_logs,
     task_list_create,
     task_detail,
     dashboard_metrics,  # Import the dashboard metrics view
-    # quote_list_create,
-    # quote_detail,
-    # quote_choices,
+    forecast,
+    quote_list_create,
+    quote_detail,
+    quote_choices,
     user_choices,
+    choices,
     note_list_create,
     note_detail,
-    note_choices
+    note_choices,
+    import_create,
+    import_detail,
+    export_records,
+    search,
+    sync,
+    query_stats,
+    profile_list,
+    profile_detail,
 )
 
 urlpatterns = [
@@ -37,26 +51,46 @@ urlpatterns = [
     path('users/', user_list, name='user-list'),
     path('users/<str:username>/', user_detail, name='user-detail'),
     path('current-user/<str:username>/', current_user, name='current-user'),
+    path('choices/', choices, name='choices'),
     path('user-choices/', user_choices, name='user-choices'),
     path('accounts/', account_list_create, name='account-list-create'),
+    path('accounts/export/', export_records, {'entity': 'accounts'}, name='account-export'),
     path('accounts/<int:account_id>/', account_detail, name='account-detail'),
+    path('accounts/bulk/', account_bulk, name='account-bulk'),
     path('account/choices/', account_choices, name='account-choices'),  
     path('contacts/', contact_list_create, name='contact-list-create'),
+    path('contacts/export/', export_records, {'entity': 'contacts'}, name='contact-export'),
     path('contacts/<int:contact_id>/', contact_detail, name='contact-detail'),
+    path('contacts/bulk/', contact_bulk, name='contact-bulk'),
     path('opportunities/', opportunity_list_create, name='opportunity-list-create'),
+    path('opportunities/export/', export_records, {'entity': 'opportunities'}, name='opportunity-export'),
     path('opportunity/<int:opportunity_id>/', opportunity_detail, name='opportunity-detail'),
+    path('opportunities/bulk/', opportunity_bulk, name='opportunity-bulk'),
     path("opportunity-choices/", opportunity_choices, name="opportunity-choices"),
     path('leads/', lead_list_create, name='lead-list-create'),
+    path('leads/export/', export_records, {'entity': 'leads'}, name='lead-export'),
     path('lead/<int:lead_id>/', lead_detail, name='lead-detail'),
+    path('leads/bulk/', lead_bulk, name='lead-bulk'),
     path("lead-choices/", lead_choices, name="lead-choices"),
     path("activity-logs/", user_activity_logs, name="user-activity-logs"),
     path("tasks/", task_list_create, name="task-list-create"),
+    path("tasks/export/", export_records, {"entity": "tasks"}, name="task-export"),
     path("task/<int:task_id>/", task_detail, name="task-detail"),
     path("dashboard-metrics/", dashboard_metrics, name="dashboard-metrics"),  # New endpoint for dashboard metrics
-    # path("quotes/", quote_list_create, name="quote-list-create"),
-    # path("quote/<int:quote_id>/", quote_detail, name="quote-detail"),
-    # path("quote-choices/", quote_choices, name="quote-choices"),
+    path("forecast/", forecast, name="forecast"),
+    path("quotes/", quote_list_create, name="quote-list-create"),
+    path("quotes/export/", export_records, {"entity": "quotes"}, name="quote-export"),
+    path("quote/<int:quote_id>/", quote_detail, name="quote-detail"),
+    path("quote-choices/", quote_choices, name="quote-choices"),
     path("notes/", note_list_create, name="note-list-create"),
+    path("notes/export/", export_records, {"entity": "notes"}, name="note-export"),
     path("note/<int:note_id>/", note_detail, name="note-detail"),
     path("note-choices/", note_choices, name="note-choices"),
+    path("imports/", import_create, name="import-create"),
+    path("import/<int:job_id>/", import_detail, name="import-detail"),
+    path("search/", search, name="search"),
+    path("sync/", sync, name="sync"),
+    path("query-stats/", query_stats, name="query-stats"),
+    path("profiles/", profile_list, name="profile-list"),
+    path("profile/<str:view>/<str:name>/", profile_detail, name="profile-detail"),
 ]
\ No newline at end of file
@@ -1,14 +1,34 @@
 import requests
 import base64
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.hashers import check_password, make_password
-from .models import User, Account, Contact, Opportunity, Lead, ActivityLog, Task, Quote, Note
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from .models import User, Account, Contact, Opportunity, Lead, ActivityLog, Task, Quote, Note, ImportJob
+from .authentication import add_user_claims, is_superuser_request
+from .bulk import bulk_response
+from .choices import choices_response
+from .conditional import detail_response
+from .dashboard import get_dashboard_snapshot
+from .export import export_response
+from .fieldsets import sparse_serializer
+from .forecast import get_forecast
+from .importer import IMPORTERS, start_import
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics_settings, registry as metrics_registry
+from .pagination import list_response
+from .profiling import list_profiles, profile_path
+from .querystats import ORDERINGS as QUERY_ORDERINGS, report as query_report, reset_stats as reset_query_stats
 from .permissions import IsAdmin
-from .serializers import UserSerializer, UserRegisterSerializer, AccountSerializer, ContactSerializer, OpportunitySerializer, LeadSerializer, ActivityLogSerializer, TaskSerializer, QuoteSerializer, NoteSerializer
+from .renderers import CSVRenderer, NDJSONRenderer
+from .search import SOURCES as SEARCH_SOURCES, search as search_entries
+from .serializers import UserSerializer, UserRegisterSerializer, AccountSerializer, ContactSerializer, OpportunitySerializer, LeadSerializer, ActivityLogSerializer, TaskSerializer, QuoteSerializer, NoteSerializer, ImportJobSerializer
+from .sync import ExpiredToken, changes as sync_changes, sync_settings
 
 # Google Mail
 # from email.message import EmailMessage
@@ -27,7 +47,7 @@ def login_user(request):
         user = User.objects.filter(username=username).first()
         if not user or not check_password(password, user.password):
             return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
-        refresh = RefreshToken.for_user(user)
+        refresh = add_user_claims(RefreshToken.for_user(user), user)
         return Response({
             'refresh': str(refresh),
             'access': str(refresh.access_token),
@@ -44,21 +64,26 @@ def logout_user(request):
     return Response({'message': 'Logged out successfully. Discard your token on the client.'})
 
 
+def user_list_data(request):
+    # Rendered from values() rows when the serializer compiles, as in list_response
+    serializer_class = sparse_serializer(request, UserSerializer)
+    compiled = serializer_class.get_compiled()
+    if compiled is None:
+        return serializer_class(serializer_class.optimize_queryset(User.objects.all()), many=True).data
+    return compiled.render(compiled.values(User.objects.all()))
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def user_list(request):
-    users = User.objects.all()
-    serializer = UserSerializer(users, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return Response(user_list_data(request), status=status.HTTP_200_OK)
 
 
 @api_view(["GET", "POST"])
 @permission_classes([IsAuthenticated, IsAdmin])
 def user_create_list(request):
     if request.method == "GET":
-        users = User.objects.all()
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(user_list_data(request), status=status.HTTP_200_OK)
     elif request.method == "POST":
         data = request.data
         if User.objects.filter(username=data["username"]).exists():
@@ -72,13 +97,15 @@ def user_create_list(request):
 @api_view(["GET", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated, IsAdmin])
 def user_detail(request, username):
-    user = User.objects.filter(username=username).first()
+    serializer_class = sparse_serializer(request, UserSerializer)
+    user = serializer_class.optimize_queryset(
+        User.objects.filter(username=username), read_only=request.method == "GET", extra_fields=("modified_at",)
+    ).first()
     if not user:
         return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == "GET":
-        serializer = UserSerializer(user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return detail_response(request, user, serializer_class)
 
     elif request.method == "PUT":
         serializer = UserSerializer(user, data=request.data, partial=True)
@@ -107,6 +134,13 @@ def current_user(request, username):
         "is_self": request.user.username == username,
     })
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def choices(request):
+    # Every form's choice lists in one response; cache with ?v=<version> and ETag
+    return choices_response(request)
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def user_choices(request):
@@ -180,9 +214,7 @@ def user_choices(request):
 @permission_classes([IsAuthenticated])
 def account_list_create(request):
     if request.method == "GET":
-        accounts = Account.objects.all()
-        serializer = AccountSerializer(accounts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, Account.objects.all(), AccountSerializer)
 
     elif request.method == "POST":
         serializer = AccountSerializer(data=request.data, context={'request': request})
@@ -195,15 +227,17 @@ def account_list_create(request):
 @api_view(["GET", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def account_detail(request, account_id):
+    serializer_class = sparse_serializer(request, AccountSerializer)
     try:
-        account = Account.objects.get(id=account_id)
+        account = serializer_class.optimize_queryset(
+            Account.objects.all(), read_only=request.method == "GET", extra_fields=("modified_at",)
+        ).get(id=account_id)
     except Account.DoesNotExist:
         return Response({"error": "Account not found"}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == "GET":
         # Retrieve account details
-        serializer = AccountSerializer(account)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return detail_response(request, account, serializer_class)
 
     elif request.method == "PUT":
         # Update account details
@@ -219,6 +253,13 @@ def account_detail(request, account_id):
         return Response({"message": "Account deleted successfully"}, status=status.HTTP_200_OK)
 
 
+@api_view(["POST", "PATCH", "DELETE"])
+@permission_classes([IsAuthenticated])
+def account_bulk(request):
+    # POST creates, PATCH updates and DELETE removes many accounts at once
+    return bulk_response(request, AccountSerializer)
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def account_choices(request):
@@ -233,9 +274,7 @@ def account_choices(request):
 @permission_classes([IsAuthenticated])
 def contact_list_create(request):
     if request.method == "GET":
-        contacts = Contact.objects.all()
-        serializer = ContactSerializer(contacts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, Contact.objects.all(), ContactSerializer)
 
     elif request.method == "POST":
         serializer = ContactSerializer(data=request.data, context={'request': request})
@@ -248,15 +287,17 @@ def contact_list_create(request):
 @api_view(["GET", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def contact_detail(request, contact_id):
+    serializer_class = sparse_serializer(request, ContactSerializer)
     try:
-        contact = Contact.objects.get(id=contact_id)
+        contact = serializer_class.optimize_queryset(
+            Contact.objects.all(), read_only=request.method == "GET", extra_fields=("modified_at",)
+        ).get(id=contact_id)
     except Contact.DoesNotExist:
         return Response({"error": "Contact not found"}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == "GET":
         # Retrieve contact details
-        serializer = ContactSerializer(contact)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return detail_response(request, contact, serializer_class)
 
     elif request.method == "PUT":
         # Update contact details
@@ -272,13 +313,18 @@ def contact_detail(request, contact_id):
         return Response({"message": "Contact deleted successfully"}, status=status.HTTP_200_OK)
 
 
+@api_view(["POST", "PATCH", "DELETE"])
+@permission_classes([IsAuthenticated])
+def contact_bulk(request):
+    # POST creates, PATCH updates and DELETE removes many contacts at once
+    return bulk_response(request, ContactSerializer)
+
+
 @api_view(["GET", "POST"])
 @permission_classes([IsAuthenticated])
 def opportunity_list_create(request):
     if request.method == "GET":
-        opportunities = Opportunity.objects.all()
-        serializer = OpportunitySerializer(opportunities, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, Opportunity.objects.all(), OpportunitySerializer)
 
     elif request.method == "POST":
         serializer = OpportunitySerializer(data=request.data, context={'request': request})
@@ -291,15 +337,17 @@ def opportunity_list_create(request):
 @api_view(["GET", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def opportunity_detail(request, opportunity_id):
+    serializer_class = sparse_serializer(request, OpportunitySerializer)
     try:
-        opportunity = Opportunity.objects.get(id=opportunity_id)
+        opportunity = serializer_class.optimize_queryset(
+            Opportunity.objects.all(), read_only=request.method == "GET", extra_fields=("modified_at",)
+        ).get(id=opportunity_id)
     except Opportunity.DoesNotExist:
         return Response({"error": "Opportunity not found"}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == "GET":
         # Retrieve contact details
-        serializer = OpportunitySerializer(opportunity)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return detail_response(request, opportunity, serializer_class)
 
     elif request.method == "PUT":
         # Update contact details
@@ -315,6 +363,13 @@ def opportunity_detail(request, opportunity_id):
         return Response({"message": "Opportunity deleted successfully"}, status=status.HTTP_200_OK)
 
 
+@api_view(["POST", "PATCH", "DELETE"])
+@permission_classes([IsAuthenticated])
+def opportunity_bulk(request):
+    # POST creates, PATCH updates and DELETE removes many opportunities at once
+    return bulk_response(request, OpportunitySerializer)
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def opportunity_choices(request):
@@ -331,9 +386,7 @@ def opportunity_choices(request):
 @permission_classes([IsAuthenticated])
 def lead_list_create(request):
     if request.method == "GET":
-        leads = Lead.objects.all()
-        serializer = LeadSerializer(leads, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return list_response(request, Lead.objects.all(), LeadSerializer)
 
     elif request.method == "POST":
         serializer = LeadSerializer(data=request.data,  context={'request': request})
@@ -357,15 +410,17 @@ def lead_choices(request):
 @api_view(["GET", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def lead_detail(request, lead_id):
+    serializer_class = sparse_serializer(request, LeadSerializer)
     try:
-        lead = Lead.objects.get(id=lead_id)
+        lead = serializer_class.optimize_queryset(
+            Lead.objects.all(), read_only=request.method == "GET", extra_fields=("modified_at",)
+        ).get(id=lead_id)
     except Lead.DoesNotExist:
         return Response({"error": "Lead not found"}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == "GET":
         # Retrieve contact details
-        serializer = LeadSerializer(lead)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return detail_response(request, lead, serializer_class)
 
     elif request.method == "PUT":
         # Update contact details
@@ -381,11 +436,18 @@ def lead_detail(request, lead_id):
         return Response({"message": "Lead deleted successfully"}, status=status.HTTP_200_OK)
 
 
+@api_view(["POST", "PATCH", "DELETE"])
+@permission_classes([IsAuthenticated])
+def lead_bulk(request):
+    # POST creates, PATCH updates and DELETE removes many leads at once
+    return bulk_response(request, LeadSerializer)
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def user_activity_logs(request):
     limit = int(request.query_params.get("limit", 10))  # Default limit is 10
-    activities = ActivityLog.objects.filter(user=request.user).order_by("-timestamp")[:limit]
+    activities = ActivityLog.objects.filter(user_id=request.user.pk).order_by("-timestamp")[:limit]
     serializer = ActivityLogSerializer(activities, many=True)
     return Response(serializer.data, status=200)
 
@@ -394,10 +456,8 @@ def user_activity_logs(request):
 @permission_classes([IsAuthenticated])
 def task_list_create(request):
     if request.method == "GET":
-        # Retrieve all tasks
-        tasks = Task.objects.all()
-        serializer = TaskSerializer(tasks, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Retrieve tasks one keyset page (or stream) at a time
+        return list_response(request, Task.objects.all(), TaskSerializer)
 
     elif request.method == "POST":
         # Create a new task
@@ -411,16 +471,18 @@ def task_list_create(request):
 @api_view(["GET", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def task_detail(request, task_id):
+    serializer_class = sparse_serializer(request, TaskSerializer)
     try:
         # Retrieve the task by ID
-        task = Task.objects.get(id=task_id)
+        task = serializer_class.optimize_queryset(
+            Task.objects.all(), read_only=request.method == "GET", extra_fields=("modified_at",)
+        ).get(id=task_id)
     except Task.DoesNotExist:
         return Response({"error": "Task not found"}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == "GET":
         # Retrieve task details
-        serializer = TaskSerializer(task)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return detail_response(request, task, serializer_class)
 
     elif request.method == "PUT":
         # Update task details
@@ -440,81 +502,85 @@ def task_detail(request, task_id):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def dashboard_metrics(request):
-    # Count customers (accounts with account_type='Customer')
-    customer_count = Account.objects.filter(account_type='Customer').count()
-    
-    # Count all opportunities (deals)
-    deal_count = Opportunity.objects.all().count()
-    
-    # Get recent leads (only for admins)
-    recent_leads_data = []
-    if request.user.is_superuser:
-        recent_leads = Lead.objects.all().order_by('-created_at')[:6]
-        
-        for lead in recent_leads:
-            lead_data = {
-                'id': lead.id,
-                'first_name': lead.first_name,
-                'last_name': lead.last_name,
-                'status': lead.status,
-                'email': lead.email_address,
-                'phone': lead.mobile,
-                'created_at': lead.created_at,
-                'lead_source': lead.lead_source,
-            }
-            recent_leads_data.append(lead_data)
-    
-    # Get task statistics grouped by status
-    from django.db.models import Count
-    task_stats = Task.objects.values('status').annotate(count=Count('status'))
-    
-    # Get recent tasks with details for the task section
-    tasks_by_status = {}
-    for status_choice, _ in Task.status_choices:
-        tasks_data = []
-        tasks = Task.objects.filter(status=status_choice).order_by('-modified_at')[:3]
-        
-        for task in tasks:
-            task_data = {
-                'id': task.id,
-                'subject': task.subject,
-                'date': task.modified_at,
-                'due_date': task.due_date,
-                'priority': task.priority,
-                'assigned_to': task.assigned_to.username if task.assigned_to else None,
-            }
-            tasks_data.append(task_data)
-        
-        tasks_by_status[status_choice] = tasks_data
-    
-    return Response({
-        'customer_count': customer_count,
-        'deal_count': deal_count,
-        'recent_leads': recent_leads_data,
-        'task_stats': task_stats,
-        'tasks_by_status': tasks_by_status,
-    }, status=status.HTTP_200_OK)
+    # Served from a short-lived snapshot that is dropped whenever an
+    # account, opportunity, lead or task changes (see crm_api/signals.py)
+    snapshot = get_dashboard_snapshot()
+
+    # Recent leads are only shown to admins
+    recent_leads = snapshot['recent_leads'] if request.user.is_superuser else []
+
+    return Response({**snapshot, 'recent_leads': recent_leads}, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def forecast(request):
+    # Pipeline and probability-weighted value by stage, owner and close month,
+    # cached until an opportunity changes (see crm_api/signals.py)
+    return Response(get_forecast(), status=status.HTTP_200_OK)
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAuthenticated])
+def quote_list_create(request):
+    if request.method == "GET":
+        return list_response(request, Quote.objects.all(), QuoteSerializer)
+
+    elif request.method == "POST":
+        # Totals are computed from line_items; quote_number is allocated
+        serializer = QuoteSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(["GET", "PUT", "DELETE"])
+@permission_classes([IsAuthenticated])
+def quote_detail(request, quote_id):
+    serializer_class = sparse_serializer(request, QuoteSerializer)
+    try:
+        quote = serializer_class.optimize_queryset(
+            Quote.objects.all(), read_only=request.method == "GET", extra_fields=("modified_at",)
+        ).get(id=quote_id)
+    except Quote.DoesNotExist:
+        return Response({"error": "Quote not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == "GET":
+        return detail_response(request, quote, serializer_class)
+
+    elif request.method == "PUT":
+        # Sending line_items replaces all of the quote's lines
+        serializer = QuoteSerializer(quote, data=request.data, partial=True, context={'request': request})
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    elif request.method == "DELETE":
+        quote.delete()
+        return Response({"message": "Quote deleted successfully"}, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def quote_choices(request):
+    choices = {
+        "approval_status": Quote.approval_status_choices,
+        "quote_stage": Quote.quote_stage_choices,
+        "invoice_status": Quote.invoice_status_choices,
+        "payment_terms": Quote.payment_terms_choices,
+        "currency": Quote.currency_choices,
+    }
+    return Response(choices)
 
 
 @api_view(["GET", "POST"])
 @permission_classes([IsAuthenticated])
 def note_list_create(request):
     if request.method == "GET":
-        # Get optional filter parameters
-        related_to_type = request.query_params.get('related_to_type')
-        related_to_id = request.query_params.get('related_to_id')
-        
-        # Apply filters if provided
-        if related_to_type and related_to_id:
-            notes = Note.objects.filter(related_to_type=related_to_type, related_to_id=related_to_id)
-        else:
-            notes = Note.objects.all()
-            
-        # Order by most recent
-        notes = notes.order_by('-created_at')
-        
-        serializer = NoteSerializer(notes, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # ?related_to_type=&related_to_id= and the other filters in crm_api/filters.py
+        return list_response(request, Note.objects.all(), NoteSerializer)
 
     elif request.method == "POST":
         # Create a new note
@@ -528,16 +594,18 @@ def note_list_create(request):
 @api_view(["GET", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def note_detail(request, note_id):
+    serializer_class = sparse_serializer(request, NoteSerializer)
     try:
         # Retrieve the note by ID
-        note = Note.objects.get(id=note_id)
+        note = serializer_class.optimize_queryset(
+            Note.objects.all(), read_only=request.method == "GET", extra_fields=("modified_at",)
+        ).get(id=note_id)
     except Note.DoesNotExist:
         return Response({"error": "Note not found"}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == "GET":
         # Retrieve note details
-        serializer = NoteSerializer(note)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return detail_response(request, note, serializer_class)
 
     elif request.method == "PUT":
         # Update note details
@@ -560,3 +628,145 @@ def note_choices(request):
         "related_to_type": Note.related_to_type_choices,
     }
     return Response(choices)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def import_create(request):
+    # Upload a .csv/.xlsx file; rows are imported in the background
+    entity = request.data.get('entity')
+    uploaded_file = request.FILES.get('file')
+    if entity not in IMPORTERS:
+        return Response({"error": f"entity must be one of {', '.join(sorted(IMPORTERS))}"}, status=status.HTTP_400_BAD_REQUEST)
+    if not uploaded_file or not uploaded_file.name.lower().endswith(('.csv', '.xlsx')):
+        return Response({"error": "Upload a .csv or .xlsx file"}, status=status.HTTP_400_BAD_REQUEST)
+
+    job = ImportJob.objects.create(entity=entity, file_name=uploaded_file.name, created_by=request.user)
+    start_import(job, uploaded_file)
+    return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def import_detail(request, job_id):
+    # Poll the progress of an import job
+    try:
+        job = ImportJob.objects.get(id=job_id, created_by_id=request.user.pk)
+    except ImportJob.DoesNotExist:
+        return Response({"error": "Import job not found"}, status=status.HTTP_404_NOT_FOUND)
+    return detail_response(request, job, ImportJobSerializer)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@renderer_classes([CSVRenderer, NDJSONRenderer])
+def export_records(request, entity):
+    # Stream every record of an entity as CSV (default) or NDJSON
+    export_format = request.query_params.get('format', 'csv')
+    return export_response(request, entity, export_format)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search(request):
+    # Ranked full-text search across accounts, contacts, leads and opportunities
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+    entities = [entity for entity in request.query_params.get('type', '').split(',') if entity]
+    unknown = set(entities) - set(SEARCH_SOURCES)
+    if unknown:
+        return Response({"error": f"type must be one of {', '.join(sorted(SEARCH_SOURCES))}"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        offset = max(int(request.query_params.get('offset', 0)), 0)
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+    except ValueError:
+        return Response({"error": "offset and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+    # One extra row tells us whether there is a next page.
+    rows = list(search_entries(query, entities)[offset:offset + limit + 1])
+    next_url = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_url = replace_query_param(request.build_absolute_uri(), 'offset', offset + limit)
+    results = [
+        {
+            "type": row['entity'],
+            "id": row['object_id'],
+            "title": row['title'],
+            "subtitle": row['subtitle'],
+            "rank": row['rank'],
+        }
+        for row in rows
+    ]
+    return Response({"next": next_url, "results": results}, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def sync(request):
+    # Records changed and deleted since ?since= (the "next" token of the last sync), a page at a time
+    config = sync_settings()
+    try:
+        limit = min(max(int(request.query_params.get("limit", config['PAGE_SIZE'])), 1), config['MAX_PAGE_SIZE'])
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        changed, deleted, token, has_more = sync_changes(request.query_params.get("since"), limit)
+    except ExpiredToken:
+        return Response({"error": "since is older than the deletes kept; sync again without it"}, status=status.HTTP_410_GONE)
+    return Response({"changes": changed, "deleted": deleted, "next": token, "has_more": has_more}, status=status.HTTP_200_OK)
+
+
+@api_view(["GET", "DELETE"])
+@permission_classes([IsAuthenticated, IsAdmin])
+def query_stats(request):
+    # Query fingerprints per view, merged across worker processes; DELETE resets them
+    if request.method == "DELETE":
+        reset_query_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    order = request.query_params.get("order", "total")
+    if order not in QUERY_ORDERINGS:
+        return Response({"error": f"order must be one of {', '.join(QUERY_ORDERINGS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.query_params.get("limit", 50)), 1), 500)
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    report = query_report(view=request.query_params.get("view") or None, order=order, limit=limit)
+    return Response(report, status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdmin])
+def profile_list(request):
+    # Saved request profiles, newest first; ?view=lead_list_create narrows them
+    return Response(list_profiles(view=request.query_params.get("view") or None), status=status.HTTP_200_OK)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated, IsAdmin])
+def profile_detail(request, view, name):
+    # The collapsed stacks themselves, ready for flamegraph.pl or speedscope
+    path = profile_path(view, name)
+    if path is None:
+        return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+    with open(path) as handle:
+        content = handle.read()
+    response = HttpResponse(content, content_type="text/plain; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{view}-{name}"'
+    return response
+
+
+@require_GET
+def metrics(request):
+    # Plain Django view: Prometheus sends the static token, people an admin's JWT.
+    config = metrics_settings()
+    token = config['TOKEN']
+    authorized = (
+        config['PUBLIC']
+        or (token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'))
+        or is_superuser_request(request)
+    )
+    if not authorized:
+        return HttpResponse(status=401)
+    return HttpResponse(metrics_registry.render(config['BUCKETS']), content_type=METRICS_CONTENT_TYPE)
@@ -0,0 +1,15 @@
+import axios from "axios";
+
+// The list endpoints (/api/accounts/, /api/tasks/, ...) return one keyset
+// page at a time as {next, results}. getAllPages() follows `next` to the
+// end and resolves like axios.get(), with response.data holding every row.
+export async function getAllPages(url, config) {
+  const separator = url.includes("?") ? "&" : "?";
+  let response = await axios.get(`${url}${separator}page_size=500`, config);
+  const rows = [...response.data.results];
+  while (response.data.next) {
+    response = await axios.get(response.data.next, config);
+    rows.push(...response.data.results);
+  }
+  return { ...response, data: rows };
+}
@@ -1,6 +1,7 @@
 import React, { useEffect, useState, useCallback } from "react";
 import { useParams, useNavigate } from "react-router-dom";
 import axios from "axios";
+import { getAllPages } from "../api";
 import SideNav from "./SideNav";
 import "./AccountDetails.css";
 
@@ -33,7 +34,7 @@ const AccountDetails = () => {
         axios.get("http://localhost:8000/api/account/choices/", {
           headers: { Authorization: `Bearer ${accessToken}` },
         }),
-        axios.get("http://localhost:8000/api/accounts/", {
+        getAllPages("http://localhost:8000/api/accounts/", {
           headers: { Authorization: `Bearer ${accessToken}` },
         }),
       ]);
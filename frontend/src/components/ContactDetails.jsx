@@ -1,6 +1,7 @@
 import React, { useEffect, useState, useCallback } from "react";
 import { useParams, useNavigate } from "react-router-dom";
 import axios from "axios";
+import { getAllPages } from "../api";
 import SideNav from "./SideNav";
 import "./ContactDetails.css";
 
@@ -30,10 +31,10 @@ const ContactDetails = () => {
         axios.get(`http://localhost:8000/api/contacts/${id}/`, {
           headers: { Authorization: `Bearer ${accessToken}` },
         }),
-        axios.get("http://localhost:8000/api/accounts/", {
+        getAllPages("http://localhost:8000/api/accounts/", {
           headers: { Authorization: `Bearer ${accessToken}` },
         }),
-        axios.get("http://localhost:8000/api/contacts/", {
+        getAllPages("http://localhost:8000/api/contacts/", {
           headers: { Authorization: `Bearer ${accessToken}` },
         }),
         axios.get("http://localhost:8000/api/lead-choices/", {
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from "react";
-import axios from "axios";
+import { getAllPages } from "../api";
 import { useNavigate } from "react-router-dom";
 import SideNav from "./SideNav";
 import "./ContactsPage.css";
@@ -22,7 +22,7 @@ const ContactsPage = () => {
         return;
       }
 
-      const response = await axios.get("http://localhost:8000/api/contacts/", {
+      const response = await getAllPages("http://localhost:8000/api/contacts/", {
         headers: {
           Authorization: `Bearer ${accessToken}`,
         },
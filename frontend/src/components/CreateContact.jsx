@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { getAllPages } from "../api";
 import { useNavigate } from "react-router-dom";
 import SideNav from "./SideNav";
 import "./CreateContact.css";
@@ -49,7 +50,7 @@ const CreateContact = () => {
         }
 
         const [accountsResponse, usersResponse, leadSourceResponse] = await Promise.all([
-          axios.get("http://localhost:8000/api/accounts/", {
+          getAllPages("http://localhost:8000/api/accounts/", {
             headers: { Authorization: `Bearer ${accessToken}` },
           }),
           axios.get("http://localhost:8000/api/users/", {
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { getAllPages } from "../api";
 import { useNavigate } from "react-router-dom";
 import SideNav from "./SideNav";
 import "./CreateLead.css";
@@ -66,7 +67,7 @@ const CreateLead = () => {
           axios.get("http://localhost:8000/api/users/", {
             headers: { Authorization: `Bearer ${accessToken}` },
           }),
-          axios.get("http://localhost:8000/api/leads/", {
+          getAllPages("http://localhost:8000/api/leads/", {
             headers: { Authorization: `Bearer ${accessToken}` },
           }),
         ]);
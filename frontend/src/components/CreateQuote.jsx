@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { getAllPages } from "../api";
 import { useNavigate } from "react-router-dom";
 
 const CreateQuote = () => {
@@ -63,9 +64,9 @@ const CreateQuote = () => {
 
         const [usersRes, opportunitiesRes, accountsRes, contactsRes, choicesRes] = await Promise.all([
           axios.get("http://localhost:8000/api/users/", config),
-          axios.get("http://localhost:8000/api/opportunities/", config),
-          axios.get("http://localhost:8000/api/accounts/", config),
-          axios.get("http://localhost:8000/api/contacts/", config),
+          getAllPages("http://localhost:8000/api/opportunities/", config),
+          getAllPages("http://localhost:8000/api/accounts/", config),
+          getAllPages("http://localhost:8000/api/contacts/", config),
           axios.get("http://localhost:8000/api/quote-choices/", config),
         ]);
 
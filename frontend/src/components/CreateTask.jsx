@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { getAllPages } from "../api";
 import { useNavigate } from "react-router-dom";
 import SideNav from "./SideNav";
 import "./CreateTask.css";
@@ -40,7 +41,7 @@ const CreateTask = () => {
           axios.get("http://localhost:8000/api/users/", {
             headers: { Authorization: `Bearer ${accessToken}` },
           }),
-          axios.get("http://localhost:8000/api/contacts/", {
+          getAllPages("http://localhost:8000/api/contacts/", {
             headers: { Authorization: `Bearer ${accessToken}` },
           }),
         ]);
@@ -9,6 +9,7 @@ import NoteAddIcon from '@mui/icons-material/NoteAdd';
 import EditIcon from '@mui/icons-material/Edit';
 import DeleteIcon from '@mui/icons-material/Delete';
 import axios from 'axios'; // Import axios
+import { getAllPages } from '../api';
 import { colors } from '@mui/material';
 
 const Dashboard = () => {
@@ -68,7 +69,7 @@ const Dashboard = () => {
         setActivities(activityResponse.data);
 
         // Fetch tasks
-        const tasksResponse = await axios.get('http://localhost:8000/api/tasks/', {
+        const tasksResponse = await getAllPages('http://localhost:8000/api/tasks/', {
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
@@ -76,7 +77,7 @@ const Dashboard = () => {
         setTasks(tasksResponse.data);
 
         // Fetch notes
-        const notesResponse = await axios.get('http://localhost:8000/api/notes/', {
+        const notesResponse = await getAllPages('http://localhost:8000/api/notes/', {
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { getAllPages } from "../api";
 import { useParams, useNavigate } from "react-router-dom";
 import SideNav from "./SideNav";
 import './LeadDetails.css';
@@ -41,7 +42,7 @@ const LeadDetails = () => {
           axios.get("http://localhost:8000/api/users/", {
             headers: { Authorization: `Bearer ${accessToken}` },
           }),
-          axios.get("http://localhost:8000/api/leads/", {
+          getAllPages("http://localhost:8000/api/leads/", {
             headers: { Authorization: `Bearer ${accessToken}` },
           }),
         ]);
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from "react";
-import axios from "axios";
+import { getAllPages } from "../api";
 import { useNavigate } from "react-router-dom";
 import SideNav from "./SideNav";
 import "./LeadsPage.css";
@@ -22,7 +22,7 @@ const LeadsPage = () => {
         return;
       }
 
-      const response = await axios.get("http://localhost:8000/api/leads/", {
+      const response = await getAllPages("http://localhost:8000/api/leads/", {
         headers: {
           Authorization: `Bearer ${accessToken}`,
         },
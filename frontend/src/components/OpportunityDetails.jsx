@@ -1,5 +1,6 @@
 import React, { useState, useEffect, useCallback } from "react";
 import axios from "axios";
+import { getAllPages } from "../api";
 import { useParams, useNavigate } from "react-router-dom";
 import SideNav from "./SideNav";
 import "./OpportunityDetails.css";
@@ -38,7 +39,7 @@ const OpportunityDetails = () => {
         axios.get("http://localhost:8000/api/opportunity-choices/", {
           headers: { Authorization: `Bearer ${accessToken}` },
         }),
-        axios.get("http://localhost:8000/api/accounts/", {
+        getAllPages("http://localhost:8000/api/accounts/", {
           headers: { Authorization: `Bearer ${accessToken}` },
         }),
         axios.get("http://localhost:8000/api/users/", {
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from "react";
-import axios from "axios";
+import { getAllPages } from "../api";
 import { useNavigate } from "react-router-dom";
 import SideNav from "./SideNav";
 import "./OpportunityPage.css";
@@ -22,7 +22,7 @@ const OpportunityPage = () => {
         return;
       }
 
-      const response = await axios.get(
+      const response = await getAllPages(
         "http://localhost:8000/api/opportunities/",
         {
           headers: {
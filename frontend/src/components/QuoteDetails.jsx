@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import axios from 'axios';
+import { getAllPages } from '../api';
 // import './QuoteDetails.css';
 
 const QuoteDetails = () => {
@@ -64,13 +65,13 @@ const QuoteDetails = () => {
         try {
           const accessToken = localStorage.getItem('access_token');
           const [opportunitiesRes, accountsRes, contactsRes] = await Promise.all([
-            axios.get('http://localhost:8000/api/opportunities/', {
+            getAllPages('http://localhost:8000/api/opportunities/', {
               headers: { Authorization: `Bearer ${accessToken}` },
             }),
-            axios.get('http://localhost:8000/api/accounts/', {
+            getAllPages('http://localhost:8000/api/accounts/', {
               headers: { Authorization: `Bearer ${accessToken}` },
             }),
-            axios.get('http://localhost:8000/api/contacts/', {
+            getAllPages('http://localhost:8000/api/contacts/', {
               headers: { Authorization: `Bearer ${accessToken}` },
             }),
           ]);
@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import axios from 'axios';
+import { getAllPages } from '../api';
 import { Link, useNavigate } from 'react-router-dom';
 import './QuotesPage.css';
 
@@ -14,7 +14,7 @@ const QuotesPage = () => {
     const fetchQuotes = async () => {
       try {
         const accessToken = localStorage.getItem('access_token');
-        const response = await axios.get('http://localhost:8000/api/quotes/', {
+        const response = await getAllPages('http://localhost:8000/api/quotes/', {
           headers: {
             Authorization: `Bearer ${accessToken}`,
           },
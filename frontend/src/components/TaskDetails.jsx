@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import axios from "axios";
+import { getAllPages } from "../api";
 import { useParams, useNavigate } from "react-router-dom";
 import SideNav from "./SideNav";
 import { FiEdit, FiSave, FiX, FiArrowLeft, FiAlertCircle, FiLoader } from "react-icons/fi";
@@ -36,7 +37,7 @@ const TaskDetails = () => {
           axios.get("http://localhost:8000/api/users/", {
             headers: { Authorization: `Bearer ${accessToken}` },
           }),
-          axios.get("http://localhost:8000/api/contacts/", {
+          getAllPages("http://localhost:8000/api/contacts/", {
             headers: { Authorization: `Bearer ${accessToken}` },
           }),
         ]);
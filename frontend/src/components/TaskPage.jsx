@@ -1,5 +1,5 @@
 import React, { useEffect, useState, useCallback } from "react";
-import axios from "axios";
+import { getAllPages } from "../api";
 import { useNavigate } from "react-router-dom";
 import SideNav from "./SideNav";
 import { FiPlus, FiAlertCircle, FiLoader } from "react-icons/fi";
@@ -20,7 +20,7 @@ const TaskPage = () => {
         return;
       }
 
-      const response = await axios.get("http://localhost:8000/api/tasks/", {
+      const response = await getAllPages("http://localhost:8000/api/tasks/", {
         headers: {
           Authorization: `Bearer ${accessToken}`,
         },